@@ -0,0 +1,91 @@
+# ShadowCam - Benchmark del análisis de frames en procesos
+# Mide cuántos frames por segundo analiza el proceso principal él solo y
+# cuántos el AnalysisPool con distinto número de procesos, pasando los
+# frames por memoria compartida. Cada "cámara" es una clave distinta, así
+# que la detección de movimiento se reparte entre los trabajadores.
+#
+# Uso: python bench_analisis.py [--tarea huella|manipulacion|miniatura|movimiento]
+#                               [--camaras 8] [--frames 400] [--procesos 1 2 4]
+#                               [--ancho 1920] [--alto 1080]
+
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+
+from shadowcam_core import TAREAS_POOL, AnalysisPool
+
+
+def frames_sinteticos(ancho, alto, n=8):
+    """Fondo fijo con un bloque que se desplaza, para que haya movimiento"""
+    rng = np.random.default_rng(0)
+    fondo = cv2.GaussianBlur(rng.integers(0, 200, (alto, ancho, 3), dtype=np.uint8), (21, 21), 0)
+    frames = []
+    for i in range(n):
+        frame = fondo.copy()
+        x = i * ancho // (n + 1)
+        frame[alto // 3:alto // 2, x:x + ancho // 10] = 255
+        frames.append(frame)
+    return frames
+
+
+def medir_local(tarea, frames, camaras, n):
+    funcion = TAREAS_POOL[tarea]
+    inicio = time.perf_counter()
+    for i in range(n):
+        funcion(frames[i % len(frames)], clave=i % camaras, ts=i)
+    return n / (time.perf_counter() - inicio)
+
+
+def medir_pool(tarea, frames, camaras, n, procesos):
+    pool = AnalysisPool(procesos)
+    # Calentamiento: arranque de los procesos e importación de OpenCV
+    for camara in range(camaras):
+        futuro = None
+        while futuro is None:
+            futuro = pool.enviar(tarea, frames[0], clave=camara, ts=0)
+        futuro.result()
+
+    futuros = []
+    inicio = time.perf_counter()
+    for i in range(n):
+        futuro = None
+        # Con el anillo lleno se espera en lugar de descartar: se mide capacidad
+        while futuro is None:
+            futuro = pool.enviar(tarea, frames[i % len(frames)], clave=i % camaras, ts=i)
+            if futuro is None:
+                time.sleep(0.0005)
+        futuros.append(futuro)
+    for futuro in futuros:
+        futuro.result()
+    fps = n / (time.perf_counter() - inicio)
+    pool.cerrar()
+    return fps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del análisis en procesos de ShadowCam")
+    parser.add_argument("--tarea", choices=sorted(TAREAS_POOL), default="movimiento")
+    parser.add_argument("--camaras", type=int, default=8)
+    parser.add_argument("--frames", type=int, default=400)
+    parser.add_argument("--procesos", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--ancho", type=int, default=1920)
+    parser.add_argument("--alto", type=int, default=1080)
+    args = parser.parse_args()
+
+    frames = frames_sinteticos(args.ancho, args.alto)
+    print(f"Tarea '{args.tarea}', frames de {args.ancho}x{args.alto}, {args.camaras} cámaras, "
+          f"{args.frames} frames, {os.cpu_count()} CPU\n")
+
+    base = medir_local(args.tarea, frames, args.camaras, args.frames)
+    print(f"{'proceso principal':<20} {base:8.1f} frames/s")
+    for procesos in args.procesos:
+        fps = medir_pool(args.tarea, frames, args.camaras, args.frames, procesos)
+        print(f"{f'pool de {procesos}':<20} {fps:8.1f} frames/s  ({fps / base:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# ShadowCam - Benchmark del arranque en frío
+# Mide en procesos nuevos el coste de importar el módulo (con -X importtime,
+# desglosado por paquete) y el tiempo hasta que la primera ventana está
+# dibujada. Con --guardar se fija una referencia y con --comparar se falla
+# (código de salida 1) si algún tiempo empeora más que la tolerancia.
+#
+# Uso: python bench_arranque.py [--modulo shadowcam2] [--repeticiones 5]
+#                               [--guardar base.json | --comparar base.json]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+
+# Se ejecuta en el proceso hijo: la primera llamada a mainloop() dibuja la
+# ventana, informa del instante y cierra en lugar de quedarse esperando
+SCRIPT_VENTANA = """
+import sys, time, tkinter as tk
+def mainloop(self, n=0):
+    self.update()
+    print(time.time(), flush=True)
+    self.destroy()
+    sys.exit(0)
+tk.Misc.mainloop = mainloop
+import {modulo}
+{modulo}.{entrada}()
+"""
+
+ENTRADAS = {"shadowcam2": "interfaz_login"}
+
+
+def medir_importacion(modulo):
+    """Tiempo total de importación y coste acumulado de cada paquete de primer nivel"""
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+                             cwd=DIRECTORIO, capture_output=True, text=True)
+    if proceso.returncode != 0:
+        raise SystemExit(f"No se pudo importar {modulo}:\n{proceso.stderr[-2000:]}")
+
+    paquetes = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        # La sangría indica la profundidad; solo cuentan los de primer nivel
+        if nombre.startswith("  "):
+            continue
+        paquetes[nombre.strip()] = int(acumulado) / 1000
+    return paquetes.get(modulo, sum(paquetes.values())), paquetes
+
+
+def medir_ventana(modulo):
+    """Milisegundos desde lanzar el intérprete hasta la primera ventana dibujada"""
+    script = SCRIPT_VENTANA.format(modulo=modulo, entrada=ENTRADAS[modulo])
+    inicio = time.time()
+    proceso = subprocess.run([sys.executable, "-c", script],
+                             cwd=DIRECTORIO, capture_output=True, text=True)
+    if proceso.returncode != 0 or not proceso.stdout.strip():
+        return None
+    return (float(proceso.stdout.split()[-1]) - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque de ShadowCam")
+    parser.add_argument("--modulo", default="shadowcam2",
+                        help="Módulo a medir (shadowcam2, shadowcam_core, shadowcam_cli)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Paquetes más caros a mostrar")
+    parser.add_argument("--guardar", help="Guardar los resultados como referencia JSON")
+    parser.add_argument("--comparar", help="Comparar con una referencia JSON")
+    parser.add_argument("--tolerancia", type=float, default=20.0,
+                        help="Empeoramiento permitido respecto a la referencia (%%)")
+    args = parser.parse_args()
+
+    importaciones, ventanas, paquetes = [], [], {}
+    for _ in range(args.repeticiones):
+        total, paquetes = medir_importacion(args.modulo)
+        importaciones.append(total)
+        if args.modulo in ENTRADAS:
+            ventanas.append(medir_ventana(args.modulo))
+
+    resultados = {"modulo": args.modulo, "importacion_ms": statistics.median(importaciones)}
+    print(f"Importación de {args.modulo}: {resultados['importacion_ms']:.1f} ms "
+          f"(mediana de {args.repeticiones})")
+    if ventanas and None not in ventanas:
+        resultados["primera_ventana_ms"] = statistics.median(ventanas)
+        print(f"Hasta la primera ventana: {resultados['primera_ventana_ms']:.1f} ms")
+    elif ventanas:
+        print("Sin pantalla: no se mide el tiempo hasta la primera ventana")
+
+    print("\nPaquetes más caros (ms acumulados, última repetición):")
+    for nombre, ms in sorted(paquetes.items(), key=lambda p: -p[1])[:args.top]:
+        print(f"  {nombre:<30} {ms:8.1f}")
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\nReferencia guardada en {args.guardar}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)
+        regresiones = []
+        for clave in ("importacion_ms", "primera_ventana_ms"):
+            if clave not in referencia or clave not in resultados:
+                continue
+            cambio = (resultados[clave] / referencia[clave] - 1) * 100
+            print(f"{clave}: {referencia[clave]:.1f} -> {resultados[clave]:.1f} ms ({cambio:+.1f}%)")
+            if cambio > args.tolerancia:
+                regresiones.append(clave)
+        if regresiones:
+            raise SystemExit(f"Regresión de arranque en: {', '.join(regresiones)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# ShadowCam - Microbenchmark del camino de visualización del visor
+# Compara el camino anterior de CamViewer.update_frame (cvtColor + resize +
+# PIL Image + PhotoImage nuevos por frame) con FrameRenderer, que reutiliza
+# buffers preasignados y una única PhotoImage.
+#
+# Uso: python bench_visor.py [--frames 300] [--ancho 1920] [--alto 1080]
+
+import argparse
+import gc
+import time
+import tkinter as tk
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+from shadowcam2 import FrameRenderer
+
+
+def camino_anterior(label):
+    """Reproducción exacta del visor antes de FrameRenderer"""
+    def mostrar(frame):
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame = cv2.resize(frame, (640, 480))
+        img = Image.fromarray(frame)
+        imgtk = ImageTk.PhotoImage(image=img)
+        label.imgtk = imgtk
+        label.configure(image=imgtk)
+    return mostrar
+
+
+class ContadorObjetos:
+    """Cuenta las PhotoImage e Image de PIL creadas mientras está activo"""
+
+    def __init__(self):
+        self.total = 0
+
+    def __enter__(self):
+        self._photo_init = ImageTk.PhotoImage.__init__
+        self._fromarray = Image.fromarray
+        contador = self
+
+        def photo_init(obj, *args, **kwargs):
+            contador.total += 1
+            return contador._photo_init(obj, *args, **kwargs)
+
+        def fromarray(*args, **kwargs):
+            contador.total += 1
+            return contador._fromarray(*args, **kwargs)
+
+        ImageTk.PhotoImage.__init__ = photo_init
+        Image.fromarray = fromarray
+        return self
+
+    def __exit__(self, *exc):
+        ImageTk.PhotoImage.__init__ = self._photo_init
+        Image.fromarray = self._fromarray
+
+
+def medir(nombre, mostrar, frames, n):
+    # Calentamiento: la primera llamada de FrameRenderer reserva sus buffers
+    for i in range(10):
+        mostrar(frames[i % len(frames)])
+
+    gc.collect()
+    inicio = time.perf_counter()
+    for i in range(n):
+        mostrar(frames[i % len(frames)])
+    ms_frame = (time.perf_counter() - inicio) * 1000 / n
+
+    # Bytes reservados por frame (arrays de numpy/OpenCV incluidos) y
+    # objetos de imagen PIL/Tk creados por frame
+    tracemalloc.start()
+    bytes_frame = 0
+    with ContadorObjetos() as contador:
+        for i in range(n):
+            antes, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            mostrar(frames[i % len(frames)])
+            _, pico = tracemalloc.get_traced_memory()
+            bytes_frame += pico - antes
+    tracemalloc.stop()
+    imagenes_frame = contador.total / n
+
+    print(f"{nombre:<16} {ms_frame:8.3f} ms/frame  "
+          f"{bytes_frame / n / 1024:10.1f} KB reservados/frame  "
+          f"{imagenes_frame:5.2f} imágenes PIL/Tk creadas/frame")
+    return ms_frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark del visor de ShadowCam")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--ancho", type=int, default=1920)
+    parser.add_argument("--alto", type=int, default=1080)
+    args = parser.parse_args()
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"Se necesita una pantalla para crear PhotoImage: {e}")
+    root.withdraw()
+    label = tk.Label(root, bd=0, highlightthickness=0)
+    label.pack()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (args.alto, args.ancho, 3), dtype=np.uint8) for _ in range(4)]
+
+    print(f"Frames de {args.ancho}x{args.alto} -> 640x480, {args.frames} iteraciones\n")
+    antes = medir("antes", camino_anterior(label), frames, args.frames)
+    despues = medir("FrameRenderer", FrameRenderer(label).mostrar, frames, args.frames)
+    print(f"\nMejora: {antes / despues:.2f}x")
+    root.destroy()
+
+
+if __name__ == "__main__":
+    main()
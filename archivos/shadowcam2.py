@@ -1,157 +1,56 @@
 # ShadowCam - Enhanced Ethical Camera Detection & Remote Access System v2.1
 # Sistema integrado de detección y visualización de cámaras de red con acceso remoto
+#
+# OpenCV, numpy y PIL se importan al abrir una ventana de video y matplotlib
+# al abrir el dashboard o el historial, no al arrancar; las dependencias
+# perezosas del núcleo (scapy, requests, reportlab y pyarrow) solo al usarlas:
+# el tiempo hasta la ventana de login se mide con bench_arranque.py
 
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext, filedialog
-import psutil
-import socket
 import ipaddress
-from scapy.all import ARP, Ether, srp
 import threading
-from mac_vendor_lookup import MacLookup
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-import nmap
-import cv2
-from PIL import Image, ImageTk
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import webbrowser
-import json
+import os
 import time
-import requests
+
+from shadowcam_core import (
+    HOSTS_CONFIRMACION, PLANTILLA_NMAP, CameraManager, obtener_monitor, abrir_captura,
+    obtener_interfaces, calcular_red, limitar_red, resolver_oui, ejecutar_escaneo,
+    exportar, escribir_pdf, InventoryStats, servir_metricas,
+    MAX_INTENTOS_VISOR, MAX_INTENTOS_AUTENTICACION, obtener_planificador, destino_camara,
+    obtener_nvr, SegmentPlayer, directorio_camara, detector_movimiento, TamperDetector,
+)
 
 resultados = []
-camaras_guardadas = []  # Nueva lista para cámaras guardadas
+estadisticas_escaneo = InventoryStats()
 COLOR_FONDO = "#0d0d0d"
 COLOR_TEXTO = "#00ff00"
 FUENTE_CONSOLA = ("Consolas", 11)
 
-# Archivo para guardar cámaras persistentes
-ARCHIVO_CAMARAS = "camaras_guardadas.json"
-
-# Credenciales por defecto para probar en cámaras
-DEFAULT_CREDS = [
-    ("admin", "admin"),
-    ("admin", "12345"),
-    ("admin", "password"),
-    ("root", "root"),
-    ("user", "user"),
-    ("admin", "1234"),
-    ("admin", "1111111"),  # Samsung común
-    ("admin", "4321"),     # Samsung común
-    ("admin", "123456"),
-    ("root", "admin"),
-    ("service", "service"),
-    ("", "admin"),
-    ("supervisor", "supervisor"),
-    ("", "")
-]
-
-
-# Puertos comunes para cámaras IP
-CAM_PORTS = [80, 554, 8080, 8888]
-
-# ---------------------- NUEVA FUNCIONALIDAD: GESTIÓN DE CÁMARAS REMOTAS ----------------------
-
-class CameraManager:
-    def __init__(self):
-        self.cargar_camaras_guardadas()
-    
-    def cargar_camaras_guardadas(self):
-        """Cargar cámaras guardadas desde archivo JSON"""
-        global camaras_guardadas
-        try:
-            with open(ARCHIVO_CAMARAS, 'r') as f:
-                camaras_guardadas = json.load(f)
-        except FileNotFoundError:
-            camaras_guardadas = []
-        except json.JSONDecodeError:
-            camaras_guardadas = []
-    
-    def guardar_camaras(self):
-        """Guardar cámaras en archivo JSON"""
-        try:
-            with open(ARCHIVO_CAMARAS, 'w') as f:
-                json.dump(camaras_guardadas, f, indent=4)
-            return True
-        except Exception as e:
-            print(f"Error al guardar cámaras: {e}")
-            return False
-    
-    def agregar_camara(self, nombre, url, ip_local, descripcion=""):
-        """Agregar una nueva cámara a la lista guardada"""
-        nueva_camara = {
-            "id": len(camaras_guardadas) + 1,
-            "nombre": nombre,
-            "url": url,
-            "ip_local": ip_local,
-            "descripcion": descripcion,
-            "fecha_agregada": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "activa": True,
-            "intentos_conexion": 0,
-            "ultima_conexion": None
-        }
-        camaras_guardadas.append(nueva_camara)
-        return self.guardar_camaras()
-    
-    def verificar_acceso_remoto(self, camara):
-        """Verificar si una cámara es accesible remotamente"""
-        url = camara['url']
-        try:
-            # Para RTSP
-            if url.startswith('rtsp://'):
-                cap = cv2.VideoCapture(url)
-                if cap.isOpened():
-                    ret, _ = cap.read()
-                    cap.release()
-                    return ret
-            
-            # Para HTTP
-            elif url.startswith('http://'):
-                response = requests.get(url, timeout=5)
-                return response.status_code == 200
-            
-            return False
-        except Exception as e:
-            print(f"Error verificando acceso: {e}")
-            return False
-    
-    def generar_url_remota(self, ip_local, puerto, usuario, password):
-        """Generar URLs para acceso remoto usando diferentes métodos"""
-        urls_remotas = []
-        
-        # Método 1: Acceso directo por IP pública (requiere port forwarding)
-        try:
-            # Obtener IP pública
-            ip_publica = requests.get('https://httpbin.org/ip', timeout=5).json()['origin']
-            urls_remotas.append({
-                "tipo": "IP Pública + Port Forwarding",
-                "url": f"rtsp://{usuario}:{password}@{ip_publica}:{puerto}/",
-                "descripcion": "Requiere configurar port forwarding en el router",
-                "nota": f"Configurar redirección del puerto {puerto} hacia {ip_local}"
-            })
-        except:
-            pass
-        
-        # Método 2: URLs con IP local (para documentación)
-        urls_remotas.append({
-            "tipo": "Acceso Local",
-            "url": f"rtsp://{usuario}:{password}@{ip_local}:{puerto}/",
-            "descripcion": "Solo funciona dentro de la red local",
-            "nota": "Para referencia y pruebas locales"
-        })
-        
-        # Método 3: Sugerir servicios de túnel
-        urls_remotas.append({
-            "tipo": "Túnel Ngrok",
-            "url": f"Configurar ngrok para exponer puerto {puerto}",
-            "descripcion": "Usar ngrok tcp {puerto} para crear túnel",
-            "nota": "Proporciona acceso temporal desde internet"
-        })
-        
-        return urls_remotas
+# Textos de los estados de la vigilancia de imagen
+ESTADOS_IMAGEN = {"congelado": "imagen congelada", "negro": "imagen en negro", "tapado": "objetivo tapado"}
+
+# Consola de resultados: líneas conservadas y cadencia de refresco
+MAX_LINEAS_CONSOLA = 5000
+INTERVALO_CONSOLA_MS = 100
+LOTE_CONSOLA = 500
+
+# Dashboard en vivo: fabricantes mostrados y refresco máximo
+TOP_DASHBOARD = 10
+INTERVALO_DASHBOARD_MS = 500
+
+# Descripción de las clases de error de reconexión
+ERRORES_RECONEXION = {"red": "red", "autenticacion": "autenticación", "decodificador": "decodificación"}
+
+# Historial de salud: rangos disponibles (segundos) y refresco
+RANGOS_HISTORIAL = {"1 hora": 3600, "24 horas": 24 * 3600,
+                    "7 días": 7 * 24 * 3600, "30 días": 30 * 24 * 3600}
+INTERVALO_HISTORIAL_MS = 5000
+
+# ---------------------- VENTANA DE GESTIÓN DE CÁMARAS ----------------------
 
 def mostrar_gestion_camaras():
     """Ventana para gestionar cámaras guardadas"""
@@ -200,12 +99,40 @@ def mostrar_gestion_camaras():
                                          font=FUENTE_CONSOLA)
     text_info.pack(fill=tk.BOTH, expand=True, pady=5)
     
+    # Copia local del inventario; los índices del listbox apuntan aquí
+    camaras = []
+    
     def actualizar_lista():
         """Actualizar la lista de cámaras guardadas"""
+        seleccion = listbox_guardadas.curselection()
+        manager = CameraManager()
+        camaras[:] = manager.listar_camaras()
         listbox_guardadas.delete(0, tk.END)
-        for i, camara in enumerate(camaras_guardadas):
-            estado = "✅" if camara.get('activa', True) else "❌"
+        for i, camara in enumerate(camaras):
+            estado = "✅" if manager.estadisticas_camara(camara)['activa'] else "❌"
             listbox_guardadas.insert(tk.END, f"{estado} {camara['nombre']} - {camara['ip_local']}")
+        for indice in seleccion:
+            if indice < listbox_guardadas.size():
+                listbox_guardadas.selection_set(indice)
+    
+    def refrescar_estado(version=None):
+        """Refrescar la lista cuando el monitor registra nuevos sondeos"""
+        if not ventana_gestion.winfo_exists():
+            return
+        monitor = obtener_monitor()
+        if version is not None and monitor.version != version:
+            actualizar_lista()
+        ventana_gestion.after(2000, refrescar_estado, monitor.version)
+    
+    def describir_perfiles(camara):
+        manager = CameraManager()
+        lineas = []
+        for tipo, titulo in (("principal", "Principal"), ("secundario", "Substream")):
+            perfil = manager.obtener_perfil(camara, tipo)
+            resolucion = "x".join(map(str, perfil['resolucion'])) if perfil['resolucion'] else "nativa"
+            fps = perfil['fps_max'] or "sin límite"
+            lineas.append(f"{titulo}: {perfil['url']}\n   Resolución: {resolucion} | FPS máx.: {fps}")
+        return "\n".join(lineas)
     
     def mostrar_info_camara(event):
         """Mostrar información detallada de la cámara seleccionada"""
@@ -213,7 +140,12 @@ def mostrar_gestion_camaras():
         if not seleccion:
             return
         
-        camara = camaras_guardadas[seleccion[0]]
+        camara = camaras[seleccion[0]]
+        estadisticas = CameraManager().estadisticas_camara(camara)
+        disponibilidad = (f"{estadisticas['disponibilidad']:.1f}%"
+                          if estadisticas['disponibilidad'] is not None else "Sin datos")
+        latencia = (f"{estadisticas['latencia_media_ms']:.0f} ms"
+                    if estadisticas['latencia_media_ms'] is not None else "Sin datos")
         info = f"""INFORMACIÓN DE LA CÁMARA
 {'='*40}
 
@@ -222,9 +154,16 @@ URL: {camara['url']}
 IP Local: {camara['ip_local']}
 Descripción: {camara.get('descripcion', 'N/A')}
 Fecha Agregada: {camara['fecha_agregada']}
-Estado: {'Activa' if camara.get('activa', True) else 'Inactiva'}
-Intentos de Conexión: {camara.get('intentos_conexion', 0)}
-Última Conexión: {camara.get('ultima_conexion', 'Nunca')}
+Estado: {'Activa' if estadisticas['activa'] else 'Inactiva'}
+Intentos de Conexión: {estadisticas['intentos_conexion']}
+Última Conexión: {estadisticas['ultima_conexion'] or 'Nunca'}
+Disponibilidad: {disponibilidad}
+Latencia TCP media: {latencia}
+
+PERFILES DE STREAM
+{'='*40}
+
+{describir_perfiles(camara)}
 
 OPCIONES DE ACCESO REMOTO
 {'='*40}
@@ -263,7 +202,7 @@ y con fines educativos/de seguridad.
             messagebox.showinfo("Selección", "Selecciona una cámara para verificar.")
             return
         
-        camara = camaras_guardadas[seleccion[0]]
+        camara = camaras[seleccion[0]]
         
         # Mostrar ventana de progreso
         ventana_progreso = tk.Toplevel(ventana_gestion)
@@ -278,34 +217,42 @@ y con fines educativos/de seguridad.
         progress.pack(pady=10, padx=20, fill=tk.X)
         progress.start()
         
-        def verificar():
-            manager = CameraManager()
-            accesible = manager.verificar_acceso_remoto(camara)
-            
+        # El sondeo completo (con decodificación) corre en el pool del monitor
+        # y queda registrado en el historial; aquí solo se espera el resultado
+        futuro = obtener_monitor().enviar(camara, decodificar=True)
+        
+        def esperar_resultado():
+            if not futuro.done():
+                ventana_progreso.after(100, esperar_resultado)
+                return
             ventana_progreso.destroy()
+            sondeo = futuro.result()
             
-            # Actualizar estadísticas de la cámara
-            camara['intentos_conexion'] = camara.get('intentos_conexion', 0) + 1
-            if accesible:
-                camara['ultima_conexion'] = time.strftime("%Y-%m-%d %H:%M:%S")
-                camara['activa'] = True
+            if sondeo["ok"]:
                 messagebox.showinfo("Verificación", 
                                    f"✅ La cámara '{camara['nombre']}' está accesible.")
+            elif sondeo["etapa"] == "imagen":
+                messagebox.showwarning("Verificación", 
+                                      f"⚠ La cámara '{camara['nombre']}' responde, pero con "
+                                      f"{ESTADOS_IMAGEN[sondeo['imagen']]}.\n\n"
+                                      "Posibles causas:\n"
+                                      "- Objetivo tapado, pintado o girado\n"
+                                      "- Sin iluminación o infrarrojos averiados\n"
+                                      "- Codificador de la cámara bloqueado")
             else:
-                camara['activa'] = False
                 messagebox.showwarning("Verificación", 
                                       f"❌ La cámara '{camara['nombre']}' no está accesible.\n\n"
+                                      f"Falló en: {sondeo['etapa']} ({sondeo['detalle']})\n\n"
                                       "Posibles causas:\n"
                                       "- La cámara está apagada\n"
                                       "- Cambió de IP\n"
                                       "- Problemas de red\n"
                                       "- Credenciales cambiaron")
             
-            manager.guardar_camaras()
             actualizar_lista()
             mostrar_info_camara(None)
         
-        threading.Thread(target=verificar).start()
+        esperar_resultado()
     
     def ver_camara_remota():
         """Abrir visor para la cámara seleccionada"""
@@ -314,8 +261,9 @@ y con fines educativos/de seguridad.
             messagebox.showinfo("Selección", "Selecciona una cámara para ver.")
             return
         
-        camara = camaras_guardadas[seleccion[0]]
-        abrir_visor_camara(camara['url'], f"Cámara Remota: {camara['nombre']}")
+        camara = camaras[seleccion[0]]
+        perfil = CameraManager().obtener_perfil(camara)
+        abrir_visor_camara(perfil['url'], f"Cámara Remota: {camara['nombre']}", perfil, camara)
     
     def generar_acceso_remoto():
         """Generar configuraciones para acceso remoto"""
@@ -324,7 +272,7 @@ y con fines educativos/de seguridad.
             messagebox.showinfo("Selección", "Selecciona una cámara.")
             return
         
-        camara = camaras_guardadas[seleccion[0]]
+        camara = camaras[seleccion[0]]
         
         # Ventana para configuración remota
         ventana_remoto = tk.Toplevel(ventana_gestion)
@@ -432,6 +380,156 @@ MÉTODOS DE ACCESO REMOTO:
         ttk.Button(ventana_remoto, text="Exportar Configuración", 
                   command=exportar_config).pack(pady=10)
     
+    def ver_historial():
+        """Gráficas de disponibilidad y latencia de la cámara seleccionada"""
+        seleccion = listbox_guardadas.curselection()
+        if not seleccion:
+            messagebox.showinfo("Selección", "Selecciona una cámara para ver su historial.")
+            return
+        mostrar_historial_camara(camaras[seleccion[0]])
+    
+    def configurar_grabacion():
+        """Activar la grabación continua de la cámara y fijar su retención"""
+        seleccion = listbox_guardadas.curselection()
+        if not seleccion:
+            messagebox.showinfo("Selección", "Selecciona una cámara para configurar su grabación.")
+            return
+        
+        camara = camaras[seleccion[0]]
+        configuracion = CameraManager().obtener_grabacion(camara)
+        
+        ventana_grabacion = tk.Toplevel(ventana_gestion)
+        ventana_grabacion.title(f"Grabación: {camara['nombre']}")
+        ventana_grabacion.geometry("420x300")
+        ventana_grabacion.configure(bg=COLOR_FONDO)
+        
+        frame_form = tk.Frame(ventana_grabacion, bg=COLOR_FONDO)
+        frame_form.pack(fill=tk.BOTH, expand=True, padx=20, pady=15)
+        
+        var_activa = tk.BooleanVar(value=configuracion["activa"])
+        tk.Checkbutton(frame_form, text="Grabación continua activa", variable=var_activa,
+                       fg=COLOR_TEXTO, bg=COLOR_FONDO, selectcolor="#1a1a1a",
+                       activebackground=COLOR_FONDO, font=FUENTE_CONSOLA).grid(
+                           row=0, column=0, columnspan=2, sticky='w', pady=5)
+        
+        campos = {}
+        for fila, (clave, texto) in enumerate((("segmento_s", "Duración de segmento (s):"),
+                                               ("cuota_mb", "Cuota de disco (MB, 0 = sin límite):"),
+                                               ("dias", "Conservar días (0 = sin límite):")), start=1):
+            tk.Label(frame_form, text=texto, fg=COLOR_TEXTO, bg=COLOR_FONDO,
+                     font=FUENTE_CONSOLA).grid(row=fila, column=0, sticky='w', pady=5)
+            campos[clave] = ttk.Entry(frame_form, width=10)
+            campos[clave].insert(0, str(configuracion[clave] or 0))
+            campos[clave].grid(row=fila, column=1, sticky='w', padx=5)
+        
+        uso = next((g for g in obtener_nvr().estado() if g["camara_id"] == camara['id']), None)
+        if uso:
+            texto_uso = (f"Estado: {uso['estado']} | {uso['segmentos']} segmentos, "
+                         f"{uso['bytes'] / 1024 / 1024:.0f} MB")
+        else:
+            texto_uso = "Estado: sin grabar"
+        tk.Label(frame_form, text=texto_uso, fg=COLOR_TEXTO, bg=COLOR_FONDO,
+                 font=("Consolas", 9)).grid(row=4, column=0, columnspan=2, sticky='w', pady=10)
+        
+        def guardar():
+            try:
+                valores = {clave: float(campo.get()) for clave, campo in campos.items()}
+            except ValueError:
+                messagebox.showerror("Error", "Los valores deben ser numéricos.", parent=ventana_grabacion)
+                return
+            if valores["segmento_s"] < 1 or valores["cuota_mb"] < 0 or valores["dias"] < 0:
+                messagebox.showerror("Error", "Valores fuera de rango.", parent=ventana_grabacion)
+                return
+            if obtener_nvr().configurar(camara['id'], activa=var_activa.get(),
+                                        segmento_s=int(valores["segmento_s"]),
+                                        cuota_mb=valores["cuota_mb"], dias=valores["dias"]):
+                camara['grabacion'] = CameraManager().obtener_camara(camara['id'])['grabacion']
+                ventana_grabacion.destroy()
+            else:
+                messagebox.showerror("Error", "No se pudo guardar la configuración.", parent=ventana_grabacion)
+        
+        ttk.Button(frame_form, text="Guardar", command=guardar).grid(row=5, column=0, pady=10, sticky='w')
+        ttk.Button(frame_form, text="Cancelar", command=ventana_grabacion.destroy).grid(row=5, column=1, pady=10)
+    
+    def configurar_analisis():
+        """Activar la detección de movimiento de la cámara y ajustar su sensibilidad"""
+        seleccion = listbox_guardadas.curselection()
+        if not seleccion:
+            messagebox.showinfo("Selección", "Selecciona una cámara para configurar su análisis.")
+            return
+        
+        camara = camaras[seleccion[0]]
+        gestor = CameraManager()
+        configuracion = gestor.obtener_analisis(camara)
+        
+        ventana_analisis = tk.Toplevel(ventana_gestion)
+        ventana_analisis.title(f"Análisis: {camara['nombre']}")
+        ventana_analisis.geometry("480x400")
+        ventana_analisis.configure(bg=COLOR_FONDO)
+        
+        frame_form = tk.Frame(ventana_analisis, bg=COLOR_FONDO)
+        frame_form.pack(fill=tk.BOTH, expand=True, padx=20, pady=15)
+        
+        var_movimiento = tk.BooleanVar(value=configuracion["movimiento"])
+        tk.Checkbutton(frame_form, text="Detección de movimiento", variable=var_movimiento,
+                       fg=COLOR_TEXTO, bg=COLOR_FONDO, selectcolor="#1a1a1a",
+                       activebackground=COLOR_FONDO, font=FUENTE_CONSOLA).grid(
+                           row=0, column=0, columnspan=2, sticky='w', pady=5)
+        var_vigilancia = tk.BooleanVar(value=configuracion["vigilancia"])
+        tk.Checkbutton(frame_form, text="Vigilar imagen congelada, negra o tapada", variable=var_vigilancia,
+                       fg=COLOR_TEXTO, bg=COLOR_FONDO, selectcolor="#1a1a1a",
+                       activebackground=COLOR_FONDO, font=FUENTE_CONSOLA).grid(
+                           row=1, column=0, columnspan=2, sticky='w', pady=5)
+        
+        campos = {}
+        for fila, (clave, texto) in enumerate((("fps", "Análisis por segundo:"),
+                                               ("umbral", "Umbral de diferencia (0-255):"),
+                                               ("area_min", "Área mínima (fracción):"),
+                                               ("fps_huella", "Muestras de vigilancia por segundo:")), start=2):
+            tk.Label(frame_form, text=texto, fg=COLOR_TEXTO, bg=COLOR_FONDO,
+                     font=FUENTE_CONSOLA).grid(row=fila, column=0, sticky='w', pady=5)
+            campos[clave] = ttk.Entry(frame_form, width=10)
+            campos[clave].insert(0, str(configuracion[clave]))
+            campos[clave].grid(row=fila, column=1, sticky='w', padx=5)
+        
+        tk.Label(frame_form, text="Zonas ignoradas (x,y,ancho,alto en fracciones; separadas por ';'):",
+                 fg=COLOR_TEXTO, bg=COLOR_FONDO, font=("Consolas", 9)).grid(
+                     row=6, column=0, columnspan=2, sticky='w', pady=(10, 2))
+        entry_zonas = ttk.Entry(frame_form, width=50)
+        entry_zonas.insert(0, "; ".join(",".join(f"{v:g}" for v in zona) for zona in configuracion["zonas"]))
+        entry_zonas.grid(row=7, column=0, columnspan=2, sticky='w')
+        
+        def guardar():
+            try:
+                valores = {clave: float(campo.get()) for clave, campo in campos.items()}
+                zonas = [[float(v) for v in zona.split(",")]
+                         for zona in entry_zonas.get().split(";") if zona.strip()]
+            except ValueError:
+                messagebox.showerror("Error", "Los valores deben ser numéricos.", parent=ventana_analisis)
+                return
+            if (valores["fps"] <= 0 or valores["fps_huella"] <= 0 or not 0 < valores["umbral"] < 256
+                    or not 0 <= valores["area_min"] < 1
+                    or any(len(zona) != 4 or not all(0 <= v <= 1 for v in zona) for zona in zonas)):
+                messagebox.showerror("Error", "Valores fuera de rango.", parent=ventana_analisis)
+                return
+            analisis = {**configuracion, **valores, "umbral": int(valores["umbral"]),
+                        "movimiento": var_movimiento.get(), "vigilancia": var_vigilancia.get(), "zonas": zonas}
+            if gestor.actualizar_camara(camara['id'], analisis=analisis):
+                camara['analisis'] = analisis
+                ventana_analisis.destroy()
+            else:
+                messagebox.showerror("Error", "No se pudo guardar la configuración.", parent=ventana_analisis)
+        
+        ttk.Button(frame_form, text="Guardar", command=guardar).grid(row=8, column=0, pady=15, sticky='w')
+        ttk.Button(frame_form, text="Cancelar", command=ventana_analisis.destroy).grid(row=8, column=1, pady=15)
+    
+    def ver_grabaciones():
+        seleccion = listbox_guardadas.curselection()
+        if not seleccion:
+            messagebox.showinfo("Selección", "Selecciona una cámara para ver sus grabaciones.")
+            return
+        abrir_reproductor(camaras[seleccion[0]])
+    
     def eliminar_camara():
         """Eliminar cámara seleccionada"""
         seleccion = listbox_guardadas.curselection()
@@ -439,11 +537,10 @@ MÉTODOS DE ACCESO REMOTO:
             messagebox.showinfo("Selección", "Selecciona una cámara para eliminar.")
             return
         
-        camara = camaras_guardadas[seleccion[0]]
+        camara = camaras[seleccion[0]]
         if messagebox.askyesno("Confirmar", 
                               f"¿Eliminar la cámara '{camara['nombre']}'?"):
-            del camaras_guardadas[seleccion[0]]
-            CameraManager().guardar_camaras()
+            CameraManager().eliminar_camara(camara['id'])
             actualizar_lista()
             text_info.delete(1.0, tk.END)
     
@@ -460,11 +557,104 @@ MÉTODOS DE ACCESO REMOTO:
               command=ver_camara_remota).pack(side=tk.LEFT, padx=2)
     ttk.Button(frame_botones, text="Config. Remota", 
               command=generar_acceso_remoto).pack(side=tk.LEFT, padx=2)
+    ttk.Button(frame_botones, text="Historial", 
+              command=ver_historial).pack(side=tk.LEFT, padx=2)
+    ttk.Button(frame_botones, text="Grabación", 
+              command=configurar_grabacion).pack(side=tk.LEFT, padx=2)
+    ttk.Button(frame_botones, text="Grabaciones", 
+              command=ver_grabaciones).pack(side=tk.LEFT, padx=2)
+    ttk.Button(frame_botones, text="Análisis", 
+              command=configurar_analisis).pack(side=tk.LEFT, padx=2)
     ttk.Button(frame_botones, text="Eliminar", 
               command=eliminar_camara).pack(side=tk.LEFT, padx=2)
+    ttk.Button(frame_botones, text="Muro de Video", 
+              command=mostrar_muro_video).pack(side=tk.LEFT, padx=2)
     
     # Cargar lista inicial
     actualizar_lista()
+    refrescar_estado()
+
+def mostrar_historial_camara(camara):
+    """Series de latencia y disponibilidad de una cámara.
+
+    Los datos salen de la base: sondeos crudos hasta 24 h y agregados por
+    minuto para rangos mayores. Se recargan cuando el monitor registra
+    nuevos sondeos.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+    ventana_historial = tk.Toplevel()
+    ventana_historial.title(f"ShadowCam - Historial: {camara['nombre']}")
+    ventana_historial.geometry("900x600")
+    ventana_historial.configure(bg=COLOR_FONDO)
+
+    frame_opciones = tk.Frame(ventana_historial, bg=COLOR_FONDO)
+    frame_opciones.pack(fill=tk.X, padx=10, pady=5)
+    tk.Label(frame_opciones, text="Rango:", fg=COLOR_TEXTO, bg=COLOR_FONDO,
+             font=FUENTE_CONSOLA).pack(side=tk.LEFT)
+    combo_rango = ttk.Combobox(frame_opciones, values=list(RANGOS_HISTORIAL), state="readonly", width=10)
+    combo_rango.current(1)
+    combo_rango.pack(side=tk.LEFT, padx=5)
+    label_resumen = tk.Label(frame_opciones, text="", fg=COLOR_TEXTO, bg=COLOR_FONDO, font=FUENTE_CONSOLA)
+    label_resumen.pack(side=tk.LEFT, padx=10)
+
+    fig = Figure(figsize=(9, 5), facecolor=COLOR_FONDO)
+    ax_latencia = fig.add_subplot(2, 1, 1, facecolor=COLOR_FONDO)
+    ax_disponibilidad = fig.add_subplot(2, 1, 2, facecolor=COLOR_FONDO, sharex=ax_latencia)
+    for ax in (ax_latencia, ax_disponibilidad):
+        ax.tick_params(colors=COLOR_TEXTO, labelsize=8)
+        for borde in ax.spines.values():
+            borde.set_color("#1f5f1f")
+    ax_latencia.set_ylabel("ms", color=COLOR_TEXTO)
+    ax_disponibilidad.set_ylabel("% disponible", color=COLOR_TEXTO)
+    ax_disponibilidad.set_ylim(-5, 105)
+    lineas = {
+        "latencia_ms": ax_latencia.plot([], [], color="lime", lw=1, label="TCP")[0],
+        "apertura_ms": ax_latencia.plot([], [], color="orange", lw=1, marker=".", label="Apertura")[0],
+        "primer_frame_ms": ax_latencia.plot([], [], color="cyan", lw=1, marker=".", label="Primer frame")[0],
+    }
+    linea_disponibilidad = ax_disponibilidad.plot([], [], color="lime", lw=1, drawstyle="steps-post")[0]
+    ax_latencia.legend(loc="upper left", fontsize=8, facecolor=COLOR_FONDO, labelcolor=COLOR_TEXTO)
+
+    canvas_historial = FigureCanvasTkAgg(fig, master=ventana_historial)
+    canvas_historial.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+    estado = {"version": None}
+
+    def cargar():
+        segundos = RANGOS_HISTORIAL[combo_rango.get()]
+        serie = obtener_monitor().historial.serie(camara['id'], segundos)
+        ahora = time.time()
+        # Minutos relativos al momento actual, negativos hacia el pasado
+        tiempos = [(fila["ts"] - ahora) / 60 for fila in serie]
+        for clave, linea in lineas.items():
+            puntos = [(t, fila[clave]) for t, fila in zip(tiempos, serie) if fila[clave] is not None]
+            linea.set_data([p[0] for p in puntos], [p[1] for p in puntos])
+        linea_disponibilidad.set_data(tiempos, [fila["disponibilidad"] * 100 for fila in serie])
+        ax_latencia.set_xlim(-segundos / 60, 0)
+        ax_latencia.relim()
+        ax_latencia.autoscale_view(scalex=False)
+        ax_disponibilidad.set_xlabel("minutos", color=COLOR_TEXTO)
+
+        if serie:
+            disponibilidad = sum(fila["disponibilidad"] for fila in serie) / len(serie) * 100
+            label_resumen.config(text=f"{len(serie)} puntos | disponibilidad media {disponibilidad:.1f}%")
+        else:
+            label_resumen.config(text="Sin sondeos en este rango")
+        canvas_historial.draw_idle()
+
+    def refrescar():
+        if not ventana_historial.winfo_exists():
+            return
+        version = obtener_monitor().version
+        if version != estado["version"]:
+            estado["version"] = version
+            cargar()
+        ventana_historial.after(INTERVALO_HISTORIAL_MS, refrescar)
+
+    combo_rango.bind("<<ComboboxSelected>>", lambda e: cargar())
+    fig.tight_layout()
+    refrescar()
 
 def guardar_camara_detectada():
     """Guardar una cámara detectada para acceso remoto"""
@@ -479,7 +669,7 @@ def guardar_camara_detectada():
     # Ventana para guardar cámara
     ventana_guardar = tk.Toplevel()
     ventana_guardar.title("Guardar Cámara para Acceso Remoto")
-    ventana_guardar.geometry("500x350")
+    ventana_guardar.geometry("500x400")
     ventana_guardar.configure(bg=COLOR_FONDO)
     
     tk.Label(ventana_guardar, text="💾 GUARDAR CÁMARA", 
@@ -516,6 +706,12 @@ def guardar_camara_detectada():
                         fg=COLOR_TEXTO, width=30, height=3)
     entry_desc.grid(row=3, column=1, pady=5, padx=10)
     
+    tk.Label(frame_form, text="URL substream:", fg=COLOR_TEXTO, 
+             bg=COLOR_FONDO, font=FUENTE_CONSOLA).grid(row=4, column=0, sticky='w', pady=5)
+    entry_substream = tk.Entry(frame_form, font=FUENTE_CONSOLA, bg="#1a1a1a", 
+                              fg=COLOR_TEXTO, width=30)
+    entry_substream.grid(row=4, column=1, pady=5, padx=10)
+    
     # Información adicional
     info_text = f"""Esta cámara será guardada para acceso futuro.
     
@@ -529,7 +725,7 @@ cualquier lugar con la configuración adecuada."""
     
     tk.Label(frame_form, text=info_text, fg=COLOR_TEXTO, bg=COLOR_FONDO, 
              font=("Consolas", 9), justify=tk.LEFT, wraplength=400).grid(
-             row=4, column=0, columnspan=2, pady=10)
+             row=5, column=0, columnspan=2, pady=10)
     
     def guardar():
         manager = CameraManager()
@@ -537,7 +733,8 @@ cualquier lugar con la configuración adecuada."""
             nombre=entry_nombre.get(),
             url=entry_url.get(),
             ip_local=entry_ip.get(),
-            descripcion=entry_desc.get("1.0", tk.END).strip()
+            descripcion=entry_desc.get("1.0", tk.END).strip(),
+            url_substream=entry_substream.get().strip()
         ):
             messagebox.showinfo("Guardado", 
                                f"Cámara '{entry_nombre.get()}' guardada correctamente.\n\n"
@@ -548,14 +745,275 @@ cualquier lugar con la configuración adecuada."""
             messagebox.showerror("Error", "No se pudo guardar la cámara.")
     
     frame_botones = tk.Frame(frame_form, bg=COLOR_FONDO)
-    frame_botones.grid(row=5, column=0, columnspan=2, pady=20)
+    frame_botones.grid(row=6, column=0, columnspan=2, pady=20)
     
     ttk.Button(frame_botones, text="Guardar", command=guardar).pack(side=tk.LEFT, padx=5)
     ttk.Button(frame_botones, text="Cancelar", 
               command=ventana_guardar.destroy).pack(side=tk.LEFT, padx=5)
 
-def abrir_visor_camara(url, titulo="ShadowCam - Visor"):
+# ---------------------- MOTOR DE CAPTURA ----------------------
+
+class CaptureEngine:
+    """Lee un stream en un hilo propio y conserva solo el frame más reciente.
+
+    El hilo de Tk nunca llama a ``cap.read()``: consulta ``obtener_frame()``,
+    que devuelve el último frame no mostrado o ``None``. Los frames que llegan
+    antes de que la interfaz recoja el anterior se descartan, así la imagen
+    nunca se queda atrás respecto al directo.
+
+    Los ``analizadores`` (p. ej. MotionDetector) se ejecutan en el hilo de
+    captura sobre los frames que su ``debe_analizar()`` acepta, de modo que
+    el análisis nunca retrasa la interfaz.
+
+    Las reaperturas tras un fallo las reparte el planificador de reconexión:
+    la espera depende de la clase de error y crece con cada intento. Con
+    ``max_intentos=None`` se reintenta indefinidamente, salvo errores de
+    autenticación, que se abandonan tras MAX_INTENTOS_AUTENTICACION.
+    """
+
+    def __init__(self, url, max_intentos=MAX_INTENTOS_VISOR,
+                 opciones=None, resolucion=None, fps_max=None):
+        self.url = url
+        self.host = destino_camara(url)[0]
+        self.opciones = opciones
+        self.resolucion = resolucion
+        self.fps_max = fps_max
+        self.max_intentos = max_intentos
+        self.estado = "conectando"
+        self.intentos = 0
+        self.error = None  # Clase del último fallo: red, autenticacion o decodificador
+        self.proximo_intento = None
+
+        # Contadores de rendimiento
+        self.capturados = 0
+        self.mostrados = 0
+        self.descartados = 0
+        self.latencia_ms = 0.0
+        self.tiempos = {}  # Fases de la última apertura (ms)
+        self.analizadores = []
+
+        self._lock = threading.Lock()
+        self._frame = None
+        self._ts_frame = 0.0
+        self._pendiente = False
+        self._activo = False
+        self._reabrir = False
+        self._hilo = None
+
+    def iniciar(self):
+        """Arrancar el hilo de captura si no está en marcha"""
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle_captura, daemon=True)
+        self._hilo.start()
+
+    def _abrir(self):
+        return abrir_captura(self.url, self.opciones, self.resolucion)
+
+    def _leer(self, cap):
+        """Leer un frame respetando ``fps_max``.
+
+        Con límite de fps, ``grab()`` sigue vaciando el stream al ritmo de la
+        fuente y ``retrieve()`` (conversión de color y copia) solo se hace
+        cuando toca; devuelve ``(True, None)`` para los frames saltados.
+        """
+        if not self.fps_max:
+            return cap.read()
+        if not cap.grab():
+            return False, None
+        ahora = time.monotonic()
+        if ahora < self._proximo_frame:
+            return True, None
+        self._proximo_frame = ahora + 1.0 / self.fps_max
+        return cap.retrieve()
+
+    def _cancelado(self):
+        return not self._activo or self._reabrir
+
+    def _bucle_captura(self):
+        cap = None
+        self._proximo_frame = 0.0
+        planificador = obtener_planificador()
+        try:
+            while self._activo:
+                if self._reabrir and cap is not None:
+                    cap.release()
+                    cap = None
+                self._reabrir = False
+
+                if cap is None:
+                    # Tras un fallo, la reapertura espera su turno frente al resto
+                    # de streams (la reconexión manual pone los intentos a cero)
+                    if self.intentos:
+                        instante = planificador.turno(self.host)
+                        if instante > time.monotonic():
+                            self.proximo_intento = instante
+                            planificador.esperar(self.host, instante, self._cancelado)
+                            continue
+                    self.proximo_intento = None
+                    self.estado = "conectando" if self.intentos == 0 else "reconectando"
+                    cap = self._abrir()
+                    self.tiempos = cap.tiempos
+
+                ret, frame = self._leer(cap) if cap.isOpened() else (False, None)
+                if not self._activo:
+                    break
+
+                if ret and frame is None:
+                    continue
+                if ret:
+                    with self._lock:
+                        if self._pendiente:
+                            self.descartados += 1
+                        self._frame = frame
+                        self._ts_frame = time.monotonic()
+                        self._pendiente = True
+                        self.capturados += 1
+                    self._analizar(frame)
+                    if self.estado != "conectado":
+                        planificador.exito(self.host)
+                    self.estado = "conectado"
+                    self.intentos = 0
+                    self.error = None
+                    continue
+
+                # Error de apertura o lectura: clasificar y esperar según la clase
+                cap.release()
+                cap = None
+                self.intentos += 1
+                self.error = planificador.clasificar(self.url)
+                limite = MAX_INTENTOS_AUTENTICACION if self.error == "autenticacion" else self.max_intentos
+                if limite and self.intentos >= limite:
+                    self.estado = "sin_conexion"
+                    break
+                self.estado = "reconectando"
+                self.proximo_intento = planificador.fallo(self.host, self.error, self.intentos)
+                planificador.esperar(self.host, self.proximo_intento, self._cancelado)
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def _analizar(self, frame):
+        for analizador in self.analizadores:
+            if not analizador.debe_analizar():
+                continue
+            try:
+                analizador.analizar(frame)
+            except Exception as e:
+                print(f"Error en el análisis de {self.host}: {e}")
+
+    def obtener_frame(self):
+        """Devolver el frame más reciente si aún no se ha mostrado"""
+        with self._lock:
+            if not self._pendiente:
+                return None
+            self._pendiente = False
+            self.mostrados += 1
+            self.latencia_ms = (time.monotonic() - self._ts_frame) * 1000
+            return self._frame
+
+    def ultimo_frame(self):
+        """Devolver el último frame capturado, se haya mostrado o no"""
+        with self._lock:
+            return None if self._frame is None else self._frame.copy()
+
+    def estadisticas(self):
+        return {
+            "capturados": self.capturados,
+            "mostrados": self.mostrados,
+            "descartados": self.descartados,
+            "latencia_ms": self.latencia_ms,
+            "apertura_ms": self.tiempos.get("apertura_ms"),
+            "primer_frame_ms": self.tiempos.get("primer_frame_ms"),
+        }
+
+    def reconectar(self):
+        """Forzar la reapertura del stream sin bloquear la interfaz"""
+        self.intentos = 0
+        self._reabrir = True
+        self.estado = "reconectando"
+        obtener_planificador().despertar()
+        self.iniciar()
+
+    def detener(self):
+        # El propio hilo libera la captura al salir del bucle
+        self._activo = False
+        obtener_planificador().despertar()
+
+class FrameRenderer:
+    """Pinta frames en un Label sin crear objetos nuevos por frame.
+
+    Los buffers de destino se reservan una sola vez por tamaño de widget;
+    ``cv2.resize`` y ``cv2.cvtColor`` escriben en ellos con ``dst=`` y el
+    resultado se pega sobre la misma PhotoImage. La imagen PIL comparte
+    memoria con el buffer RGBA, por eso se usa RGBA y no RGB.
+    """
+
+    def __init__(self, label, tamano_defecto=(640, 480), ajustar=True):
+        self.label = label
+        self.tamano_defecto = tamano_defecto
+        self.ajustar = ajustar
+        self._tamano = None
+        self._buf_redim = None
+        self._buf_rgba = None
+        self._imagen = None
+        self._photo = None
+
+    def tamano_destino(self, ancho_frame, alto_frame):
+        """Tamaño que cabe en el widget conservando la relación de aspecto"""
+        if not self.ajustar:
+            return ancho_frame, alto_frame
+        borde = 2 * (int(self.label.cget("borderwidth")) + int(self.label.cget("highlightthickness")))
+        ancho_w = self.label.winfo_width() - borde
+        alto_w = self.label.winfo_height() - borde
+        if ancho_w < 2 or alto_w < 2:
+            # Widget aún sin mapear
+            ancho_w, alto_w = self.tamano_defecto
+        escala = min(ancho_w / ancho_frame, alto_w / alto_frame)
+        return max(1, int(ancho_frame * escala)), max(1, int(alto_frame * escala))
+
+    def _reservar(self, tamano):
+        import numpy as np
+        from PIL import Image, ImageTk
+
+        ancho, alto = tamano
+        self._tamano = tamano
+        self._buf_redim = np.empty((alto, ancho, 3), dtype=np.uint8)
+        self._buf_rgba = np.zeros((alto, ancho, 4), dtype=np.uint8)
+        self._imagen = Image.frombuffer("RGBA", tamano, self._buf_rgba, "raw", "RGBA", 0, 1)
+        self._photo = ImageTk.PhotoImage(self._imagen)
+        self.label.imgtk = self._photo
+        self.label.configure(image=self._photo)
+
+    def mostrar(self, frame):
+        import cv2
+
+        alto, ancho = frame.shape[:2]
+        tamano = self.tamano_destino(ancho, alto)
+        if tamano != self._tamano:
+            self._reservar(tamano)
+
+        fuente = frame
+        if tamano != (ancho, alto):
+            interpolacion = cv2.INTER_AREA if tamano[0] < ancho else cv2.INTER_LINEAR
+            cv2.resize(frame, tamano, dst=self._buf_redim, interpolation=interpolacion)
+            fuente = self._buf_redim
+        # Convertir después de redimensionar: menos píxeles que procesar
+        cv2.cvtColor(fuente, cv2.COLOR_BGR2RGBA, dst=self._buf_rgba)
+        self._photo.paste(self._imagen)
+
+    def limpiar(self):
+        """Soltar la imagen actual (p. ej. para mostrar un mensaje de texto)"""
+        self._tamano = None
+        self._photo = None
+        self.label.imgtk = None
+        self.label.configure(image="")
+
+def abrir_visor_camara(url, titulo="ShadowCam - Visor", perfil=None, camara=None):
     """Función mejorada para abrir el visor de cámara"""
+    import cv2
+
     win = tk.Toplevel(app)
     win.title(titulo)
     win.geometry("660x520")
@@ -574,97 +1032,612 @@ def abrir_visor_camara(url, titulo="ShadowCam - Visor"):
                            font=("Consolas", 10), fg="yellow", bg="#1a1a1a")
     label_estado.pack()
     
+    # Contadores del pipeline de captura
+    label_stats = tk.Label(frame_info, text="", font=("Consolas", 9),
+                           fg=COLOR_TEXTO, bg="#1a1a1a")
+    label_stats.pack()
+    
     # Contenedor para el video
     frame_video = tk.Frame(win, bg="#1a1a1a", padx=10, pady=10)
     frame_video.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
     
     # Crear visor con manejo de errores mejorado
     class CamViewer:
-        def __init__(self, parent, url, label_estado):
+        def __init__(self, parent, url, label_estado, label_stats, perfil=None, camara=None):
             self.parent = parent
             self.url = url
             self.label_estado = label_estado
-            self.cap = cv2.VideoCapture(self.url)
-            self.label = tk.Label(parent)
+            self.label_stats = label_stats
+            perfil = perfil or {}
+            self.engine = CaptureEngine(self.url, opciones=perfil.get('opciones'),
+                                        resolucion=perfil.get('resolucion'),
+                                        fps_max=perfil.get('fps_max'))
+            # Detección de movimiento si la cámara guardada la tiene activada; la
+            # vigilancia de imagen (microsegundos por muestra) va en el propio hilo
+            self.detector = None
+            self.vigilante = None
+            gestor = CameraManager()
+            analisis = gestor.obtener_analisis(camara or {})
+            camara_id = camara['id'] if camara is not None else None
+            emitir = gestor.registrar_evento if camara is not None else None
+            if analisis["movimiento"] and camara is not None:
+                self.detector = detector_movimiento(camara_id, analisis, emitir)
+                self.engine.analizadores.append(self.detector)
+            if analisis["vigilancia"]:
+                self.vigilante = TamperDetector(camara_id, analisis, emitir)
+                self.engine.analizadores.append(self.vigilante)
+            self.label = tk.Label(parent, bd=0, highlightthickness=0, bg="#1a1a1a")
             self.label.pack(fill=tk.BOTH, expand=True)
+            self.renderer = FrameRenderer(self.label)
             self.running = True
-            self.connection_attempts = 0
-            self.max_attempts = 3
+            self.estado_mostrado = None
+            self.engine.iniciar()
             self.update_frame()
 
+        def actualizar_estado(self, estado):
+            """Reflejar en la interfaz el estado del motor de captura"""
+            proximo = self.engine.proximo_intento
+            restante = max(0, int(proximo - time.monotonic())) if proximo else None
+            imagen = self.vigilante.estado if self.vigilante else "ok"
+            clave = (estado, self.engine.intentos, self.engine.error, restante, imagen)
+            if clave == self.estado_mostrado:
+                return
+            self.estado_mostrado = clave
+            if estado == "conectado" and imagen != "ok":
+                # Llegan frames, pero la imagen no sirve
+                self.label_estado.config(text=f"Estado: ⚠ Conectado - {ESTADOS_IMAGEN[imagen]}", fg="orange")
+            elif estado == "conectado":
+                self.label_estado.config(text="Estado: ✅ Conectado", fg="green")
+                self.label.config(text="")
+            elif estado == "reconectando":
+                maximo = self.engine.max_intentos or "∞"
+                espera = f" en {restante} s" if restante else "..."
+                causa = f" - error de {ERRORES_RECONEXION[self.engine.error]}" if self.engine.error else ""
+                self.label_estado.config(
+                    text=f"Estado: 🔄 Reintentando{espera} ({self.engine.intentos}/{maximo}){causa}", 
+                    fg="yellow")
+            elif estado == "sin_conexion":
+                self.label_estado.config(text="Estado: ❌ Sin conexión", fg="red")
+                # Mostrar mensaje de error según la clase del último fallo
+                causas = {
+                    "autenticacion": "• Credenciales incorrectas o sin permiso",
+                    "red": "• La cámara está offline\n• La cámara cambió de IP\n• Problemas de red",
+                    "decodificador": "• Ruta del stream incorrecta\n• Códec no soportado",
+                }.get(self.engine.error, "• La cámara está offline\n• Credenciales incorrectas\n"
+                                         "• La cámara cambió de IP\n• Problemas de red")
+                self.renderer.limpiar()
+                self.label.config(text="❌ No se puede conectar a la cámara\n\n"
+                                       f"Posibles causas:\n{causas}", 
+                                  font=("Consolas", 12), fg=COLOR_TEXTO, 
+                                  bg="#1a1a1a", justify=tk.CENTER)
+
         def update_frame(self):
             if not self.running:
                 return
             
-            ret, frame = self.cap.read()
-            if ret:
-                # Conexión exitosa
-                self.label_estado.config(text="Estado: ✅ Conectado", fg="green")
-                self.connection_attempts = 0
-                
-                # Procesar frame
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame = cv2.resize(frame, (640, 480))
-                img = Image.fromarray(frame)
-                imgtk = ImageTk.PhotoImage(image=img)
-                self.label.imgtk = imgtk
-                self.label.configure(image=imgtk)
-                
-                self.parent.after(30, self.update_frame)
-            else:
-                # Error de conexión
-                self.connection_attempts += 1
-                if self.connection_attempts < self.max_attempts:
-                    self.label_estado.config(
-                        text=f"Estado: 🔄 Reintentando... ({self.connection_attempts}/{self.max_attempts})", 
-                        fg="yellow")
-                    self.cap.release()
-                    self.cap = cv2.VideoCapture(self.url)
-                    self.parent.after(1000, self.update_frame)  # Reintentar en 1 segundo
-                else:
-                    self.label_estado.config(text="Estado: ❌ Sin conexión", fg="red")
-                    # Mostrar mensaje de error
-                    self.label.config(text="❌ No se puede conectar a la cámara\n\n"
-                                           "Posibles causas:\n"
-                                           "• La cámara está offline\n"
-                                      "• Credenciales incorrectas\n"
-                                           "• La cámara cambió de IP\n"
-                                           "• Problemas de red", 
-                                     font=("Consolas", 12), fg=COLOR_TEXTO, 
-                                     bg="#1a1a1a", justify=tk.CENTER)
+            # Solo se recoge el frame más reciente; la lectura ocurre en otro hilo
+            frame = self.engine.obtener_frame()
+            if frame is not None:
+                cajas = self.detector.cajas if self.detector else None
+                if cajas:
+                    # Se dibuja sobre una copia: el frame del motor es el de las capturas
+                    frame = frame.copy()
+                    for x, y, w, h in cajas:
+                        cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 3)
+                self.renderer.mostrar(frame)
+            
+            self.actualizar_estado(self.engine.estado)
+            stats = self.engine.estadisticas()
+            arranque = ""
+            if stats['primer_frame_ms'] is not None:
+                arranque = (f" | Apertura: {stats['apertura_ms']:.0f} ms"
+                            f" | Primer frame: {stats['primer_frame_ms']:.0f} ms")
+            if self.detector:
+                arranque += " | Movimiento: " + ("🔴 sí" if self.detector.activo else "no")
+            self.label_stats.config(
+                text=f"Capturados: {stats['capturados']} | Mostrados: {stats['mostrados']} | "
+                     f"Descartados: {stats['descartados']} | Latencia: {stats['latencia_ms']:.0f} ms"
+                     f"{arranque}")
+            
+            self.parent.after(30, self.update_frame)
 
         def stop(self):
             self.running = False
-            if self.cap:
-                self.cap.release()
+            self.engine.detener()
 
-    viewer = CamViewer(frame_video, url, label_estado)
+    viewer = CamViewer(frame_video, url, label_estado, label_stats, perfil, camara)
     
     # Botones de control
     frame_controles = tk.Frame(win, bg=COLOR_FONDO)
     frame_controles.pack(fill=tk.X, padx=10, pady=5)
     
     def take_screenshot():
-        if viewer.cap and viewer.cap.isOpened():
-            ret, frame = viewer.cap.read()
-            if ret:
-                filename = f"screenshot_{int(time.time())}.jpg"
-                cv2.imwrite(filename, frame)
-                messagebox.showinfo("Screenshot", f"Captura guardada como: {filename}")
+        frame = viewer.engine.ultimo_frame()
+        if frame is not None:
+            filename = f"screenshot_{int(time.time())}.jpg"
+            cv2.imwrite(filename, frame)
+            messagebox.showinfo("Screenshot", f"Captura guardada como: {filename}")
     
     def reconnect():
-        viewer.connection_attempts = 0
-        viewer.cap.release()
-        viewer.cap = cv2.VideoCapture(viewer.url)
+        viewer.engine.reconectar()
         viewer.label_estado.config(text="Estado: 🔄 Reconectando...", fg="yellow")
     
     ttk.Button(frame_controles, text="📷 Captura", command=take_screenshot).pack(side=tk.LEFT, padx=5)
     ttk.Button(frame_controles, text="🔄 Reconectar", command=reconnect).pack(side=tk.LEFT, padx=5)
+    if camara is not None:
+        ttk.Button(frame_controles, text="🎞 Grabaciones",
+                   command=lambda: abrir_reproductor(camara)).pack(side=tk.LEFT, padx=5)
     ttk.Button(frame_controles, text="❌ Cerrar", 
               command=lambda: (viewer.stop(), win.destroy())).pack(side=tk.RIGHT, padx=5)
     
     win.protocol("WM_DELETE_WINDOW", lambda: (viewer.stop(), win.destroy()))
 
+def abrir_reproductor(camara):
+    """Reproducir las grabaciones de una cámara con una barra de tiempo.
+
+    La barra cubre todo lo grabado; al arrastrarla el reproductor salta al
+    keyframe anterior mediante el índice de cada segmento, así que solo se
+    atiende la última posición y nunca se decodifica desde el principio.
+    El final del rango depende del índice del segmento que se está
+    grabando (ffprobe), así que se calcula en otro hilo y ``refrescar()``
+    lo recoge.
+    """
+    reproductor = SegmentPlayer(directorio_camara(camara['id']))
+    segmentos, inicios = reproductor.indice.instantanea()
+    if not segmentos:
+        reproductor.detener()
+        messagebox.showinfo("Grabaciones", f"No hay grabaciones de '{camara['nombre']}'.")
+        return
+    
+    win = tk.Toplevel(app)
+    win.title(f"ShadowCam - Grabaciones: {camara['nombre']}")
+    win.geometry("760x560")
+    win.configure(bg=COLOR_FONDO)
+    
+    label_video = tk.Label(win, bd=0, highlightthickness=0, bg="#1a1a1a")
+    label_video.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+    renderer = FrameRenderer(label_video)
+    
+    # Hasta tener el índice del último segmento la barra llega a su inicio
+    posicion = tk.DoubleVar(value=inicios[-1])
+    barra = ttk.Scale(win, from_=inicios[0], to=inicios[-1], variable=posicion,
+                      command=lambda valor: reproductor.buscar(float(valor)))
+    barra.pack(fill=tk.X, padx=10)
+    
+    label_tiempo = tk.Label(win, text="", font=("Consolas", 10), fg=COLOR_TEXTO, bg=COLOR_FONDO)
+    label_tiempo.pack(pady=5)
+    
+    frame_controles = tk.Frame(win, bg=COLOR_FONDO)
+    frame_controles.pack(fill=tk.X, padx=10, pady=5)
+    
+    def saltar(segundos):
+        destino = min(max(posicion.get() + segundos, barra.cget("from")), barra.cget("to"))
+        posicion.set(destino)
+        reproductor.buscar(destino)
+    
+    def alternar():
+        reproductor.reproducir(not reproductor.reproduciendo)
+        btn_reproducir.config(text="⏸ Pausa" if reproductor.reproduciendo else "▶ Reproducir")
+    
+    rangos = queue.SimpleQueue()
+    calculo = {"en_curso": False, "primero": True}
+    
+    def calcular_rango():
+        reproductor.indice.actualizar()
+        rangos.put(reproductor.indice.rango())
+    
+    def actualizar_rango():
+        """Ampliar la barra con lo grabado desde que se abrió la ventana"""
+        if calculo["en_curso"]:
+            return
+        calculo["en_curso"] = True
+        threading.Thread(target=calcular_rango, daemon=True).start()
+    
+    def aplicar_rango(nuevo):
+        calculo["en_curso"] = False
+        if not nuevo:
+            return
+        barra.config(from_=nuevo[0], to=nuevo[1])
+        if calculo["primero"]:
+            # Al abrir: empezar por el último minuto grabado
+            calculo["primero"] = False
+            posicion.set(nuevo[1])
+            reproductor.buscar(max(nuevo[0], nuevo[1] - 60))
+    
+    ttk.Button(frame_controles, text="⏪ -10 s", command=lambda: saltar(-10)).pack(side=tk.LEFT, padx=5)
+    btn_reproducir = ttk.Button(frame_controles, text="▶ Reproducir", command=alternar)
+    btn_reproducir.pack(side=tk.LEFT, padx=5)
+    ttk.Button(frame_controles, text="⏩ +10 s", command=lambda: saltar(10)).pack(side=tk.LEFT, padx=5)
+    ttk.Button(frame_controles, text="🔄 Actualizar", command=actualizar_rango).pack(side=tk.LEFT, padx=5)
+    
+    def refrescar():
+        if not win.winfo_exists():
+            return
+        try:
+            aplicar_rango(rangos.get_nowait())
+        except queue.Empty:
+            pass
+        frame = reproductor.obtener_frame()
+        if frame is not None:
+            renderer.mostrar(frame)
+            if reproductor.reproduciendo:
+                posicion.set(reproductor.posicion)
+            busqueda = (f" | búsqueda: {reproductor.ultima_busqueda_ms:.0f} ms"
+                        if reproductor.ultima_busqueda_ms is not None else "")
+            label_tiempo.config(text=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(reproductor.posicion))
+                                     + busqueda)
+        if not reproductor.reproduciendo and btn_reproducir.cget("text") != "▶ Reproducir":
+            btn_reproducir.config(text="▶ Reproducir")
+        win.after(30, refrescar)
+    
+    def cerrar():
+        reproductor.detener()
+        win.destroy()
+    
+    win.protocol("WM_DELETE_WINDOW", cerrar)
+    actualizar_rango()
+    refrescar()
+
+# ---------------------- MURO DE VIDEO ----------------------
+
+# Tamaño de cada celda del muro y cuadrícula por página
+ANCHO_TILE = 320
+ALTO_TILE = 180
+COLUMNAS_MURO = 4
+FILAS_MURO = 4
+REFRESCO_MURO_MS = 50
+
+class WallTile:
+    """Estado de decodificación de una celda del muro de video"""
+
+    def __init__(self, indice, camara, perfil):
+        import numpy as np
+
+        self.indice = indice
+        self.camara = camara
+        self.nombre = camara['nombre']
+        self.perfil = perfil
+        self.url = perfil['url']
+        self.host = destino_camara(self.url)[0]
+        self.intentos = 0
+        self.recuperado_visto = None
+        self.cap = None
+        self.lock = threading.Lock()
+        self.buffer = np.zeros((ALTO_TILE, ANCHO_TILE, 3), dtype=np.uint8)
+        self.nuevo = True
+        self.en_curso = False
+        self.modo = "oculto"
+        self.oculto_desde = time.monotonic()
+        self.fps_fuente = 25.0
+        self.proxima_lectura = 0.0
+        self.proximo_render = 0.0
+        self.estado = "conectando"
+        analisis = CameraManager().obtener_analisis(camara)
+        self.vigilante = (TamperDetector(camara['id'], analisis, CameraManager().registrar_evento)
+                          if analisis["vigilancia"] else None)
+
+    def pintar_mensaje(self, texto):
+        import cv2
+
+        with self.lock:
+            self.buffer[:] = 26
+            cv2.putText(self.buffer, self.nombre, (8, 20), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, (0, 255, 0), 1, cv2.LINE_AA)
+            cv2.putText(self.buffer, texto, (8, ALTO_TILE // 2), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, (0, 255, 255), 1, cv2.LINE_AA)
+            self.nuevo = True
+
+
+class DecodePool:
+    """Decodifica todas las cámaras del muro con un número acotado de hilos.
+
+    Un hilo planificador reparte lecturas entre los trabajadores según el
+    modo de cada celda: la enfocada se muestra a la tasa de la fuente, las
+    visibles a ``FPS_VISIBLE`` y las ocultas cierran su stream tras unos
+    segundos para no gastar CPU ni ancho de banda. Las celdas sin conexión
+    reintentan indefinidamente cuando lo indica el planificador de reconexión.
+    """
+
+    FPS_VISIBLE = 5.0
+    SEGUNDOS_OCULTO_CIERRE = 10.0
+
+    def __init__(self, max_trabajadores=None):
+        self.max_trabajadores = max_trabajadores or os.cpu_count() or 4
+        self.tiles = []
+        self.enfocado = None
+        self._executor = ThreadPoolExecutor(max_workers=self.max_trabajadores,
+                                            thread_name_prefix="shadowcam-decode")
+        self._activo = False
+        self._hilo = None
+
+    def agregar(self, camara, perfil):
+        tile = WallTile(len(self.tiles), camara, perfil)
+        tile.pintar_mensaje("Conectando...")
+        self.tiles.append(tile)
+        return tile
+
+    def iniciar(self):
+        self._activo = True
+        self._hilo = threading.Thread(target=self._planificar, daemon=True)
+        self._hilo.start()
+
+    def establecer_modos(self, visibles, enfocado=None):
+        """Marcar qué celdas están en pantalla y cuál tiene el foco"""
+        ahora = time.monotonic()
+        self.enfocado = enfocado
+        for tile in self.tiles:
+            if tile.indice == enfocado:
+                modo = "enfoque"
+            elif tile.indice in visibles:
+                modo = "visible"
+            else:
+                modo = "oculto"
+            if modo == "oculto" and tile.modo != "oculto":
+                tile.oculto_desde = ahora
+            elif modo != "oculto" and tile.modo == "oculto":
+                tile.proxima_lectura = ahora
+            tile.modo = modo
+
+    def _planificar(self):
+        planificador = obtener_planificador()
+        while self._activo:
+            ahora = time.monotonic()
+            espera = 0.05
+            for tile in self.tiles:
+                if tile.en_curso:
+                    continue
+                # Si otro stream del mismo host ha reconectado, no esperar más
+                if tile.intentos and planificador.recuperado(tile.host) != tile.recuperado_visto:
+                    tile.recuperado_visto = planificador.recuperado(tile.host)
+                    tile.proxima_lectura = min(tile.proxima_lectura, planificador.adelantar())
+                if tile.modo == "oculto":
+                    # Cerrar streams que llevan tiempo fuera de pantalla
+                    if tile.cap is not None and ahora - tile.oculto_desde > self.SEGUNDOS_OCULTO_CIERRE:
+                        self._enviar(self._cerrar, tile)
+                    continue
+                if ahora >= tile.proxima_lectura:
+                    self._enviar(self._decodificar, tile)
+                else:
+                    espera = min(espera, tile.proxima_lectura - ahora)
+            time.sleep(max(espera, 0.002))
+
+    def _enviar(self, tarea, tile):
+        tile.en_curso = True
+        try:
+            self._executor.submit(tarea, tile)
+        except RuntimeError:
+            # El pool ya se cerró mientras se planificaba
+            tile.en_curso = False
+
+    def _cerrar(self, tile):
+        try:
+            if tile.cap is not None:
+                tile.cap.release()
+                tile.cap = None
+                tile.pintar_mensaje("En pausa")
+        finally:
+            tile.en_curso = False
+
+    def _fallo(self, tile, texto):
+        """Cerrar el stream de la celda y pedir turno de reconexión"""
+        if tile.cap is not None:
+            tile.cap.release()
+            tile.cap = None
+        planificador = obtener_planificador()
+        tile.intentos += 1
+        clase = planificador.clasificar(tile.url)
+        tile.recuperado_visto = planificador.recuperado(tile.host)
+        tile.proxima_lectura = planificador.fallo(tile.host, clase, tile.intentos)
+        tile.pintar_mensaje(f"{texto} ({ERRORES_RECONEXION[clase]})")
+
+    def _decodificar(self, tile):
+        import cv2
+
+        inicio = time.monotonic()
+        try:
+            if not self._activo:
+                return
+            if tile.cap is None:
+                if tile.intentos:
+                    instante = obtener_planificador().turno(tile.host)
+                    if instante > inicio:
+                        tile.proxima_lectura = instante
+                        return
+                tile.cap = abrir_captura(tile.url, tile.perfil.get('opciones'),
+                                         tile.perfil.get('resolucion'), origen="muro")
+                if not tile.cap.isOpened():
+                    tile.estado = "sin_conexion"
+                    self._fallo(tile, "Sin conexión")
+                    return
+                fps = tile.cap.get(cv2.CAP_PROP_FPS)
+                tile.fps_fuente = fps if 1 <= fps <= 60 else 25.0
+
+            # grab() vacía el stream al ritmo de la fuente; retrieve() (conversión
+            # de color y copia) solo se hace cuando toca refrescar la celda
+            if not tile.cap.grab():
+                tile.estado = "reconectando"
+                self._fallo(tile, "Reconectando")
+                return
+
+            if tile.intentos:
+                obtener_planificador().exito(tile.host)
+                tile.intentos = 0
+            tile.estado = "conectado"
+            tile.proxima_lectura = inicio + 1.0 / tile.fps_fuente
+            if inicio < tile.proximo_render:
+                return
+            ret, frame = tile.cap.retrieve()
+            if not ret:
+                return
+            if tile.vigilante and tile.vigilante.debe_analizar(inicio):
+                tile.vigilante.analizar(frame)
+            fps_objetivo = tile.fps_fuente if tile.modo == "enfoque" else min(self.FPS_VISIBLE, tile.fps_fuente)
+            if tile.perfil.get('fps_max'):
+                fps_objetivo = min(fps_objetivo, tile.perfil['fps_max'])
+            tile.proximo_render = inicio + 1.0 / fps_objetivo
+            with tile.lock:
+                cv2.resize(frame, (ANCHO_TILE, ALTO_TILE), dst=tile.buffer,
+                           interpolation=cv2.INTER_AREA)
+                cv2.putText(tile.buffer, tile.nombre, (8, 20), cv2.FONT_HERSHEY_SIMPLEX,
+                            0.5, (0, 255, 0), 1, cv2.LINE_AA)
+                if tile.vigilante and tile.vigilante.estado != "ok":
+                    cv2.putText(tile.buffer, f"! {ESTADOS_IMAGEN[tile.vigilante.estado].upper()}",
+                                (8, ALTO_TILE - 12), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 1, cv2.LINE_AA)
+                tile.nuevo = True
+        except Exception as e:
+            print(f"Error decodificando {tile.nombre}: {e}")
+            tile.proxima_lectura = obtener_planificador().fallo(tile.host, "decodificador", tile.intentos + 1)
+        finally:
+            tile.en_curso = False
+            if not self._activo and tile.cap is not None:
+                tile.cap.release()
+                tile.cap = None
+
+    def detener(self):
+        self._activo = False
+        # Liberar las capturas fuera del hilo de Tk, cuando terminen las lecturas en curso
+        threading.Thread(target=self._liberar, daemon=True).start()
+
+    def _liberar(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for tile in self.tiles:
+            if tile.cap is not None:
+                tile.cap.release()
+                tile.cap = None
+
+
+def mostrar_muro_video():
+    """Ventana con todas las cámaras guardadas en cuadrícula"""
+    import cv2
+    import numpy as np
+
+    manager = CameraManager()
+    camaras = manager.listar_camaras()
+    if not camaras:
+        messagebox.showinfo("Muro de Video", "No hay cámaras guardadas.")
+        return
+
+    ventana_muro = tk.Toplevel()
+    ventana_muro.title("ShadowCam - Muro de Video")
+    ventana_muro.configure(bg=COLOR_FONDO)
+
+    pool = DecodePool()
+    for camara in camaras:
+        # Las celdas del muro usan siempre el substream
+        pool.agregar(camara, manager.obtener_perfil(camara, "secundario"))
+
+    por_pagina = COLUMNAS_MURO * FILAS_MURO
+    total_paginas = (len(pool.tiles) + por_pagina - 1) // por_pagina
+    columnas = min(COLUMNAS_MURO, len(pool.tiles))
+    filas = min(FILAS_MURO, (len(pool.tiles) + columnas - 1) // columnas)
+
+    # Imagen compuesta: una sola imagen para todas las celdas de la página
+    lienzo = np.zeros((filas * ALTO_TILE, columnas * ANCHO_TILE, 3), dtype=np.uint8)
+
+    label_muro = tk.Label(ventana_muro, bd=0, highlightthickness=0, bg=COLOR_FONDO)
+    label_muro.pack(padx=10, pady=10)
+    renderer = FrameRenderer(label_muro, ajustar=False)
+    renderer.mostrar(lienzo)
+
+    frame_controles = tk.Frame(ventana_muro, bg=COLOR_FONDO)
+    frame_controles.pack(fill=tk.X, padx=10, pady=5)
+    label_pagina = tk.Label(frame_controles, text="", font=("Consolas", 10),
+                            fg=COLOR_TEXTO, bg=COLOR_FONDO)
+    label_stats = tk.Label(frame_controles, text="", font=("Consolas", 9),
+                           fg=COLOR_TEXTO, bg=COLOR_FONDO)
+
+    estado = {"pagina": 0, "enfocado": None, "activo": True,
+              "composiciones": 0, "t_inicio": time.monotonic()}
+
+    def tiles_visibles():
+        inicio = estado["pagina"] * por_pagina
+        return pool.tiles[inicio:inicio + por_pagina]
+
+    def actualizar_modos():
+        if ventana_muro.state() == "iconic":
+            visibles = set()
+        else:
+            visibles = {t.indice for t in tiles_visibles()}
+        pool.establecer_modos(visibles, estado["enfocado"])
+
+    def cambiar_pagina(delta):
+        estado["pagina"] = (estado["pagina"] + delta) % total_paginas
+        estado["enfocado"] = None
+        lienzo[:] = 0
+        for tile in tiles_visibles():
+            tile.nuevo = True
+        label_pagina.config(text=f"Página {estado['pagina'] + 1}/{total_paginas}")
+        actualizar_modos()
+
+    def celda_en(event):
+        columna = event.x // ANCHO_TILE
+        fila = event.y // ALTO_TILE
+        if columna >= columnas or fila >= filas:
+            return None
+        posicion = fila * columnas + columna
+        visibles = tiles_visibles()
+        return visibles[posicion] if posicion < len(visibles) else None
+
+    def enfocar(event):
+        tile = celda_en(event)
+        estado["enfocado"] = None if tile is None or tile.indice == estado["enfocado"] else tile.indice
+        for t in tiles_visibles():
+            t.nuevo = True
+        actualizar_modos()
+
+    def abrir_en_visor(event):
+        tile = celda_en(event)
+        if tile is not None:
+            perfil = manager.obtener_perfil(tile.camara)
+            abrir_visor_camara(perfil['url'], f"Cámara Remota: {tile.nombre}", perfil, tile.camara)
+
+    def componer():
+        if not estado["activo"]:
+            return
+        actualizar_modos()
+        cambios = False
+        for posicion, tile in enumerate(tiles_visibles()):
+            if not tile.nuevo:
+                continue
+            y = (posicion // columnas) * ALTO_TILE
+            x = (posicion % columnas) * ANCHO_TILE
+            with tile.lock:
+                lienzo[y:y + ALTO_TILE, x:x + ANCHO_TILE] = tile.buffer
+                tile.nuevo = False
+            if tile.indice == estado["enfocado"]:
+                cv2.rectangle(lienzo, (x, y), (x + ANCHO_TILE - 1, y + ALTO_TILE - 1), (0, 255, 0), 2)
+            cambios = True
+
+        if cambios:
+            renderer.mostrar(lienzo)
+            estado["composiciones"] += 1
+
+        transcurrido = max(time.monotonic() - estado["t_inicio"], 1e-6)
+        conectadas = sum(1 for t in pool.tiles if t.estado == "conectado")
+        label_stats.config(text=f"Cámaras: {len(pool.tiles)} | Conectadas: {conectadas} | "
+                                f"Trabajadores: {pool.max_trabajadores} | "
+                                f"Refresco: {estado['composiciones'] / transcurrido:.1f} fps")
+        ventana_muro.after(REFRESCO_MURO_MS, componer)
+
+    def cerrar():
+        estado["activo"] = False
+        pool.detener()
+        ventana_muro.destroy()
+
+    label_muro.bind("<Button-1>", enfocar)
+    label_muro.bind("<Double-Button-1>", abrir_en_visor)
+
+    ttk.Button(frame_controles, text="◀ Anterior", command=lambda: cambiar_pagina(-1)).pack(side=tk.LEFT, padx=5)
+    label_pagina.pack(side=tk.LEFT, padx=5)
+    ttk.Button(frame_controles, text="Siguiente ▶", command=lambda: cambiar_pagina(1)).pack(side=tk.LEFT, padx=5)
+    label_stats.pack(side=tk.LEFT, padx=10)
+    ttk.Button(frame_controles, text="❌ Cerrar", command=cerrar).pack(side=tk.RIGHT, padx=5)
+    ventana_muro.protocol("WM_DELETE_WINDOW", cerrar)
+
+    cambiar_pagina(0)
+    pool.iniciar()
+    componer()
+
 # ---------------------- CREDITS BANNER ----------------------
 def mostrar_creditos():
     ventana_creditos = tk.Toplevel()
@@ -756,82 +1729,65 @@ def interfaz_login():
 
     login.mainloop()
 
-# ---------------------- FUNCIONES RED ----------------------
-def obtener_interfaces():
-    interfaces = []
-    for nombre, info in psutil.net_if_addrs().items():
-        for i in info:
-            if i.family == socket.AF_INET and not i.address.startswith("127."):
-                interfaces.append({"nombre": nombre, "ip": i.address, "mascara": i.netmask})
-    return interfaces
-
-def calcular_red(ip):
-    return str(ipaddress.ip_network(ip + "/24", strict=False))
-
-def escanear_red(rango_red):
-    paquete = Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=rango_red)
-    resultado = srp(paquete, timeout=2, verbose=False)[0]
-    dispositivos = []
-    for enviado, recibido in resultado:
-        dispositivos.append({'ip': recibido.psrc, 'mac': recibido.hwsrc})
-    return dispositivos
-
-def escanear_puertos(ip, puertos=CAM_PORTS):
-    abiertos = []
-    for puerto in puertos:
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            s.settimeout(0.5)
-            resultado = s.connect_ex((ip, puerto))
-            if resultado == 0:
-                abiertos.append(puerto)
-            s.close()
-        except:
-            continue
-    return abiertos
-
-def escaneo_avanzado(ip):
-    nm = nmap.PortScanner()
-    try:
-        nm.scan(ip, arguments='-sS -p 80,554,8080,8888 --open')
-        info = {}
-        if ip in nm.all_hosts():
-            info['puertos_abiertos'] = []
-            for puerto in nm[ip]['tcp']:
-                if nm[ip]['tcp'][puerto]['state'] == 'open':
-                    info['puertos_abiertos'].append(puerto)
-            info['servicios'] = [nm[ip]['tcp'][p]['name'] for p in info['puertos_abiertos']]
-            return info
-        else:
-            return {'puertos_abiertos': [], 'servicios': []}
-    except:
-        return {'puertos_abiertos': [], 'servicios': []}
-
-# ---------------------- FUNCIONES CÁMARAS ----------------------
-def construir_urls(ip, puertos):
-    urls = []
-    for puerto in puertos:
-        for user, pwd in DEFAULT_CREDS:
-            if user and pwd:
-                urls.append(f"rtsp://{user}:{pwd}@{ip}:{puerto}/")
-                urls.append(f"http://{user}:{pwd}@{ip}:{puerto}/video")
+# ---------------------- CONSOLA DE RESULTADOS ----------------------
+
+class LogConsole:
+    """Consola no bloqueante sobre un widget de texto.
+
+    Cualquier hilo puede llamar a ``escribir()`` o ``en_ui()``: solo se
+    encola. El bucle de Tk vacía la cola por lotes con ``after()``, inserta
+    cada lote de una vez y recorta las líneas más antiguas para que el
+    widget no crezca sin límite en sesiones largas.
+    """
+
+    def __init__(self, widget, max_lineas=MAX_LINEAS_CONSOLA,
+                 intervalo_ms=INTERVALO_CONSOLA_MS, lote=LOTE_CONSOLA):
+        self.widget = widget
+        self.max_lineas = max_lineas
+        self.intervalo_ms = intervalo_ms
+        self.lote = lote
+        self._cola = queue.SimpleQueue()
+        self.widget.after(self.intervalo_ms, self._vaciar)
+
+    def escribir(self, texto):
+        self._cola.put(texto)
+
+    def en_ui(self, funcion, *args):
+        """Ejecutar ``funcion(*args)`` en el hilo de Tk, en orden con el texto"""
+        self._cola.put((funcion, args))
+
+    def limpiar(self):
+        self.en_ui(self.widget.delete, "1.0", tk.END)
+
+    def _insertar(self, textos):
+        if not textos:
+            return
+        self.widget.insert(tk.END, "".join(textos))
+        lineas = int(self.widget.index("end-1c").split(".")[0])
+        if lineas > self.max_lineas:
+            self.widget.delete("1.0", f"{lineas - self.max_lineas + 1}.0")
+        self.widget.see(tk.END)
+
+    def _vaciar(self):
+        if not self.widget.winfo_exists():
+            return
+        textos = []
+        for _ in range(self.lote):
+            try:
+                elemento = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(elemento, str):
+                textos.append(elemento)
             else:
-                urls.append(f"rtsp://{ip}:{puerto}/")
-                urls.append(f"http://{ip}:{puerto}/video")
-    return urls
-
-def probar_stream(url, texto_resultados=None):
-    if texto_resultados:
-        texto_resultados.insert(tk.END, f"Probando: {url}\n")
-        texto_resultados.see(tk.END)
-        texto_resultados.update()
-    
-    cap = cv2.VideoCapture(url)
-    if cap.isOpened():
-        ret, frame = cap.read()
-        cap.release()
-        return ret
-    return False
+                # Respetar el orden: primero el texto pendiente, luego la llamada
+                self._insertar(textos)
+                textos = []
+                funcion, args = elemento
+                funcion(*args)
+        self._insertar(textos)
+        # Si quedó trabajo pendiente se sigue en cuanto Tk quede libre
+        self.widget.after(1 if not self._cola.empty() else self.intervalo_ms, self._vaciar)
 
 # ---------------------- FUNCIONES INTERFAZ ----------------------
 def iniciar_escaneo():
@@ -841,84 +1797,105 @@ def iniciar_escaneo():
         messagebox.showerror("Error", "Selecciona una interfaz de red.")
         return
 
+    interfaz = interfaces[seleccion]
+    red_interfaz = ipaddress.ip_network(calcular_red(interfaz["ip"], interfaz["mascara"]))
+    red = limitar_red(interfaz["ip"], red_interfaz)
+    if red != red_interfaz:
+        if not messagebox.askyesno("Red demasiado grande",
+                                   f"La red {red_interfaz} tiene {red_interfaz.num_addresses} direcciones.\n\n"
+                                   f"Solo se escaneará el segmento local {red} "
+                                   f"({red.num_addresses} direcciones). ¿Continuar?"):
+            return
+    elif red.num_addresses > HOSTS_CONFIRMACION:
+        if not messagebox.askyesno("Red grande",
+                                   f"La red {red} tiene {red.num_addresses} direcciones.\n"
+                                   "El escaneo puede tardar. ¿Continuar?"):
+            return
+    red = str(red)
+
     btn_escanear.config(state=tk.DISABLED)
-    btn_exportar_csv.config(state=tk.DISABLED)
+    btn_exportar_datos.config(state=tk.DISABLED)
     btn_exportar_pdf.config(state=tk.DISABLED)
-    btn_dashboard.config(state=tk.DISABLED)
     btn_ver_camara.config(state=tk.DISABLED)
     btn_guardar_camara.config(state=tk.DISABLED)
-    texto_resultados.delete(1.0, tk.END)
+    consola.limpiar()
     listbox_camaras.delete(0, tk.END)
     camaras_validas = []
 
-    interfaz = interfaces[seleccion]
-    red = calcular_red(interfaz["ip"])
-    texto_resultados.insert(tk.END, f"🔍 Escaneando red: {red}\n")
-    texto_resultados.update()
+    consola.escribir(f"🔍 Escaneando red: {red}\n")
 
     resultados = []
+    estadisticas_escaneo.reiniciar()
+    avanzado = var_avanzado.get()
+    completo = var_completo.get()
+    plantilla_nmap = int(combo_plantilla.get().lstrip("T"))
+
+    def mostrar_evento(evento):
+        tipo = evento["tipo"]
+        if tipo == "fragmento" and evento["total"] > 1:
+            consola.escribir(f"[{evento['completados']}/{evento['total']}] {evento['fragmento']}: "
+                             f"{evento['encontrados']} dispositivos\n")
+        elif tipo == "aviso":
+            consola.escribir(f"[!] {evento['mensaje']}\n")
+        elif tipo == "nmap":
+            consola.escribir(f"[nmap {evento['completados']}/{evento['total']}] {evento['ip']}\n")
+        elif tipo == "hosts":
+            consola.escribir(f"[+] Dispositivos encontrados: {evento['total']}\n\n")
+        elif tipo == "prueba":
+            consola.escribir(f"\nProbando acceso a cámara: {evento['url']}\n")
+        elif tipo == "camara":
+            consola.escribir(f"✅ Cámara accesible en: {evento['url']}\n")
+        elif tipo == "dispositivo":
+            estadisticas_escaneo.agregar(evento)
+            linea = f"IP: {evento['ip']}\tMAC: {evento['mac']}\tFabricante: {evento['fabricante']}\tPuertos abiertos: {evento['puertos_abiertos']}"
+            if evento.get('cambio') == "nuevo":
+                linea = "[NUEVO] " + linea
+            elif evento.get('cambio'):
+                linea = "[CAMBIADO] " + linea
+            if evento['posible_camara']:
+                linea += "   📽 POSIBLE CÁMARA DETECTADA"
+            if evento.get('url_camara'):
+                camaras_validas.append({'ip': evento['ip'], 'url': evento['url_camara']})
+                consola.en_ui(listbox_camaras.insert, tk.END, f"{evento['ip']} -> {evento['url_camara']}")
+            consola.escribir(linea + "\n")
+        elif tipo == "desaparecido":
+            consola.escribir(f"[DESAPARECIDO] IP: {evento['ip']}\tMAC: {evento['mac']}\tFabricante: {evento['fabricante']}\n")
+        elif tipo == "resumen":
+            consola.escribir(f"\n[=] Nuevos: {evento['nuevos']} | Cambiados: {evento['cambiados']} | "
+                             f"Desaparecidos: {evento['desaparecidos']} | Desde caché: {evento['reutilizados']}\n")
 
     def tarea_escaneo():
         try:
-            dispositivos = escanear_red(red)
-            texto_resultados.insert(tk.END, f"[+] Dispositivos encontrados: {len(dispositivos)}\n\n")
-            texto_resultados.update()
-
-            for d in dispositivos:
-                if var_avanzado.get():
-                    info_nmap = escaneo_avanzado(d['ip'])
-                    puertos = info_nmap.get('puertos_abiertos', [])
-                else:
-                    puertos = escanear_puertos(d['ip'])
-
-                d['puertos_abiertos'] = puertos
-
-                try:
-                    fabricante = MacLookup().lookup(d['mac'])
-                except:
-                    fabricante = "Desconocido"
-
-                d['fabricante'] = fabricante
-                d['posible_camara'] = any(p in puertos for p in CAM_PORTS)
-
-                linea = f"IP: {d['ip']}\tMAC: {d['mac']}\tFabricante: {fabricante}\tPuertos abiertos: {puertos}"
-                if d['posible_camara']:
-                    linea += "   📽 POSIBLE CÁMARA DETECTADA"
-                    
-                    # Probar conexión a las cámaras
-                    urls = construir_urls(d['ip'], [p for p in puertos if p in CAM_PORTS])
-                    for url in urls:
-                        texto_resultados.insert(tk.END, f"\nProbando acceso a cámara: {url}\n")
-                        texto_resultados.see(tk.END)
-                        texto_resultados.update()
-                        
-                        if probar_stream(url, texto_resultados):
-                            texto_resultados.insert(tk.END, f"✅ Cámara accesible en: {url}\n")
-                            texto_resultados.see(tk.END)
-                            texto_resultados.update()
-                            
-                            d['url_camara'] = url
-                            camaras_validas.append({'ip': d['ip'], 'url': url})
-                            listbox_camaras.insert(tk.END, f"{d['ip']} -> {url}")
-                            break
-
-                texto_resultados.insert(tk.END, linea + "\n")
-                texto_resultados.see(tk.END)
-                texto_resultados.update()
-
-                resultados.append(d)
+            resultados.extend(ejecutar_escaneo(red, mostrar_evento, avanzado, completo, plantilla_nmap))
         finally:
-            btn_escanear.config(state=tk.NORMAL)
-            btn_exportar_csv.config(state=tk.NORMAL)
-            btn_exportar_pdf.config(state=tk.NORMAL)
-            btn_dashboard.config(state=tk.NORMAL)
-            if camaras_validas:
-                btn_ver_camara.config(state=tk.NORMAL)
-                btn_guardar_camara.config(state=tk.NORMAL)
+            # Los widgets solo se tocan desde el hilo de Tk
+            def reactivar_botones():
+                btn_escanear.config(state=tk.NORMAL)
+                btn_exportar_datos.config(state=tk.NORMAL)
+                btn_exportar_pdf.config(state=tk.NORMAL)
+                if camaras_validas:
+                    btn_ver_camara.config(state=tk.NORMAL)
+                    btn_guardar_camara.config(state=tk.NORMAL)
+            consola.en_ui(reactivar_botones)
 
     hilo = threading.Thread(target=tarea_escaneo)
     hilo.start()
 
+def actualizar_tabla_oui():
+    """Cargar una tabla de fabricantes desde un archivo local (sin red)"""
+    archivo = filedialog.askopenfilename(filetypes=[("Tabla OUI", "*.txt"), ("Todos", "*.*")])
+    if not archivo:
+        return
+    try:
+        total = resolver_oui.actualizar_desde_archivo(archivo)
+    except OSError as e:
+        messagebox.showerror("Actualizar OUI", f"No se pudo leer el archivo:\n{e}")
+        return
+    if total:
+        messagebox.showinfo("Actualizar OUI", f"Tabla actualizada: {total} prefijos.")
+    else:
+        messagebox.showwarning("Actualizar OUI", "El archivo no contiene prefijos OUI válidos.")
+
 def ver_camara_seleccionada():
     idx = listbox_camaras.curselection()
     if not idx:
@@ -929,9 +1906,9 @@ def ver_camara_seleccionada():
     abrir_visor_camara(url, f"ShadowCam - Visor de cámara: {url}")
 
 def abrir_app():
-    global app, combo, interfaces, btn_escanear, texto_resultados
-    global btn_exportar_csv, btn_exportar_pdf, btn_dashboard, btn_ver_camara
-    global var_avanzado, listbox_camaras, camaras_validas, btn_guardar_camara
+    global app, combo, interfaces, btn_escanear, texto_resultados, consola
+    global btn_exportar_datos, btn_exportar_pdf, btn_dashboard, btn_ver_camara
+    global var_avanzado, var_completo, combo_plantilla, listbox_camaras, camaras_validas, btn_guardar_camara
 
     app = tk.Tk()
     app.title("ShadowCam - Enhanced Ethical Camera Detection & Remote Access System")
@@ -957,8 +1934,18 @@ def abrir_app():
     chk_nmap = ttk.Checkbutton(frame_opciones, text="Escaneo avanzado (nmap)", variable=var_avanzado)
     chk_nmap.grid(row=0, column=2, padx=5, pady=5)
 
+    # Plantilla de tiempos de nmap: T0 (más sigiloso) a T5 (más agresivo)
+    combo_plantilla = ttk.Combobox(frame_opciones, values=[f"T{n}" for n in range(6)],
+                                   width=4, state="readonly")
+    combo_plantilla.set(f"T{PLANTILLA_NMAP}")
+    combo_plantilla.grid(row=0, column=3, padx=5, pady=5)
+
+    var_completo = tk.BooleanVar()
+    chk_completo = ttk.Checkbutton(frame_opciones, text="Re-escaneo completo", variable=var_completo)
+    chk_completo.grid(row=0, column=4, padx=5, pady=5)
+
     btn_escanear = ttk.Button(frame_opciones, text="Iniciar escaneo", command=iniciar_escaneo)
-    btn_escanear.grid(row=0, column=3, padx=5, pady=5)
+    btn_escanear.grid(row=0, column=5, padx=5, pady=5)
 
     # Frame para los resultados y cámaras encontradas
     frame_contenido = tk.Frame(app, bg=COLOR_FONDO)
@@ -971,6 +1958,7 @@ def abrir_app():
     tk.Label(frame_resultados, text="Resultados del escaneo:", fg=COLOR_TEXTO, bg=COLOR_FONDO, font=FUENTE_CONSOLA).pack(anchor='w')
     texto_resultados = scrolledtext.ScrolledText(frame_resultados, height=25, width=80, bg="#1a1a1a", fg=COLOR_TEXTO, font=FUENTE_CONSOLA, insertbackground=COLOR_TEXTO)
     texto_resultados.pack(fill=tk.BOTH, expand=True, pady=5)
+    consola = LogConsole(texto_resultados)
     
     # Panel de cámaras
     frame_camaras = tk.Frame(frame_contenido, bg=COLOR_FONDO)
@@ -990,19 +1978,25 @@ def abrir_app():
     frame_botones = tk.Frame(app, bg=COLOR_FONDO)
     frame_botones.pack(pady=10, padx=10, fill=tk.X)
 
-    btn_exportar_csv = ttk.Button(frame_botones, text="Exportar a CSV", command=lambda: exportar_csv(), state=tk.DISABLED)
-    btn_exportar_csv.pack(side=tk.LEFT, padx=5)
+    btn_exportar_datos = ttk.Button(frame_botones, text="Exportar datos", command=lambda: exportar_datos(), state=tk.DISABLED)
+    btn_exportar_datos.pack(side=tk.LEFT, padx=5)
 
     btn_exportar_pdf = ttk.Button(frame_botones, text="Exportar a PDF", command=lambda: exportar_pdf(), state=tk.DISABLED)
     btn_exportar_pdf.pack(side=tk.LEFT, padx=5)
 
-    btn_dashboard = ttk.Button(frame_botones, text="Mostrar Dashboard", command=lambda: mostrar_dashboard(), state=tk.DISABLED)
+    btn_dashboard = ttk.Button(frame_botones, text="Mostrar Dashboard", command=lambda: mostrar_dashboard())
     btn_dashboard.pack(side=tk.LEFT, padx=5)
     
     # Nueva funcionalidad: Botón para gestión de cámaras
     btn_gestion = ttk.Button(frame_botones, text="🎥 Gestión de Cámaras", command=lambda: mostrar_gestion_camaras())
     btn_gestion.pack(side=tk.LEFT, padx=5)
     
+    btn_muro = ttk.Button(frame_botones, text="📺 Muro de Video", command=lambda: mostrar_muro_video())
+    btn_muro.pack(side=tk.LEFT, padx=5)
+    
+    btn_oui = ttk.Button(frame_botones, text="Actualizar OUI", command=lambda: actualizar_tabla_oui())
+    btn_oui.pack(side=tk.LEFT, padx=5)
+    
     # Añadir botón de créditos
     btn_creditos = ttk.Button(frame_botones, text="Acerca de", command=lambda: mostrar_creditos())
     btn_creditos.pack(side=tk.RIGHT, padx=5)
@@ -1016,91 +2010,99 @@ def abrir_app():
     tk.Label(frame_estado, text="© 2024 AndresDev - https://andresgonzalezdev444.github.io/ - ShadowCam v2.1", 
              font=("Consolas", 8), fg=COLOR_TEXTO, bg="#101010").pack(side=tk.RIGHT, padx=10)
     
-    # Inicializar gestor de cámaras
+    # Inicializar gestor de cámaras y monitor de salud en segundo plano
     CameraManager()
+    obtener_monitor().iniciar()
+    obtener_nvr().iniciar()
+    # Endpoint local de métricas de streams, solo si se pide expresamente
+    if os.environ.get("SHADOWCAM_METRICAS_PUERTO"):
+        try:
+            servir_metricas(int(os.environ["SHADOWCAM_METRICAS_PUERTO"]))
+        except (ValueError, OSError) as e:
+            print(f"No se pudo abrir el endpoint de métricas: {e}")
     
     app.mainloop()
 
 # ---------------------- EXPORTACIONES ----------------------
-def exportar_csv():
+def exportar_datos():
     if not resultados:
         messagebox.showwarning("Advertencia", "No hay datos para exportar.")
         return
-    archivo = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV files", "*.csv")])
+    archivo = filedialog.asksaveasfilename(defaultextension=".csv",
+                                           filetypes=[("CSV files", "*.csv"),
+                                                      ("JSON Lines", "*.jsonl"),
+                                                      ("Parquet", "*.parquet")])
     if archivo:
-        df = pd.DataFrame(resultados)
-        df.to_csv(archivo, index=False)
-        messagebox.showinfo("Exportar CSV", f"Datos exportados a:\n{archivo}")
-        
-        # Añadir información de marca de agua con los créditos
         try:
-            with open(archivo, 'a') as f:
-                f.write("\n\n# ---------------------- ShadowCam ----------------------\n")
-                f.write("# Enhanced Ethical Camera Detection & Remote Access System v2.1\n")
-                f.write("# Hacking Ético Desarrollado por AndresDev.\n")
-                f.write("# © 2024 - Todos los derechos reservados\n")
-                f.write("# web: https://andresgonzalezdev444.github.io/\n")
-                f.write("# ----------------------------------------------------------\n")
-        except:
-            pass
+            filas = exportar(resultados, archivo)
+        except (ValueError, ImportError, OSError) as e:
+            messagebox.showerror("Exportar", f"No se pudo exportar:\n{e}")
+            return
+        messagebox.showinfo("Exportar", f"{filas} dispositivos exportados a:\n{archivo}")
 
 def exportar_pdf():
     if not resultados:
         messagebox.showwarning("Advertencia", "No hay datos para exportar.")
         return
     archivo = filedialog.asksaveasfilename(defaultextension=".pdf", filetypes=[("PDF files", "*.pdf")])
-    if archivo:
-        c = canvas.Canvas(archivo, pagesize=letter)
-        ancho, alto = letter
-        
-        # Encabezado con logo y título
-        c.setFont("Helvetica-Bold", 18)
-        c.drawString(30, alto - 40, "ShadowCam v2.1 - Reporte de Análisis")
-        c.setFont("Helvetica", 12)
-        c.drawString(30, alto - 60, "Enhanced Ethical Camera Detection & Remote Access System")
-        
-        # Línea divisoria
-        c.line(30, alto - 70, ancho - 30, alto - 70)
-        
-        # Datos del reporte
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(30, alto - 100, "Dispositivos escaneados:")
-        
-        c.setFont("Helvetica", 10)
-        y = alto - 120
-        for d in resultados:
-            linea = f"IP: {d['ip']}  MAC: {d['mac']}  Fabricante: {d['fabricante']}  Puertos: {d['puertos_abiertos']}  Camara: {'Sí' if d['posible_camara'] else 'No'}"
-            c.drawString(30, y, linea)
-            y -= 15
-            if y < 100:  # Asegurar espacio para el pie de página
-                c.showPage()
-                c.setFont("Helvetica", 10)
-                y = alto - 40
-        
-        # Añadir pie de página con créditos
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(30, 60, "---------------------- ShadowCam v2.1 ----------------------")
-        c.setFont("Helvetica", 9)
-        c.drawString(30, 45, "Enhanced Ethical Camera Detection & Remote Access System")
-        c.drawString(30, 35, "Hacking Ético Desarrollado por AndresDev.")
-        c.drawString(30, 25, "© 2024 - Todos los derechos reservados")
-        c.drawString(30, 15, "web: https://andresgonzalezdev444.github.io/")
-        
-        c.save()
-        messagebox.showinfo("Exportar PDF", f"Datos exportados a:\n{archivo}")
+    if not archivo:
+        return
+
+    # El reporte se genera en otro hilo; el progreso vuelve a Tk por la consola
+    datos = list(resultados)
+    btn_exportar_pdf.config(state=tk.DISABLED)
+    ventana = tk.Toplevel(app)
+    ventana.title("Exportar PDF")
+    ventana.configure(bg=COLOR_FONDO)
+    ventana.resizable(False, False)
+    tk.Label(ventana, text=f"Generando reporte de {len(datos)} dispositivos...",
+             fg=COLOR_TEXTO, bg=COLOR_FONDO, font=FUENTE_CONSOLA).pack(padx=15, pady=(15, 5))
+    barra = ttk.Progressbar(ventana, length=320, mode="determinate")
+    barra.pack(padx=15, pady=5)
+    label_pagina = tk.Label(ventana, text="", fg=COLOR_TEXTO, bg=COLOR_FONDO, font=("Consolas", 9))
+    label_pagina.pack(padx=15, pady=(0, 15))
+
+    def actualizar(completados, total, pagina):
+        if ventana.winfo_exists():
+            barra.configure(maximum=total, value=completados)
+            label_pagina.config(text=f"Página {pagina}")
+
+    def terminar(error):
+        if ventana.winfo_exists():
+            ventana.destroy()
+        btn_exportar_pdf.config(state=tk.NORMAL)
+        if error:
+            messagebox.showerror("Exportar PDF", f"No se pudo generar el reporte:\n{error}")
+        else:
+            messagebox.showinfo("Exportar PDF", f"Datos exportados a:\n{archivo}")
+
+    def tarea_pdf():
+        error = None
+        try:
+            escribir_pdf(datos, archivo, lambda *avance: consola.en_ui(actualizar, *avance))
+        except Exception as e:
+            error = e
+        consola.en_ui(terminar, error)
+
+    threading.Thread(target=tarea_pdf, daemon=True).start()
 
 # ---------------------- DASHBOARD ----------------------
 def mostrar_dashboard():
-    if not resultados:
-        messagebox.showwarning("Advertencia", "No hay datos para mostrar.")
-        return
-    df = pd.DataFrame(resultados)
-    conteo_fabricantes = df['fabricante'].value_counts()
-    camaras_por_fabricante = df[df['posible_camara'] == True]['fabricante'].value_counts()
+    """Dashboard en vivo alimentado por los agregados incrementales del escaneo.
+
+    Las barras y los textos se crean una sola vez como artistas animados y
+    cada refresco solo cambia sus datos y los redibuja con blitting sobre
+    el fondo guardado. El refresco va como mucho cada
+    ``INTERVALO_DASHBOARD_MS`` y solo si llegaron dispositivos nuevos, así
+    el coste no depende del tamaño del escaneo. Solo se redibuja la figura
+    completa cuando un eje necesita crecer (y entonces se duplica).
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
     ventana_graf = tk.Toplevel()
     ventana_graf.title("Dashboard - ShadowCam v2.1")
-    ventana_graf.geometry("800x650")
+    ventana_graf.geometry("900x650")
     ventana_graf.configure(bg=COLOR_FONDO)
 
     tk.Label(ventana_graf, text="Dashboard ShadowCam v2.1", font=("Consolas", 16, "bold"), 
@@ -1109,49 +2111,95 @@ def mostrar_dashboard():
     frame_graficos = tk.Frame(ventana_graf, bg=COLOR_FONDO)
     frame_graficos.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-    # Gráfico de todos los dispositivos
-    fig1 = plt.Figure(figsize=(5, 4), facecolor=COLOR_FONDO)
-    ax1 = fig1.add_subplot(111)
-    conteo_fabricantes.plot(kind='bar', ax=ax1, color='green')
-    ax1.set_title('Dispositivos por Fabricante', color=COLOR_TEXTO)
-    ax1.set_ylabel('Cantidad', color=COLOR_TEXTO)
-    ax1.set_xlabel('Fabricante', color=COLOR_TEXTO)
-    ax1.tick_params(axis='x', colors=COLOR_TEXTO, rotation=45)
-    ax1.tick_params(axis='y', colors=COLOR_TEXTO)
-    fig1.tight_layout()
-
-    # Gráfico de cámaras detectadas
-    fig2 = plt.Figure(figsize=(5, 4), facecolor=COLOR_FONDO)
-    ax2 = fig2.add_subplot(111)
-    if not camaras_por_fabricante.empty:
-        camaras_por_fabricante.plot(kind='pie', ax=ax2, autopct='%1.1f%%', startangle=90, colors=['green', 'lime', 'darkgreen', 'lightgreen'])
-        ax2.set_title('Cámaras por Fabricante', color=COLOR_TEXTO)
-    else:
-        ax2.text(0.5, 0.5, 'No se detectaron cámaras', ha='center', va='center', transform=ax2.transAxes, color=COLOR_TEXTO)
-        ax2.set_title('Cámaras por Fabricante', color=COLOR_TEXTO)
-    ax2.tick_params(axis='x', colors=COLOR_TEXTO)
-    fig2.tight_layout()
-
-    # Añadir gráficos a la ventana
-    canvas1 = FigureCanvasTkAgg(fig1, master=frame_graficos)
-    canvas1.draw()
-    canvas1.get_tk_widget().pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-    canvas2 = FigureCanvasTkAgg(fig2, master=frame_graficos)
-    canvas2.draw()
-    canvas2.get_tk_widget().pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+    fig = Figure(figsize=(9, 4.5), facecolor=COLOR_FONDO)
+    ax1 = fig.add_subplot(1, 2, 1, facecolor=COLOR_FONDO)
+    ax2 = fig.add_subplot(1, 2, 2, facecolor=COLOR_FONDO)
+    for ax in (ax1, ax2):
+        ax.tick_params(colors=COLOR_TEXTO)
+        for borde in ax.spines.values():
+            borde.set_color("#1f5f1f")
+
+    # Dispositivos y cámaras por fabricante (los TOP_DASHBOARD más frecuentes)
+    posiciones = range(TOP_DASHBOARD)
+    barras_dispositivos = ax1.barh(posiciones, [0] * TOP_DASHBOARD, color="green", animated=True)
+    barras_camaras = ax1.barh(posiciones, [0] * TOP_DASHBOARD, height=0.4, color="lime", animated=True)
+    nombres = [ax1.text(0, i, "", va="center", ha="left", fontsize=8, color="white", animated=True)
+               for i in posiciones]
+    ax1.set_yticks([])
+    ax1.invert_yaxis()
+    ax1.set_xlim(0, 10)
+    ax1.set_title("Dispositivos / cámaras por fabricante", color=COLOR_TEXTO)
+
+    # Alcanzabilidad: dispositivos, posibles cámaras y cámaras accesibles
+    etiquetas = ["Dispositivos", "Posibles\ncámaras", "Accesibles"]
+    barras_alcance = ax2.bar(range(3), [0, 0, 0], color=["green", "lime", "#00cc66"], animated=True)
+    valores = [ax2.text(i, 0, "0", ha="center", va="bottom", fontsize=9, color=COLOR_TEXTO, animated=True)
+               for i in range(3)]
+    ax2.set_xticks(range(3))
+    ax2.set_xticklabels(etiquetas)
+    ax2.set_ylim(0, 10)
+    ax2.set_title("Alcanzabilidad", color=COLOR_TEXTO)
+    fig.tight_layout()
+
+    artistas = [*barras_dispositivos, *barras_camaras, *nombres, *barras_alcance, *valores]
+    canvas_graf = FigureCanvasTkAgg(fig, master=frame_graficos)
+    canvas_graf.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    estado = {"fondo": None, "version": -1}
+
+    def dibujar_artistas():
+        for artista in artistas:
+            artista.axes.draw_artist(artista)
+
+    def al_dibujar(evento):
+        # Tras cualquier redibujado completo (inicio, redimensión, cambio de
+        # escala) se guarda el fondo sin los artistas animados
+        estado["fondo"] = canvas_graf.copy_from_bbox(fig.bbox)
+        dibujar_artistas()
+
+    canvas_graf.mpl_connect("draw_event", al_dibujar)
     
     # Añadir estadísticas
     frame_stats = tk.Frame(ventana_graf, bg="#101010")
     frame_stats.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
-    
-    total_dispositivos = len(resultados)
-    total_camaras = len([d for d in resultados if d.get('posible_camara', False)])
-    camaras_accesibles = len(camaras_validas)
-    camaras_guardadas_count = len(camaras_guardadas)
-    
-    stats_text = f"Dispositivos: {total_dispositivos} | Cámaras detectadas: {total_camaras} | Accesibles: {camaras_accesibles} | Guardadas: {camaras_guardadas_count}"
-    tk.Label(frame_stats, text=stats_text, font=("Consolas", 10), fg=COLOR_TEXTO, bg="#101010").pack(pady=5)
+    label_stats = tk.Label(frame_stats, text="", font=("Consolas", 10), fg=COLOR_TEXTO, bg="#101010")
+    label_stats.pack(pady=5)
+
+    def refrescar():
+        if not ventana_graf.winfo_exists():
+            return
+        if estadisticas_escaneo.version != estado["version"]:
+            datos = estadisticas_escaneo.instantanea(top=TOP_DASHBOARD)
+            estado["version"] = datos["version"]
+            fabricantes = datos["fabricantes"] + [("", [0, 0, 0])] * (TOP_DASHBOARD - len(datos["fabricantes"]))
+            for barra_d, barra_c, nombre, (fabricante, cuentas) in zip(barras_dispositivos, barras_camaras,
+                                                                         nombres, fabricantes):
+                barra_d.set_width(cuentas[0])
+                barra_c.set_width(cuentas[1])
+                nombre.set_text(f"{fabricante[:28]} ({cuentas[0]})" if fabricante else "")
+            alcance = [datos["dispositivos"], datos["camaras"], datos["accesibles"]]
+            for barra, valor, n in zip(barras_alcance, valores, alcance):
+                barra.set_height(n)
+                valor.set_y(n)
+                valor.set_text(str(n))
+
+            label_stats.config(text=f"Dispositivos: {datos['dispositivos']} | Cámaras detectadas: {datos['camaras']} | "
+                                    f"Accesibles: {datos['accesibles']} | Fabricantes: {datos['total_fabricantes']} | "
+                                    f"Guardadas: {CameraManager().contar_camaras()}")
+
+            # Cambio de escala: redibujado completo, que vuelve a guardar el fondo
+            maximo_fab = fabricantes[0][1][0]
+            if maximo_fab > ax1.get_xlim()[1] or max(alcance) * 1.1 > ax2.get_ylim()[1]:
+                ax1.set_xlim(0, max(ax1.get_xlim()[1], maximo_fab * 2))
+                ax2.set_ylim(0, max(ax2.get_ylim()[1], max(alcance) * 2))
+                canvas_graf.draw()
+            elif estado["fondo"] is not None:
+                canvas_graf.restore_region(estado["fondo"])
+                dibujar_artistas()
+                canvas_graf.blit(fig.bbox)
+        ventana_graf.after(INTERVALO_DASHBOARD_MS, refrescar)
+
+    canvas_graf.draw()
+    refrescar()
     
     # Añadir panel de créditos en la parte inferior
     frame_creditos = tk.Frame(ventana_graf, bg="#101010", height=80)
@@ -0,0 +1,301 @@
+# ShadowCam - Línea de comandos y modo daemon sin interfaz gráfica
+# Cada resultado se emite como una línea JSON en la salida estándar, lista
+# para cron, journald o cualquier herramienta que procese JSON Lines.
+#
+# Uso:
+#   python shadowcam_cli.py interfaces
+#   python shadowcam_cli.py escanear [--red CIDR | --interfaz NOMBRE] [--avanzado]
+#                                    [--plantilla-nmap 0-5] [--completo] [--forzar]
+#                                    [--exportar ARCHIVO.csv|.jsonl|.parquet] [--pdf ARCHIVO]
+#   python shadowcam_cli.py camaras
+#   python shadowcam_cli.py sondear [--decodificar]
+#   python shadowcam_cli.py grabacion ID [--activar | --desactivar] [--segmento 60]
+#                                     [--cuota-mb 2048] [--dias 7]
+#   python shadowcam_cli.py analisis ID [--movimiento | --sin-movimiento] [--fps 2]
+#                                    [--umbral 25] [--area-min 0.002] [--zona X,Y,ANCHO,ALTO]
+#                                    [--vigilancia | --sin-vigilancia] [--fps-huella 1]
+#   python shadowcam_cli.py eventos ID [--desde SEGUNDOS] [--tipo movimiento]
+#   python shadowcam_cli.py daemon [--intervalo 60] [--escaneo-cada 3600] [--red CIDR]
+#                                  [--metricas-puerto 9464] [--eventos-stream] [--grabar]
+
+import argparse
+import ipaddress
+import json
+import signal
+import sys
+import threading
+import time
+
+from shadowcam_core import (
+    INTERVALO_MONITOR, PLANTILLA_NMAP, HOSTS_CONFIRMACION, MAX_HOSTS_ESCANEO, CameraManager, obtener_monitor, obtener_interfaces,
+    calcular_red, limitar_red, ejecutar_escaneo, abrir_exportador, escribir_pdf,
+    obtener_metricas, servir_metricas, obtener_nvr,
+)
+
+# Las líneas JSON van a la salida estándar original; los print() de
+# diagnóstico del núcleo se desvían a stderr para no mezclarse con ellas
+_salida = sys.stdout
+_lock_salida = threading.Lock()
+
+def emitir(evento):
+    """Escribir un evento como una línea JSON con marca de tiempo"""
+    linea = json.dumps({"ts": time.time(), **evento}, ensure_ascii=False, default=str)
+    with _lock_salida:
+        _salida.write(linea + "\n")
+        _salida.flush()
+
+def resolver_red(args):
+    """Red a escanear, con los mismos límites que la interfaz gráfica.
+
+    Una red mayor que MAX_HOSTS_ESCANEO se recorta al segmento local de la
+    interfaz que la contiene (o se rechaza si ninguna está dentro), y una
+    mayor que HOSTS_CONFIRMACION necesita ``--forzar``.
+    """
+    interfaces = obtener_interfaces()
+    if args.red:
+        red_pedida = ipaddress.ip_network(args.red, strict=False)
+        locales = [i for i in interfaces if ipaddress.ip_address(i["ip"]) in red_pedida]
+        if red_pedida.num_addresses > MAX_HOSTS_ESCANEO and not locales:
+            raise SystemExit(f"La red {red_pedida} tiene {red_pedida.num_addresses} direcciones "
+                             f"(máximo {MAX_HOSTS_ESCANEO}) y ninguna interfaz está dentro para recortarla")
+        ip = locales[0]["ip"] if locales else None
+    else:
+        if args.interfaz:
+            interfaces = [i for i in interfaces if i["nombre"] == args.interfaz]
+        if not interfaces:
+            raise SystemExit(f"Interfaz no encontrada: {args.interfaz or 'ninguna con IPv4'}")
+        ip = interfaces[0]["ip"]
+        red_pedida = ipaddress.ip_network(calcular_red(ip, interfaces[0]["mascara"]))
+
+    red = limitar_red(ip, red_pedida) if ip else red_pedida
+    if red != red_pedida:
+        print(f"La red {red_pedida} tiene {red_pedida.num_addresses} direcciones; "
+              f"solo se escaneará el segmento local {red}", file=sys.stderr)
+    if red.num_addresses > HOSTS_CONFIRMACION and not args.forzar:
+        raise SystemExit(f"La red {red} tiene {red.num_addresses} direcciones; "
+                         "usa --forzar para escanearla")
+    print(f"Rango a escanear: {red} ({red.num_addresses} direcciones)", file=sys.stderr)
+    return str(red)
+
+def escanear(args):
+    red = resolver_red(args)
+    emitir({"tipo": "inicio", "red": red})
+
+    # Las exportaciones se escriben fila a fila mientras avanza el escaneo
+    try:
+        exportadores = [abrir_exportador(archivo) for archivo in args.exportar]
+    except (ValueError, ImportError, OSError) as e:
+        raise SystemExit(f"No se pudo abrir la exportación: {e}")
+
+    def emitir_y_exportar(evento):
+        emitir(evento)
+        if evento["tipo"] == "dispositivo":
+            for exportador in exportadores:
+                exportador.escribir(evento)
+
+    try:
+        resultados = ejecutar_escaneo(red, emitir_y_exportar, args.avanzado, args.completo,
+                                      args.plantilla_nmap)
+    finally:
+        for exportador in exportadores:
+            exportador.cerrar()
+    for archivo, exportador in zip(args.exportar, exportadores):
+        emitir({"tipo": "exportado", "archivo": archivo, "filas": exportador.filas})
+    if args.pdf:
+        escribir_pdf(resultados, args.pdf)
+        emitir({"tipo": "exportado", "archivo": args.pdf, "filas": len(resultados)})
+    return resultados
+
+def cmd_interfaces(args):
+    for interfaz in obtener_interfaces():
+        emitir({"tipo": "interfaz", **interfaz,
+                "red": calcular_red(interfaz["ip"], interfaz["mascara"])})
+
+def cmd_escanear(args):
+    escanear(args)
+
+def cmd_camaras(args):
+    gestor = CameraManager()
+    for camara in gestor.listar_camaras():
+        emitir({"tipo": "camara_guardada", **camara,
+                "estado": gestor.estadisticas_camara(camara)})
+
+def cmd_sondear(args):
+    monitor = obtener_monitor()
+    futuros = [monitor.enviar(camara, args.decodificar) for camara in CameraManager().listar_camaras()]
+    for futuro in futuros:
+        emitir({"tipo": "sondeo", **futuro.result()})
+    monitor.detener()
+
+def cmd_grabacion(args):
+    """Consultar o cambiar la grabación continua de una cámara"""
+    cambios = {clave: valor for clave, valor in (("activa", args.activa), ("segmento_s", args.segmento),
+                                                 ("cuota_mb", args.cuota_mb), ("dias", args.dias))
+               if valor is not None}
+    nvr = obtener_nvr()
+    if cambios and not nvr.configurar(args.camara_id, **cambios):
+        raise SystemExit(f"No se pudo configurar la cámara {args.camara_id}")
+    gestor = CameraManager()
+    camara = gestor.obtener_camara(args.camara_id)
+    if camara is None:
+        raise SystemExit(f"Cámara no encontrada: {args.camara_id}")
+    emitir({"tipo": "grabacion_config", "camara_id": args.camara_id, **gestor.obtener_grabacion(camara)})
+
+def cmd_analisis(args):
+    """Consultar o cambiar el análisis de video de una cámara"""
+    gestor = CameraManager()
+    camara = gestor.obtener_camara(args.camara_id)
+    if camara is None:
+        raise SystemExit(f"Cámara no encontrada: {args.camara_id}")
+    cambios = {clave: valor for clave, valor in (("movimiento", args.movimiento), ("fps", args.fps),
+                                                 ("umbral", args.umbral), ("area_min", args.area_min),
+                                                 ("zonas", args.zona), ("vigilancia", args.vigilancia),
+                                                 ("fps_huella", args.fps_huella)) if valor is not None}
+    configuracion = {**gestor.obtener_analisis(camara), **cambios}
+    if cambios and not gestor.actualizar_camara(args.camara_id, analisis=configuracion):
+        raise SystemExit(f"No se pudo configurar la cámara {args.camara_id}")
+    emitir({"tipo": "analisis_config", "camara_id": args.camara_id, **configuracion})
+
+def cmd_eventos(args):
+    desde = time.time() - args.desde if args.desde else 0
+    for evento in CameraManager().listar_eventos(args.camara_id, desde, args.tipo):
+        emitir({**evento, "tipo": "evento", "evento": evento["tipo"], "camara_id": args.camara_id})
+
+def zona(texto):
+    valores = [float(v) for v in texto.split(",")]
+    if len(valores) != 4 or not all(0 <= v <= 1 for v in valores):
+        raise argparse.ArgumentTypeError("se esperan X,Y,ANCHO,ALTO en fracciones del frame")
+    return valores
+
+def cmd_daemon(args):
+    """Rondas de sondeo periódicas y, opcionalmente, escaneos de la red"""
+    parar = threading.Event()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(senal, lambda *_: parar.set())
+
+    monitor = obtener_monitor()
+    nvr = obtener_nvr()
+    if args.grabar:
+        nvr.emitir = emitir
+        nvr.iniciar()
+    if args.eventos_stream:
+        obtener_metricas().suscribir(emitir)
+    servidor = None
+    if args.metricas_puerto:
+        try:
+            servidor = servir_metricas(args.metricas_puerto, args.metricas_host)
+        except OSError as e:
+            raise SystemExit(f"No se pudo abrir el endpoint de métricas: {e}")
+    proximo_escaneo = time.monotonic() if args.escaneo_cada else None
+    emitir({"tipo": "daemon", "estado": "iniciado", "intervalo": args.intervalo,
+            "escaneo_cada": args.escaneo_cada, "metricas_puerto": args.metricas_puerto})
+    while not parar.is_set():
+        if proximo_escaneo is not None and time.monotonic() >= proximo_escaneo:
+            try:
+                escanear(args)
+            except Exception as e:
+                emitir({"tipo": "error", "origen": "escaneo", "detalle": str(e)})
+            proximo_escaneo = time.monotonic() + args.escaneo_cada
+
+        for futuro in monitor.ronda():
+            try:
+                emitir({"tipo": "sondeo", **futuro.result()})
+            except Exception as e:
+                emitir({"tipo": "error", "origen": "sondeo", "detalle": str(e)})
+        parar.wait(args.intervalo)
+
+    monitor.detener()
+    nvr.detener()
+    if servidor is not None:
+        servidor.shutdown()
+    emitir({"tipo": "daemon", "estado": "detenido"})
+
+def opciones_escaneo(parser):
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument("--red", help="Red en notación CIDR, p. ej. 192.168.1.0/24")
+    grupo.add_argument("--interfaz", help="Interfaz cuya red se escanea (por defecto la primera)")
+    parser.add_argument("--avanzado", action="store_true", help="Sondear puertos con nmap")
+    parser.add_argument("--plantilla-nmap", type=int, choices=range(6), default=PLANTILLA_NMAP,
+                        help="Plantilla de tiempos de nmap (-T0 a -T5)")
+    parser.add_argument("--completo", action="store_true", help="Ignorar la caché de dispositivos")
+    parser.add_argument("--forzar", action="store_true",
+                        help=f"Escanear redes de más de {HOSTS_CONFIRMACION} direcciones")
+    parser.add_argument("--exportar", action="append", default=[], metavar="ARCHIVO",
+                        help="Exportar en streaming a .csv, .jsonl o .parquet (repetible)")
+    parser.add_argument("--pdf", help="Exportar los resultados a este PDF")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ShadowCam sin interfaz gráfica (salida JSON Lines)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    sub.add_parser("interfaces", help="Listar interfaces IPv4").set_defaults(funcion=cmd_interfaces)
+
+    p = sub.add_parser("escanear", help="Escanear una red una vez")
+    opciones_escaneo(p)
+    p.set_defaults(funcion=cmd_escanear)
+
+    sub.add_parser("camaras", help="Listar el inventario de cámaras").set_defaults(funcion=cmd_camaras)
+
+    p = sub.add_parser("sondear", help="Sondear una vez todas las cámaras guardadas")
+    p.add_argument("--decodificar", action="store_true", help="Decodificar un frame de cada cámara")
+    p.set_defaults(funcion=cmd_sondear)
+
+    p = sub.add_parser("grabacion", help="Consultar o configurar la grabación continua de una cámara")
+    p.add_argument("camara_id", type=int)
+    activa = p.add_mutually_exclusive_group()
+    activa.add_argument("--activar", dest="activa", action="store_true", default=None)
+    activa.add_argument("--desactivar", dest="activa", action="store_false")
+    p.add_argument("--segmento", type=int, help="Duración de cada segmento en segundos")
+    p.add_argument("--cuota-mb", type=float, help="Espacio máximo en disco (0 = sin límite)")
+    p.add_argument("--dias", type=float, help="Antigüedad máxima de los segmentos (0 = sin límite)")
+    p.set_defaults(funcion=cmd_grabacion)
+
+    p = sub.add_parser("analisis", help="Consultar o configurar el análisis de video de una cámara")
+    p.add_argument("camara_id", type=int)
+    movimiento = p.add_mutually_exclusive_group()
+    movimiento.add_argument("--movimiento", dest="movimiento", action="store_true", default=None)
+    movimiento.add_argument("--sin-movimiento", dest="movimiento", action="store_false")
+    p.add_argument("--fps", type=float, help="Frames analizados por segundo")
+    p.add_argument("--umbral", type=int, help="Diferencia de gris (0-255) que cuenta como cambio")
+    p.add_argument("--area-min", type=float, help="Fracción mínima del frame que debe cambiar")
+    p.add_argument("--zona", type=zona, action="append",
+                   help="Zona ignorada X,Y,ANCHO,ALTO en fracciones (repetible; sustituye las guardadas)")
+    vigilancia = p.add_mutually_exclusive_group()
+    vigilancia.add_argument("--vigilancia", dest="vigilancia", action="store_true", default=None,
+                            help="Vigilar imagen congelada, negra o tapada y cambios de escena")
+    vigilancia.add_argument("--sin-vigilancia", dest="vigilancia", action="store_false")
+    p.add_argument("--fps-huella", type=float, help="Muestras de vigilancia por segundo")
+    p.set_defaults(funcion=cmd_analisis)
+
+    p = sub.add_parser("eventos", help="Listar los eventos de análisis de una cámara")
+    p.add_argument("camara_id", type=int)
+    p.add_argument("--desde", type=float, default=0, help="Solo los de los últimos N segundos")
+    p.add_argument("--tipo", help="Filtrar por tipo de evento (p. ej. movimiento)")
+    p.set_defaults(funcion=cmd_eventos)
+
+    p = sub.add_parser("daemon", help="Sondear periódicamente y re-escanear la red")
+    p.add_argument("--intervalo", type=float, default=INTERVALO_MONITOR,
+                   help="Segundos entre rondas de sondeo")
+    p.add_argument("--escaneo-cada", type=float, default=0,
+                   help="Segundos entre escaneos de la red (0 = no escanear)")
+    p.add_argument("--metricas-puerto", type=int, default=0,
+                   help="Servir /metrics (Prometheus) y /eventos en este puerto (0 = no)")
+    p.add_argument("--metricas-host", default="127.0.0.1",
+                   help="Dirección en la que escucha el endpoint de métricas")
+    p.add_argument("--eventos-stream", action="store_true",
+                   help="Emitir también los eventos de apertura, lectura y liberación de streams")
+    p.add_argument("--grabar", action="store_true",
+                   help="Grabar continuamente las cámaras con la grabación activada")
+    opciones_escaneo(p)
+    p.set_defaults(funcion=cmd_daemon)
+
+    args = parser.parse_args(argv)
+    sys.stdout = sys.stderr
+    try:
+        args.funcion(args)
+    finally:
+        sys.stdout = _salida
+
+
+if __name__ == "__main__":
+    main()
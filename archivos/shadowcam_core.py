@@ -0,0 +1,3443 @@
+# ShadowCam - Núcleo sin interfaz gráfica
+# Escaneo de red, inventario de cámaras, monitor de salud y exportaciones.
+# No importa Tkinter, matplotlib ni reportlab: lo usan tanto la aplicación
+# de escritorio (shadowcam2.py) como la línea de comandos (shadowcam_cli.py).
+#
+# Las dependencias pesadas (scapy, OpenCV y numpy, requests, reportlab y
+# pyarrow) se importan dentro de la función que las usa, así importar el
+# núcleo no cuesta más que la biblioteca estándar y psutil. nmap se ejecuta
+# como binario, no como módulo.
+
+import psutil
+import socket
+import ipaddress
+import threading
+import asyncio
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+import json
+import os
+import sys
+import sqlite3
+import csv
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from collections import Counter, deque
+from bisect import bisect_left, bisect_right
+import time
+import math
+import random
+import hashlib
+import base64
+import atexit
+from urllib.parse import urlsplit, unquote
+
+# Tabla OUI local; por defecto la misma caché que usa mac_vendor_lookup
+ARCHIVO_OUI = os.path.join(os.path.expanduser("~"), ".cache", "mac-vendors.txt")
+
+# Base de datos con el inventario de cámaras y el historial de sondeos
+ARCHIVO_BD = "shadowcam.db"
+
+# Segundos que un dispositivo escaneado se reutiliza sin volver a sondearlo
+TTL_CACHE_DISPOSITIVOS = 6 * 3600
+
+# Archivos del formato anterior, migrados a la base de datos al arrancar
+ARCHIVO_CAMARAS = "camaras_guardadas.json"
+ARCHIVO_HISTORIAL = "historial_camaras.jsonl"
+INTERVALO_MONITOR = 60  # segundos entre rondas de sondeo
+MAX_SONDEOS_SIMULTANEOS = 8
+INTERVALO_SONDEO_FRAME = 15 * 60  # cada cuánto una ronda abre el stream y decodifica
+
+# Retención del historial de sondeos: crudos 24 h y agregados por minuto
+# 30 días; las series de más de 24 h se sirven desde los agregados
+RETENCION_SONDEOS = 24 * 3600
+RETENCION_MINUTOS = 30 * 24 * 3600
+INTERVALO_PURGA = 3600
+PUNTOS_SERIE = 720
+
+# Credenciales por defecto para probar en cámaras
+DEFAULT_CREDS = [
+    ("admin", "admin"),
+    ("admin", "12345"),
+    ("admin", "password"),
+    ("root", "root"),
+    ("user", "user"),
+    ("admin", "1234"),
+    ("admin", "1111111"),  # Samsung común
+    ("admin", "4321"),     # Samsung común
+    ("admin", "123456"),
+    ("root", "admin"),
+    ("service", "service"),
+    ("", "admin"),
+    ("supervisor", "supervisor"),
+    ("", "")
+]
+
+
+# Puertos comunes para cámaras IP
+CAM_PORTS = [80, 554, 8080, 8888]
+
+# Descubrimiento TCP: conexiones simultáneas como máximo y timeout por puerto
+MAX_CONEXIONES_SIMULTANEAS = 256
+TIMEOUT_PUERTO = 0.5
+
+# Barrido ARP por fragmentos para redes mayores que /24
+PREFIJO_FRAGMENTO = 24
+TIMEOUT_FRAGMENTO = 2
+MAX_FRAGMENTOS_SIMULTANEOS = 4
+HOSTS_CONFIRMACION = 1024  # Pedir confirmación para redes mayores que /22
+MAX_HOSTS_ESCANEO = 4096   # Nunca barrer más de un /20 alrededor de la interfaz
+
+# Escaneo avanzado: nmap por lotes con la plantilla de tiempos -T0..-T5
+PLANTILLA_NMAP = 4
+MAX_PROCESOS_NMAP = 4
+HOSTS_POR_PROCESO_NMAP = 256  # Por debajo de esto basta un único nmap
+
+# Perfiles de stream por defecto: el principal a resolución nativa y el
+# substream (miniaturas y muro de video) reducido y con fps limitados
+PERFILES_DEFECTO = {
+    "principal": {"resolucion": None, "fps_max": None},
+    "secundario": {"resolucion": [640, 360], "fps_max": 5},
+}
+
+# Opciones de FFmpeg para cv2.VideoCapture (OPENCV_FFMPEG_CAPTURE_OPTIONS)
+OPCIONES_FFMPEG_DEFECTO = {
+    "rtsp_transport": "tcp",
+    "buffer_size": "1024000",
+    "max_delay": "500000",
+    "fflags": "nobuffer",
+}
+
+# Instrumentación de streams: límites de los histogramas (segundos), eventos
+# recientes que se conservan en memoria y si cada apertura mide antes por
+# separado DNS, conexión TCP y RTSP OPTIONS (una conexión extra por apertura)
+LIMITES_HISTOGRAMA = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_EVENTOS_STREAM = 1000
+PERFILAR_FASES = os.environ.get("SHADOWCAM_PERFILAR_FASES", "1") != "0"
+
+# Reconexión: espera base y máxima (segundos) por clase de error. La espera
+# se duplica con cada fallo hasta el máximo y se elige al azar entre la
+# mitad de la base y ese tope, para que los streams no se sincronicen
+POLITICAS_RECONEXION = {
+    "red": (1.0, 60.0),
+    "decodificador": (2.0, 120.0),
+    "autenticacion": (30.0, 600.0),
+}
+ESPACIADO_RECONEXIONES = 0.2  # separación mínima entre dos reaperturas del proceso
+VENTANA_SONDEO_HOST = 15.0  # tiempo reservado al stream que comprueba si un host ha vuelto
+MAX_INTENTOS_VISOR = 8  # el visor se rinde; el muro de video reintenta siempre
+MAX_INTENTOS_AUTENTICACION = 2
+
+# Grabación continua (NVR): carpeta raíz (una subcarpeta por cámara),
+# configuración por defecto de cada cámara y cadencia de la supervisión
+DIRECTORIO_GRABACIONES = "grabaciones"
+GRABACION_DEFECTO = {"activa": False, "segmento_s": 60, "cuota_mb": 2048, "dias": 7}
+INTERVALO_RETENCION = 30  # segundos entre pasadas de retención
+INTERVALO_VIGILANCIA = 5  # segundos entre comprobaciones de cada proceso ffmpeg
+
+# Índice de keyframes junto a cada segmento grabado (JSON) y lectura a
+# partir de un keyframe: solo se examinan los primeros bytes del trozo
+EXTENSION_INDICE = ".idx"
+OPCIONES_REPRODUCCION = {"probesize": "65536", "analyzeduration": "0"}
+
+# Detección de movimiento: se analiza una copia en gris de ANCHO_ANALISIS
+# píxeles de ancho, a lo sumo ``fps`` veces por segundo y cámara. Las zonas
+# son rectángulos [x, y, ancho, alto] en fracciones del frame que se ignoran
+ANALISIS_DEFECTO = {"movimiento": False, "fps": 2.0, "umbral": 25, "area_min": 0.002, "zonas": [],
+                    "vigilancia": True, "fps_huella": 1.0}
+ANCHO_ANALISIS = 320
+ALFA_FONDO = 0.05  # peso de cada frame en la media móvil del fondo
+SEGUNDOS_FIN_MOVIMIENTO = 3.0  # sin movimiento durante este tiempo, el evento termina
+RETENCION_EVENTOS = 30 * 24 * 3600
+
+# Vigilancia de la imagen: huella de cada frame muestreado (dHash de 64 bits
+# e histograma de luminancia) sobre una miniatura en gris de TAMANO_HUELLA
+TAMANO_HUELLA = (128, 72)
+NIVELES_HISTOGRAMA = 16
+UMBRAL_NEGRO = 20  # luminancia media por debajo de la cual la imagen es negra
+UMBRAL_UNIFORME = 8  # desviación típica por debajo de la cual no hay detalle (objetivo tapado)
+UMBRAL_CONGELADO = 0.3  # diferencia media entre miniaturas consecutivas de un stream congelado
+SEGUNDOS_CONGELADO = 30  # mayor que el GOP de los códecs "inteligentes" en escenas estáticas
+SEGUNDOS_MANIPULACION = 5
+DISTANCIA_HASH_ESCENA = 20  # bits distintos del dHash respecto a la escena de referencia
+DISTANCIA_HISTOGRAMA_ESCENA = 0.35  # variación total entre histogramas (0-1)
+SEGUNDOS_CAMBIO_ESCENA = 5  # la escena nueva tiene que mantenerse este tiempo
+FRAMES_DESCARTE_SONDEO = 5  # frames saltados antes de la huella (los primeros pueden ser grises)
+
+# Análisis en procesos aparte (0 = en el hilo de captura). Cada proceso tiene
+# un anillo de RANURAS_POOL frames en memoria compartida; si está lleno, el
+# frame se descarta en lugar de encolarse
+PROCESOS_ANALISIS = int(os.environ.get("SHADOWCAM_PROCESOS_ANALISIS",
+                                       max(1, min(4, (os.cpu_count() or 2) - 1))))
+RANURAS_POOL = 3
+
+# ---------------------- ALMACENAMIENTO (SQLITE) ----------------------
+
+def conectar_bd(ruta=ARCHIVO_BD):
+    """Abrir la base de datos del inventario en modo WAL"""
+    conexion = sqlite3.connect(ruta, check_same_thread=False)
+    conexion.row_factory = sqlite3.Row
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    return conexion
+
+
+class CameraStore:
+    """Inventario de cámaras y sondeos en SQLite.
+
+    Cada alta, baja o cambio es una transacción de una sola fila; los ids
+    son AUTOINCREMENT, así que nunca se reutilizan tras un borrado.
+    """
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS camaras (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            url TEXT NOT NULL,
+            ip_local TEXT NOT NULL DEFAULT '',
+            descripcion TEXT NOT NULL DEFAULT '',
+            fecha_agregada TEXT,
+            perfiles TEXT NOT NULL DEFAULT '{}',
+            opciones_captura TEXT NOT NULL DEFAULT '{}',
+            legado TEXT NOT NULL DEFAULT '{}',
+            grabacion TEXT NOT NULL DEFAULT '{}',
+            analisis TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE INDEX IF NOT EXISTS idx_camaras_ip ON camaras(ip_local);
+        CREATE INDEX IF NOT EXISTS idx_camaras_nombre ON camaras(nombre);
+        CREATE TABLE IF NOT EXISTS sondeos (
+            camara_id INTEGER NOT NULL,
+            ts REAL NOT NULL,
+            ok INTEGER NOT NULL,
+            etapa TEXT,
+            latencia_ms REAL,
+            detalle TEXT,
+            apertura_ms REAL,
+            primer_frame_ms REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sondeos_camara_ts ON sondeos(camara_id, ts);
+        CREATE TABLE IF NOT EXISTS sondeos_minuto (
+            camara_id INTEGER NOT NULL,
+            minuto INTEGER NOT NULL,
+            intentos INTEGER NOT NULL,
+            exitos INTEGER NOT NULL,
+            tcp_total REAL NOT NULL DEFAULT 0,
+            tcp_n INTEGER NOT NULL DEFAULT 0,
+            tcp_max REAL,
+            apertura_total REAL NOT NULL DEFAULT 0,
+            apertura_n INTEGER NOT NULL DEFAULT 0,
+            frame_total REAL NOT NULL DEFAULT 0,
+            frame_n INTEGER NOT NULL DEFAULT 0,
+            ultima_conexion REAL,
+            PRIMARY KEY (camara_id, minuto)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS eventos (
+            camara_id INTEGER NOT NULL,
+            ts REAL NOT NULL,
+            tipo TEXT NOT NULL,
+            datos TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE INDEX IF NOT EXISTS idx_eventos_camara_ts ON eventos(camara_id, ts);
+    """
+
+    # Agregado por minuto del historial crudo (para bases anteriores)
+    SELECT_MINUTOS = """
+        SELECT camara_id, CAST(ts / 60 AS INTEGER), COUNT(*), SUM(ok),
+               COALESCE(SUM(latencia_ms), 0), COUNT(latencia_ms), MAX(latencia_ms),
+               COALESCE(SUM(apertura_ms), 0), COUNT(apertura_ms),
+               COALESCE(SUM(primer_frame_ms), 0), COUNT(primer_frame_ms),
+               MAX(CASE WHEN ok THEN ts END)
+        FROM sondeos GROUP BY 1, 2
+    """
+
+    # Columnas guardadas como JSON
+    CAMPOS_JSON = ("perfiles", "opciones_captura", "grabacion", "analisis")
+    # Campos del formato JSON anterior que ahora se derivan del historial
+    CAMPOS_LEGADO = ("activa", "intentos_conexion", "ultima_conexion")
+
+    def __init__(self, ruta=ARCHIVO_BD):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conexion = conectar_bd(ruta)
+        with self._lock, self._conexion:
+            self._conexion.executescript(self.ESQUEMA)
+            # Bases anteriores: columnas nuevas y agregados del historial existente
+            columnas = {f[1] for f in self._conexion.execute("PRAGMA table_info(camaras)")}
+            for columna in ("grabacion", "analisis"):
+                if columna not in columnas:
+                    self._conexion.execute(f"ALTER TABLE camaras ADD COLUMN {columna} TEXT NOT NULL DEFAULT '{{}}'")
+            columnas = {f[1] for f in self._conexion.execute("PRAGMA table_info(sondeos)")}
+            for columna in ("apertura_ms", "primer_frame_ms"):
+                if columna not in columnas:
+                    self._conexion.execute(f"ALTER TABLE sondeos ADD COLUMN {columna} REAL")
+            if not self._conexion.execute("SELECT 1 FROM sondeos_minuto LIMIT 1").fetchone():
+                self._conexion.execute("INSERT INTO sondeos_minuto " + self.SELECT_MINUTOS)
+
+    def _camara(self, fila):
+        if fila is None:
+            return None
+        camara = dict(fila)
+        for campo in self.CAMPOS_JSON:
+            camara[campo] = json.loads(camara[campo])
+        camara.update(json.loads(camara.pop("legado")))
+        return camara
+
+    def _consultar(self, sql, parametros=()):
+        with self._lock:
+            return self._conexion.execute(sql, parametros).fetchall()
+
+    def listar(self):
+        return [self._camara(f) for f in self._consultar("SELECT * FROM camaras ORDER BY id")]
+
+    def obtener(self, camara_id):
+        filas = self._consultar("SELECT * FROM camaras WHERE id = ?", (camara_id,))
+        return self._camara(filas[0]) if filas else None
+
+    def buscar_por_ip(self, ip):
+        return [self._camara(f) for f in self._consultar("SELECT * FROM camaras WHERE ip_local = ?", (ip,))]
+
+    def buscar_por_nombre(self, nombre):
+        return [self._camara(f) for f in self._consultar("SELECT * FROM camaras WHERE nombre = ?", (nombre,))]
+
+    def contar(self):
+        return self._consultar("SELECT COUNT(*) FROM camaras")[0][0]
+
+    def _fila(self, camara):
+        fila = {clave: camara[clave] for clave in ("nombre", "url", "ip_local", "descripcion", "fecha_agregada")
+                if clave in camara}
+        for campo in self.CAMPOS_JSON:
+            if campo in camara:
+                fila[campo] = json.dumps(camara[campo])
+        return fila
+
+    def agregar(self, camara, camara_id=None):
+        """Insertar una cámara y devolver su id"""
+        fila = self._fila(camara)
+        fila["legado"] = json.dumps({c: camara[c] for c in self.CAMPOS_LEGADO if c in camara})
+        if camara_id is not None:
+            fila["id"] = camara_id
+        columnas = ", ".join(fila)
+        marcadores = ", ".join("?" for _ in fila)
+        with self._lock, self._conexion:
+            cursor = self._conexion.execute(f"INSERT INTO camaras ({columnas}) VALUES ({marcadores})",
+                                            tuple(fila.values()))
+            return cursor.lastrowid
+
+    def actualizar(self, camara_id, **campos):
+        fila = self._fila(campos)
+        if not fila:
+            return False
+        asignaciones = ", ".join(f"{columna} = ?" for columna in fila)
+        with self._lock, self._conexion:
+            cursor = self._conexion.execute(f"UPDATE camaras SET {asignaciones} WHERE id = ?",
+                                            (*fila.values(), camara_id))
+            return cursor.rowcount == 1
+
+    def eliminar(self, camara_id):
+        with self._lock, self._conexion:
+            cursor = self._conexion.execute("DELETE FROM camaras WHERE id = ?", (camara_id,))
+            return cursor.rowcount == 1
+
+    def registrar_sondeo(self, sondeo):
+        """Guardar el sondeo crudo y sumarlo a su minuto en la misma transacción"""
+        ok = int(sondeo["ok"])
+        tcp, apertura, frame = (sondeo.get(c) for c in ("latencia_ms", "apertura_ms", "primer_frame_ms"))
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT INTO sondeos (camara_id, ts, ok, etapa, latencia_ms, detalle, apertura_ms, primer_frame_ms) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sondeo["camara_id"], sondeo["ts"], ok, sondeo["etapa"],
+                 tcp, sondeo["detalle"], apertura, frame))
+            self._conexion.execute("""
+                INSERT INTO sondeos_minuto VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (camara_id, minuto) DO UPDATE SET
+                    intentos = intentos + 1,
+                    exitos = exitos + excluded.exitos,
+                    tcp_total = tcp_total + excluded.tcp_total,
+                    tcp_n = tcp_n + excluded.tcp_n,
+                    tcp_max = COALESCE(MAX(tcp_max, excluded.tcp_max), tcp_max, excluded.tcp_max),
+                    apertura_total = apertura_total + excluded.apertura_total,
+                    apertura_n = apertura_n + excluded.apertura_n,
+                    frame_total = frame_total + excluded.frame_total,
+                    frame_n = frame_n + excluded.frame_n,
+                    ultima_conexion = COALESCE(MAX(ultima_conexion, excluded.ultima_conexion),
+                                               ultima_conexion, excluded.ultima_conexion)
+            """, (sondeo["camara_id"], int(sondeo["ts"] // 60), ok,
+                  tcp or 0, int(tcp is not None), tcp,
+                  apertura or 0, int(apertura is not None),
+                  frame or 0, int(frame is not None),
+                  sondeo["ts"] if ok else None))
+
+    def resumen_sondeos(self):
+        """Agregados por cámara de todo lo retenido, en una sola consulta"""
+        return self._consultar("""
+            SELECT m.camara_id, SUM(m.intentos) AS intentos, SUM(m.exitos) AS exitos,
+                   MAX(m.ultima_conexion) AS ultima_conexion,
+                   SUM(m.tcp_total) AS latencia_total, SUM(m.tcp_n) AS latencia_n,
+                   (SELECT ok FROM sondeos u WHERE u.camara_id = m.camara_id
+                    ORDER BY u.ts DESC LIMIT 1) AS ultimo_ok
+            FROM sondeos_minuto m GROUP BY m.camara_id
+        """)
+
+    def serie_cruda(self, camara_id, desde):
+        return self._consultar("""
+            SELECT ts, ok AS disponibilidad, latencia_ms, apertura_ms, primer_frame_ms
+            FROM sondeos WHERE camara_id = ? AND ts >= ? ORDER BY ts
+        """, (camara_id, desde))
+
+    def serie_minutos(self, camara_id, desde, paso=1):
+        """Agregados de ``paso`` minutos: disponibilidad (0-1) y latencias medias"""
+        return self._consultar("""
+            SELECT (minuto / ?) * ? * 60 AS ts,
+                   CAST(SUM(exitos) AS REAL) / SUM(intentos) AS disponibilidad,
+                   SUM(tcp_total) / NULLIF(SUM(tcp_n), 0) AS latencia_ms,
+                   SUM(apertura_total) / NULLIF(SUM(apertura_n), 0) AS apertura_ms,
+                   SUM(frame_total) / NULLIF(SUM(frame_n), 0) AS primer_frame_ms
+            FROM sondeos_minuto WHERE camara_id = ? AND minuto >= ?
+            GROUP BY minuto / ? ORDER BY 1
+        """, (paso, paso, camara_id, int(desde // 60), paso))
+
+    def purgar_sondeos(self, ahora=None):
+        """Aplicar la retención: crudos de 24 h y minutos de 30 días"""
+        ahora = ahora or time.time()
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM sondeos WHERE ts < ?", (ahora - RETENCION_SONDEOS,))
+            self._conexion.execute("DELETE FROM sondeos_minuto WHERE minuto < ?",
+                                   (int((ahora - RETENCION_MINUTOS) // 60),))
+            self._conexion.execute("DELETE FROM eventos WHERE ts < ?", (ahora - RETENCION_EVENTOS,))
+
+    def registrar_evento(self, camara_id, ts, tipo, datos):
+        with self._lock, self._conexion:
+            self._conexion.execute("INSERT INTO eventos (camara_id, ts, tipo, datos) VALUES (?, ?, ?, ?)",
+                                   (camara_id, ts, tipo, json.dumps(datos)))
+
+    def listar_eventos(self, camara_id, desde=0, tipo=None):
+        filas = self._consultar(
+            "SELECT ts, tipo, datos FROM eventos WHERE camara_id = ? AND ts >= ?"
+            + (" AND tipo = ?" if tipo else "") + " ORDER BY ts",
+            (camara_id, desde, tipo) if tipo else (camara_id, desde))
+        return [{"ts": f["ts"], "tipo": f["tipo"], **json.loads(f["datos"])} for f in filas]
+
+    def migrar_json(self, ruta_camaras=ARCHIVO_CAMARAS, ruta_historial=ARCHIVO_HISTORIAL):
+        """Importar una sola vez el inventario JSON y el historial JSON Lines"""
+        if self.contar() or not os.path.exists(ruta_camaras):
+            return 0
+        try:
+            with open(ruta_camaras, 'r') as f:
+                camaras = json.load(f)
+        except json.JSONDecodeError:
+            camaras = []
+
+        # Los ids antiguos podían repetirse tras un borrado: se conserva el
+        # primero de cada id y los duplicados reciben uno nuevo al final
+        usados = set()
+        duplicadas = []
+        for camara in camaras:
+            camara_id = camara.get('id')
+            if isinstance(camara_id, int) and camara_id not in usados:
+                usados.add(camara_id)
+                self.agregar(camara, camara_id)
+            else:
+                duplicadas.append(camara)
+        for camara in duplicadas:
+            self.agregar(camara)
+
+        if os.path.exists(ruta_historial):
+            with open(ruta_historial, 'r') as f:
+                for linea in f:
+                    try:
+                        self.registrar_sondeo(json.loads(linea))
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+            os.replace(ruta_historial, ruta_historial + ".migrado")
+        os.replace(ruta_camaras, ruta_camaras + ".migrado")
+        return len(camaras)
+
+class DeviceCache:
+    """Caché persistente de dispositivos escaneados, indexada por MAC.
+
+    Guarda la última IP, puertos abiertos, servicios que identificó nmap,
+    fabricante y URL de cámara de cada dispositivo junto con la hora del
+    último sondeo, para que un re-escaneo solo vuelva a sondear lo nuevo,
+    lo que cambió de IP o lo que ha caducado.
+    """
+
+    ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS dispositivos (
+            mac TEXT PRIMARY KEY,
+            ip TEXT NOT NULL,
+            red TEXT NOT NULL,
+            puertos TEXT NOT NULL DEFAULT '[]',
+            servicios TEXT NOT NULL DEFAULT '[]',
+            fabricante TEXT,
+            url_camara TEXT,
+            visto REAL NOT NULL,
+            sondeado REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_dispositivos_red ON dispositivos(red);
+    """
+
+    def __init__(self, ruta=ARCHIVO_BD, ttl=TTL_CACHE_DISPOSITIVOS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conexion = conectar_bd(ruta)
+        with self._lock, self._conexion:
+            self._conexion.executescript(self.ESQUEMA)
+            columnas = {f[1] for f in self._conexion.execute("PRAGMA table_info(dispositivos)")}
+            if "servicios" not in columnas:
+                self._conexion.execute("ALTER TABLE dispositivos ADD COLUMN servicios TEXT NOT NULL DEFAULT '[]'")
+
+    def cargar_red(self, red):
+        with self._lock:
+            filas = self._conexion.execute("SELECT * FROM dispositivos WHERE red = ?", (red,)).fetchall()
+        entradas = {}
+        for fila in filas:
+            entrada = dict(fila)
+            entrada["puertos"] = json.loads(entrada["puertos"])
+            entrada["servicios"] = json.loads(entrada["servicios"])
+            entradas[entrada["mac"]] = entrada
+        return entradas
+
+    def clasificar(self, dispositivos, anteriores, ahora=None):
+        """Separar los dispositivos que hay que sondear de los reutilizables.
+
+        Devuelve ``(a_sondear, reutilizados, desaparecidos)``; a cada
+        dispositivo se le anota ``cambio`` ("nuevo", "ip" o None).
+        """
+        ahora = ahora or time.time()
+        a_sondear, reutilizados = [], []
+        for d in dispositivos:
+            previo = anteriores.get(d['mac'])
+            if previo is None:
+                d['cambio'] = "nuevo"
+            elif previo['ip'] != d['ip']:
+                d['cambio'] = "ip"
+            else:
+                d['cambio'] = None
+                if ahora - previo['sondeado'] < self.ttl:
+                    d['puertos_abiertos'] = previo['puertos']
+                    d['servicios'] = previo['servicios']
+                    d['fabricante'] = previo['fabricante']
+                    if previo['url_camara']:
+                        d['url_camara'] = previo['url_camara']
+                    reutilizados.append(d)
+                    continue
+            a_sondear.append(d)
+        vistas = {d['mac'] for d in dispositivos}
+        desaparecidos = [e for mac, e in anteriores.items() if mac not in vistas]
+        return a_sondear, reutilizados, desaparecidos
+
+    def guardar(self, d, red, ahora=None):
+        ahora = ahora or time.time()
+        with self._lock, self._conexion:
+            self._conexion.execute("""
+                INSERT INTO dispositivos (mac, ip, red, puertos, servicios, fabricante, url_camara,
+                                          visto, sondeado)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(mac) DO UPDATE SET ip = excluded.ip, red = excluded.red,
+                    puertos = excluded.puertos, servicios = excluded.servicios,
+                    fabricante = excluded.fabricante, url_camara = excluded.url_camara,
+                    visto = excluded.visto, sondeado = excluded.sondeado
+            """, (d['mac'], d['ip'], red, json.dumps(d.get('puertos_abiertos', [])),
+                  json.dumps(d.get('servicios', [])), d.get('fabricante'), d.get('url_camara'), ahora, ahora))
+
+    def marcar_vistos(self, macs, ahora=None):
+        ahora = ahora or time.time()
+        with self._lock, self._conexion:
+            self._conexion.executemany("UPDATE dispositivos SET visto = ? WHERE mac = ?",
+                                       [(ahora, mac) for mac in macs])
+
+store_camaras = None
+
+def obtener_store():
+    """Almacén compartido; la primera vez migra el inventario JSON"""
+    global store_camaras
+    if store_camaras is None:
+        store_camaras = CameraStore()
+        store_camaras.migrar_json()
+    return store_camaras
+
+# ---------------------- GESTIÓN DE CÁMARAS REMOTAS ----------------------
+
+class CameraManager:
+    def __init__(self, store=None):
+        self.store = store or obtener_store()
+    
+    def listar_camaras(self):
+        """Todas las cámaras guardadas, ordenadas por id"""
+        return self.store.listar()
+    
+    def obtener_camara(self, camara_id):
+        return self.store.obtener(camara_id)
+    
+    def buscar_por_ip(self, ip):
+        return self.store.buscar_por_ip(ip)
+    
+    def buscar_por_nombre(self, nombre):
+        return self.store.buscar_por_nombre(nombre)
+    
+    def contar_camaras(self):
+        return self.store.contar()
+    
+    def actualizar_camara(self, camara_id, **campos):
+        """Actualizar solo los campos indicados de una cámara"""
+        try:
+            return self.store.actualizar(camara_id, **campos)
+        except sqlite3.Error as e:
+            print(f"Error al actualizar cámara: {e}")
+            return False
+    
+    def eliminar_camara(self, camara_id):
+        try:
+            return self.store.eliminar(camara_id)
+        except sqlite3.Error as e:
+            print(f"Error al eliminar cámara: {e}")
+            return False
+    
+    def agregar_camara(self, nombre, url, ip_local, descripcion="", url_substream=""):
+        """Agregar una nueva cámara y devolver su id (None si falla)"""
+        nueva_camara = {
+            "nombre": nombre,
+            "url": url,
+            "ip_local": ip_local,
+            "descripcion": descripcion,
+            "fecha_agregada": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "perfiles": {
+                "principal": {"url": url},
+                "secundario": {"url": url_substream or url},
+            },
+            "opciones_captura": {}
+        }
+        try:
+            return self.store.agregar(nueva_camara)
+        except sqlite3.Error as e:
+            print(f"Error al guardar cámara: {e}")
+            return None
+    
+    def obtener_perfil(self, camara, tipo="principal"):
+        """Perfil de stream (url, resolución, fps y opciones FFmpeg) de una cámara"""
+        perfil = dict(PERFILES_DEFECTO[tipo])
+        perfil["url"] = camara['url']
+        # Los registros antiguos no tienen perfiles: se usa la URL principal
+        guardado = camara.get('perfiles', {}).get(tipo, {})
+        perfil.update({clave: valor for clave, valor in guardado.items() if valor})
+        perfil["opciones"] = {**camara.get('opciones_captura', {}), **guardado.get('opciones', {})}
+        return perfil
+    
+    def obtener_grabacion(self, camara):
+        """Configuración de grabación continua de una cámara, con los valores por defecto"""
+        return {**GRABACION_DEFECTO, **camara.get('grabacion', {})}
+    
+    def obtener_analisis(self, camara):
+        """Configuración del análisis de video de una cámara, con los valores por defecto"""
+        return {**ANALISIS_DEFECTO, **camara.get('analisis', {})}
+    
+    def registrar_evento(self, evento):
+        """Guardar un evento de análisis (movimiento, manipulación...) de una cámara"""
+        datos = {clave: valor for clave, valor in evento.items() if clave not in ("camara_id", "ts", "tipo")}
+        try:
+            self.store.registrar_evento(evento["camara_id"], evento["ts"], evento["tipo"], datos)
+        except sqlite3.Error as e:
+            print(f"Error al guardar evento: {e}")
+    
+    def listar_eventos(self, camara_id, desde=0, tipo=None):
+        return self.store.listar_eventos(camara_id, desde, tipo)
+    
+    def verificar_acceso_remoto(self, camara):
+        """Verificar si una cámara es accesible remotamente"""
+        sondeo = obtener_monitor().enviar(camara, decodificar=True).result()
+        if not sondeo["ok"]:
+            print(f"Error verificando acceso ({sondeo['etapa']}): {sondeo['detalle']}")
+        return sondeo["ok"]
+    
+    def estadisticas_camara(self, camara):
+        """Estado, intentos y última conexión derivados del historial de sondeos"""
+        estadisticas = obtener_monitor().historial.estadisticas(camara['id'])
+        if estadisticas is None:
+            # Cámara aún sin sondeos: campos heredados del formato anterior
+            return {
+                "intentos_conexion": camara.get('intentos_conexion', 0),
+                "ultima_conexion": camara.get('ultima_conexion'),
+                "activa": camara.get('activa', True),
+                "disponibilidad": None,
+                "latencia_media_ms": None,
+                "ultimo_sondeo": None,
+            }
+        return estadisticas
+    
+    def generar_url_remota(self, ip_local, puerto, usuario, password):
+        """Generar URLs para acceso remoto usando diferentes métodos"""
+        import requests
+
+        urls_remotas = []
+        
+        # Método 1: Acceso directo por IP pública (requiere port forwarding)
+        try:
+            # Obtener IP pública
+            ip_publica = requests.get('https://httpbin.org/ip', timeout=5).json()['origin']
+            urls_remotas.append({
+                "tipo": "IP Pública + Port Forwarding",
+                "url": f"rtsp://{usuario}:{password}@{ip_publica}:{puerto}/",
+                "descripcion": "Requiere configurar port forwarding en el router",
+                "nota": f"Configurar redirección del puerto {puerto} hacia {ip_local}"
+            })
+        except:
+            pass
+        
+        # Método 2: URLs con IP local (para documentación)
+        urls_remotas.append({
+            "tipo": "Acceso Local",
+            "url": f"rtsp://{usuario}:{password}@{ip_local}:{puerto}/",
+            "descripcion": "Solo funciona dentro de la red local",
+            "nota": "Para referencia y pruebas locales"
+        })
+        
+        # Método 3: Sugerir servicios de túnel
+        urls_remotas.append({
+            "tipo": "Túnel Ngrok",
+            "url": f"Configurar ngrok para exponer puerto {puerto}",
+            "descripcion": "Usar ngrok tcp {puerto} para crear túnel",
+            "nota": "Proporciona acceso temporal desde internet"
+        })
+        
+        return urls_remotas
+
+# ---------------------- MONITOR DE SALUD ----------------------
+
+def destino_camara(url):
+    """Host y puerto TCP de la URL de una cámara"""
+    partes = urlsplit(url)
+    puerto_defecto = 554 if partes.scheme == 'rtsp' else 80
+    return partes.hostname, partes.port or puerto_defecto
+
+def sondear_camara(camara, decodificar=False, timeout=3.0, vigilante=None):
+    """Sondear una cámara de menor a mayor coste.
+
+    Primero una conexión TCP, después RTSP OPTIONS o HTTP HEAD, y solo si
+    se pide expresamente se abre el stream y se decodifica un frame; en ese
+    caso se miden también la apertura y el tiempo hasta el primer frame.
+    Con un ``vigilante`` (TamperDetector) se comprueba además la imagen: una
+    imagen negra, tapada o congelada hace fallar el sondeo en la etapa
+    ``imagen``.
+    """
+    import requests
+
+    url = camara['url']
+    resultado = {"ts": time.time(), "camara_id": camara['id'], "ok": False,
+                 "etapa": "tcp", "latencia_ms": None, "apertura_ms": None,
+                 "primer_frame_ms": None, "imagen": None, "detalle": ""}
+    host, puerto = destino_camara(url)
+    if not host:
+        resultado["detalle"] = "URL sin host"
+        return resultado
+
+    inicio = time.monotonic()
+    try:
+        with socket.create_connection((host, puerto), timeout=timeout) as s:
+            resultado["latencia_ms"] = (time.monotonic() - inicio) * 1000
+
+            if url.startswith('rtsp://'):
+                resultado["etapa"] = "rtsp"
+                # OPTIONS no necesita autenticación ni abre sesión de medios
+                partes = urlsplit(url)
+                url_limpia = f"rtsp://{host}:{puerto}{partes.path or '/'}"
+                s.sendall(f"OPTIONS {url_limpia} RTSP/1.0\r\nCSeq: 1\r\n"
+                          "User-Agent: ShadowCam\r\n\r\n".encode())
+                respuesta = s.recv(256).decode(errors='replace')
+                linea = respuesta.split("\r\n", 1)[0]
+                resultado["detalle"] = linea
+                if not linea.startswith("RTSP/") or int(linea.split()[1]) >= 400:
+                    return resultado
+    except (OSError, ValueError, IndexError) as e:
+        resultado["detalle"] = str(e)
+        return resultado
+
+    try:
+        if url.startswith('http://'):
+            resultado["etapa"] = "http"
+            respuesta = requests.head(url, timeout=timeout)
+            resultado["detalle"] = f"HTTP {respuesta.status_code}"
+            # Muchas cámaras no implementan HEAD pero sí responden
+            if respuesta.status_code >= 400 and respuesta.status_code != 405:
+                return resultado
+
+        if decodificar:
+            resultado["etapa"] = "frame"
+            # TCP y RTSP ya se han medido arriba; la captura mide el resto
+            cap = abrir_captura(url, origen="sondeo", fases=False)
+            try:
+                ret = cap.isOpened()
+                if ret:
+                    resultado["apertura_ms"] = cap.tiempos["apertura_ms"]
+                    ret, frame = cap.read()
+                    resultado["primer_frame_ms"] = cap.tiempos.get("primer_frame_ms")
+                if ret and vigilante is not None:
+                    for _ in range(FRAMES_DESCARTE_SONDEO):
+                        cap.grab()
+                    ret_ultimo, ultimo = cap.retrieve()
+                    imagen = vigilante.analizar(ultimo if ret_ultimo else frame, resultado["ts"])
+                    # Negra o tapada se ve en un solo frame; congelada, solo con el tiempo
+                    resultado["imagen"] = imagen["estado"] if imagen["estado"] != "ok" else (
+                        imagen["condicion"] if imagen["condicion"] != "congelado" else "ok")
+            finally:
+                cap.release()
+            if not ret:
+                resultado["detalle"] = "No se pudo decodificar un frame"
+                return resultado
+            if resultado["imagen"] not in (None, "ok"):
+                resultado["etapa"] = "imagen"
+                resultado["detalle"] = f"Imagen {resultado['imagen']}"
+                return resultado
+    except Exception as e:
+        resultado["detalle"] = str(e)
+        return resultado
+
+    resultado["ok"] = True
+    return resultado
+
+
+class HealthHistory:
+    """Historial de sondeos con estadísticas derivadas.
+
+    Cada sondeo es una fila en la tabla ``sondeos``; el resumen por cámara
+    se calcula una vez al cargar con una consulta agregada y se mantiene
+    en memoria, así las estadísticas se consultan sin recorrer el historial.
+    Las series temporales se leen de la base bajo demanda.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or obtener_store()
+        self._lock = threading.Lock()
+        self._resumen = {}
+        for fila in self.store.resumen_sondeos():
+            self._resumen[fila["camara_id"]] = {
+                "intentos": fila["intentos"], "exitos": fila["exitos"],
+                "ultima_conexion": fila["ultima_conexion"], "ultimo": {"ok": bool(fila["ultimo_ok"])},
+                "latencia_total": fila["latencia_total"] or 0.0, "latencia_n": fila["latencia_n"]}
+
+    def _acumular(self, sondeo):
+        resumen = self._resumen.setdefault(sondeo["camara_id"], {
+            "intentos": 0, "exitos": 0, "ultima_conexion": None, "ultimo": None,
+            "latencia_total": 0.0, "latencia_n": 0})
+        resumen["intentos"] += 1
+        resumen["ultimo"] = sondeo
+        if sondeo["ok"]:
+            resumen["exitos"] += 1
+            resumen["ultima_conexion"] = sondeo["ts"]
+        if sondeo.get("latencia_ms") is not None:
+            resumen["latencia_total"] += sondeo["latencia_ms"]
+            resumen["latencia_n"] += 1
+
+    def registrar(self, sondeo):
+        self.store.registrar_sondeo(sondeo)
+        with self._lock:
+            self._acumular(sondeo)
+
+    def estadisticas(self, camara_id):
+        with self._lock:
+            resumen = self._resumen.get(camara_id)
+            if resumen is None:
+                return None
+            return {
+                "intentos_conexion": resumen["intentos"],
+                "ultima_conexion": (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(resumen["ultima_conexion"]))
+                                    if resumen["ultima_conexion"] else None),
+                "activa": resumen["ultimo"]["ok"],
+                "disponibilidad": resumen["exitos"] / resumen["intentos"] * 100,
+                "latencia_media_ms": (resumen["latencia_total"] / resumen["latencia_n"]
+                                      if resumen["latencia_n"] else None),
+                "ultimo_sondeo": resumen["ultimo"],
+            }
+
+    def serie(self, camara_id, segundos, puntos=PUNTOS_SERIE):
+        """Serie de disponibilidad y latencias de los últimos ``segundos``.
+
+        Hasta 24 h se devuelven los sondeos crudos; por encima, los agregados
+        por minuto reagrupados para no superar ``puntos`` puntos.
+        """
+        desde = time.time() - segundos
+        if segundos <= RETENCION_SONDEOS:
+            return self.store.serie_cruda(camara_id, desde)
+        return self.store.serie_minutos(camara_id, desde, max(1, segundos // 60 // puntos))
+
+    def purgar(self):
+        self.store.purgar_sondeos()
+
+
+class HealthMonitor:
+    """Sondea periódicamente todas las cámaras guardadas con concurrencia acotada"""
+
+    def __init__(self, historial=None, intervalo=INTERVALO_MONITOR,
+                 max_simultaneos=MAX_SONDEOS_SIMULTANEOS):
+        self.historial = historial or HealthHistory()
+        self.intervalo = intervalo
+        self.version = 0  # Cambia con cada sondeo registrado
+        self.intervalo_frame = INTERVALO_SONDEO_FRAME
+        self._ultima_decodificacion = None
+        self._ultima_purga = None
+        self._executor = ThreadPoolExecutor(max_workers=max_simultaneos,
+                                            thread_name_prefix="shadowcam-salud")
+        self._parar = threading.Event()
+        self._hilo = None
+        # Un vigilante de imagen por cámara: la congelación se detecta
+        # comparando los frames de sondeos sucesivos. Se rehace si cambia
+        # la configuración de análisis y se suelta al borrar la cámara
+        self.vigilantes = {}
+        self._lock_vigilantes = threading.Lock()
+
+    def _vigilante(self, camara):
+        gestor = CameraManager()
+        analisis = gestor.obtener_analisis(camara)
+        with self._lock_vigilantes:
+            if not analisis["vigilancia"]:
+                self.vigilantes.pop(camara['id'], None)
+                return None
+            vigilante = self.vigilantes.get(camara['id'])
+            if vigilante is None or vigilante.configuracion != analisis:
+                vigilante = self.vigilantes[camara['id']] = TamperDetector(
+                    camara['id'], analisis, gestor.registrar_evento)
+        return vigilante
+
+    def _podar_vigilantes(self, camaras):
+        """Soltar los vigilantes de cámaras que ya no existen"""
+        ids = {camara['id'] for camara in camaras}
+        with self._lock_vigilantes:
+            for camara_id in [i for i in self.vigilantes if i not in ids]:
+                del self.vigilantes[camara_id]
+
+    def _sondear_y_registrar(self, camara, decodificar):
+        sondeo = sondear_camara(camara, decodificar, vigilante=self._vigilante(camara) if decodificar else None)
+        self.historial.registrar(sondeo)
+        self.version += 1
+        return sondeo
+
+    def enviar(self, camara, decodificar=False):
+        """Sondear una cámara en el pool del monitor; devuelve un Future"""
+        return self._executor.submit(self._sondear_y_registrar, camara, decodificar)
+
+    def ronda(self):
+        """Sondear todas las cámaras y esperar; devuelve los Future terminados.
+
+        Cada ``intervalo_frame`` segundos la ronda decodifica un frame para
+        medir la apertura del stream, y como mucho una vez por hora se aplica
+        la retención del historial.
+        """
+        ahora = time.monotonic()
+        decodificar = (self._ultima_decodificacion is None
+                       or ahora - self._ultima_decodificacion >= self.intervalo_frame)
+        if decodificar:
+            self._ultima_decodificacion = ahora
+        if self._ultima_purga is None or ahora - self._ultima_purga >= INTERVALO_PURGA:
+            self._ultima_purga = ahora
+            self.historial.purgar()
+
+        camaras = CameraManager().listar_camaras()
+        self._podar_vigilantes(camaras)
+        futuros = [self.enviar(camara, decodificar) for camara in camaras]
+        wait(futuros)
+        return futuros
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            try:
+                for futuro in self.ronda():
+                    futuro.result()
+            except Exception as e:
+                print(f"Error en el monitor de salud: {e}")
+            self._parar.wait(self.intervalo)
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+monitor_salud = None
+
+def obtener_monitor():
+    """Monitor de salud compartido por toda la aplicación"""
+    global monitor_salud
+    if monitor_salud is None:
+        monitor_salud = HealthMonitor()
+    return monitor_salud
+
+# ---------------------- INSTRUMENTACIÓN DE STREAMS ----------------------
+
+def url_sin_credenciales(url):
+    """URL apta para registros: sin usuario ni contraseña"""
+    partes = urlsplit(url)
+    if not partes.username and not partes.password:
+        return url
+    netloc = partes.hostname or ""
+    if partes.port:
+        netloc += f":{partes.port}"
+    return partes._replace(netloc=netloc).geturl()
+
+
+class StreamMetrics:
+    """Métricas y registro de eventos de las operaciones sobre streams.
+
+    Cada fase (dns, tcp, rtsp, apertura, primer_frame, lectura, conversion,
+    liberacion) alimenta un histograma acumulativo por origen (visor, muro,
+    sondeo, escaneo). Los eventos puntuales (aperturas, primer frame, errores
+    y liberaciones) se guardan en una cola acotada y se entregan a los
+    suscriptores; las lecturas por frame solo cuentan en los histogramas.
+    """
+
+    def __init__(self, limites=LIMITES_HISTOGRAMA, max_eventos=MAX_EVENTOS_STREAM):
+        self.limites = limites
+        self.perfilar_fases = PERFILAR_FASES
+        self._lock = threading.Lock()
+        self._histogramas = {}  # (fase, origen) -> [cuentas por límite..., +Inf]
+        self._sumas = {}
+        self._operaciones = Counter()  # (operacion, resultado, origen)
+        self._abiertos = Counter()  # origen -> streams abiertos ahora
+        self._eventos = deque(maxlen=max_eventos)
+        self._suscriptores = []
+
+    def observar(self, fase, origen, segundos):
+        with self._lock:
+            cuentas = self._histogramas.get((fase, origen))
+            if cuentas is None:
+                cuentas = self._histogramas[(fase, origen)] = [0] * (len(self.limites) + 1)
+                self._sumas[(fase, origen)] = 0.0
+            cuentas[bisect_left(self.limites, segundos)] += 1
+            self._sumas[(fase, origen)] += segundos
+
+    def contar(self, operacion, resultado, origen):
+        with self._lock:
+            self._operaciones[(operacion, resultado, origen)] += 1
+
+    def abierto(self, origen, delta):
+        with self._lock:
+            self._abiertos[origen] += delta
+
+    def evento(self, operacion, url, origen, **datos):
+        """Registrar un evento y entregarlo a los suscriptores"""
+        evento = {"tipo": "stream", "operacion": operacion, "ts": time.time(),
+                  "url": url_sin_credenciales(url), "origen": origen, **datos}
+        with self._lock:
+            self._eventos.append(evento)
+            suscriptores = list(self._suscriptores)
+        for funcion in suscriptores:
+            try:
+                funcion(evento)
+            except Exception as e:
+                print(f"Error entregando evento de stream: {e}")
+        return evento
+
+    def suscribir(self, funcion):
+        with self._lock:
+            self._suscriptores.append(funcion)
+
+    def desuscribir(self, funcion):
+        with self._lock:
+            if funcion in self._suscriptores:
+                self._suscriptores.remove(funcion)
+
+    def eventos(self, limite=None):
+        """Eventos más recientes, del más antiguo al más nuevo"""
+        with self._lock:
+            eventos = list(self._eventos)
+        return eventos[-limite:] if limite else eventos
+
+    def texto_prometheus(self):
+        """Métricas en el formato de texto de Prometheus (versión 0.0.4)"""
+        with self._lock:
+            histogramas = {clave: list(cuentas) for clave, cuentas in self._histogramas.items()}
+            sumas = dict(self._sumas)
+            operaciones = dict(self._operaciones)
+            abiertos = dict(self._abiertos)
+
+        lineas = ["# HELP shadowcam_stream_fase_segundos Duración de cada fase de los streams",
+                  "# TYPE shadowcam_stream_fase_segundos histogram"]
+        for (fase, origen), cuentas in sorted(histogramas.items()):
+            etiquetas = f'fase="{fase}",origen="{origen}"'
+            acumulado = 0
+            for limite, cuenta in zip((*self.limites, "+Inf"), cuentas):
+                acumulado += cuenta
+                lineas.append(f'shadowcam_stream_fase_segundos_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f"shadowcam_stream_fase_segundos_sum{{{etiquetas}}} {sumas[(fase, origen)]:.6f}")
+            lineas.append(f"shadowcam_stream_fase_segundos_count{{{etiquetas}}} {acumulado}")
+
+        lineas += ["# HELP shadowcam_stream_operaciones_total Operaciones sobre streams por resultado",
+                   "# TYPE shadowcam_stream_operaciones_total counter"]
+        for (operacion, resultado, origen), n in sorted(operaciones.items()):
+            lineas.append(f'shadowcam_stream_operaciones_total{{operacion="{operacion}",'
+                          f'resultado="{resultado}",origen="{origen}"}} {n}')
+
+        lineas += ["# HELP shadowcam_streams_abiertos Streams abiertos en este momento",
+                   "# TYPE shadowcam_streams_abiertos gauge"]
+        for origen, n in sorted(abiertos.items()):
+            lineas.append(f'shadowcam_streams_abiertos{{origen="{origen}"}} {n}')
+        return "\n".join(lineas) + "\n"
+
+metricas_stream = None
+
+def obtener_metricas():
+    """Métricas de streams compartidas por toda la aplicación"""
+    global metricas_stream
+    if metricas_stream is None:
+        metricas_stream = StreamMetrics()
+    return metricas_stream
+
+def servir_metricas(puerto, host="127.0.0.1"):
+    """Servir /metrics (Prometheus) y /eventos (JSON Lines) en un hilo propio.
+
+    Escucha solo en local por defecto; devuelve el servidor para poder
+    cerrarlo con ``shutdown()``.
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    metricas = obtener_metricas()
+
+    class Manejador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            ruta = urlsplit(self.path).path
+            if ruta == "/metrics":
+                cuerpo = metricas.texto_prometheus()
+                tipo = "text/plain; version=0.0.4; charset=utf-8"
+            elif ruta == "/eventos":
+                cuerpo = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in metricas.eventos())
+                tipo = "application/x-ndjson; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            datos = cuerpo.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", tipo)
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def log_message(self, formato, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True,
+                     name="shadowcam-metricas").start()
+    return servidor
+
+def medir_fases_conexion(url, timeout=3.0):
+    """Medir por separado DNS, conexión TCP y (en RTSP) la respuesta a OPTIONS.
+
+    OpenCV no expone estas fases; se miden con una conexión propia justo
+    antes de abrir el stream. Devuelve segundos por fase y el error, si hubo.
+    """
+    fases = {}
+    host, puerto = destino_camara(url)
+    if not host:
+        return fases, "URL sin host"
+    try:
+        inicio = time.perf_counter()
+        familia, tipo, proto, _, direccion = socket.getaddrinfo(host, puerto, type=socket.SOCK_STREAM)[0]
+        fases["dns"] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        with socket.socket(familia, tipo, proto) as s:
+            s.settimeout(timeout)
+            s.connect(direccion)
+            fases["tcp"] = time.perf_counter() - inicio
+
+            if url.startswith('rtsp://'):
+                inicio = time.perf_counter()
+                s.sendall(f"OPTIONS {url_sin_credenciales(url)} RTSP/1.0\r\nCSeq: 1\r\n"
+                          "User-Agent: ShadowCam\r\n\r\n".encode())
+                linea = s.recv(256).decode(errors='replace').split("\r\n", 1)[0]
+                fases["rtsp"] = time.perf_counter() - inicio
+                if not linea.startswith("RTSP/"):
+                    return fases, f"Respuesta RTSP inesperada: {linea[:80]}"
+    except OSError as e:
+        return fases, str(e)
+    return fases, None
+
+
+class CapturaInstrumentada:
+    """Envoltorio de cv2.VideoCapture que mide cada lectura y la liberación.
+
+    Expone la misma interfaz que usan los visores (``isOpened``, ``read``,
+    ``grab``, ``retrieve``, ``get``, ``set``, ``release``); el resto se
+    delega tal cual. ``tiempos`` guarda en milisegundos las fases de la
+    apertura y el primer frame, que con FFmpeg llega tras el primer keyframe.
+    """
+
+    def __init__(self, cap, url, origen, inicio, tiempos, metricas):
+        self._cap = cap
+        self.url = url
+        self.origen = origen
+        self.tiempos = tiempos
+        self._metricas = metricas
+        self._inicio = inicio
+        self._abierta = cap.isOpened()
+        self._fallos = 0
+        self.frames = 0
+        if self._abierta:
+            metricas.abierto(origen, 1)
+
+    def isOpened(self):
+        return self._cap.isOpened()
+
+    def _tras_lectura(self, ok, segundos):
+        metricas = self._metricas
+        if ok:
+            metricas.observar("lectura", self.origen, segundos)
+            self.frames += 1
+            if self.frames == 1:
+                self.tiempos["primer_frame_ms"] = (time.perf_counter() - self._inicio) * 1000
+                metricas.observar("primer_frame", self.origen, self.tiempos["primer_frame_ms"] / 1000)
+                metricas.contar("primer_frame", "ok", self.origen)
+                metricas.evento("primer_frame", self.url, self.origen, **self.tiempos)
+            self._fallos = 0
+        else:
+            self._fallos += 1
+            if self._fallos == 1:
+                metricas.contar("lectura", "error", self.origen)
+                metricas.evento("error_lectura", self.url, self.origen, frames=self.frames,
+                                lectura_ms=segundos * 1000)
+
+    def read(self, *args):
+        inicio = time.perf_counter()
+        ret, frame = self._cap.read(*args)
+        self._tras_lectura(ret, time.perf_counter() - inicio)
+        return ret, frame
+
+    def grab(self):
+        inicio = time.perf_counter()
+        ret = self._cap.grab()
+        self._tras_lectura(ret, time.perf_counter() - inicio)
+        return ret
+
+    def retrieve(self, *args):
+        inicio = time.perf_counter()
+        ret, frame = self._cap.retrieve(*args)
+        self._metricas.observar("conversion", self.origen, time.perf_counter() - inicio)
+        return ret, frame
+
+    def release(self):
+        inicio = time.perf_counter()
+        self._cap.release()
+        segundos = time.perf_counter() - inicio
+        if self._abierta:
+            self._abierta = False
+            self._metricas.abierto(self.origen, -1)
+            self._metricas.observar("liberacion", self.origen, segundos)
+            self._metricas.evento("liberacion", self.url, self.origen, frames=self.frames,
+                                  liberacion_ms=segundos * 1000,
+                                  duracion_s=time.perf_counter() - self._inicio)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cap, nombre)
+
+# ---------------------- CAPTURA ----------------------
+
+# OpenCV lee OPENCV_FFMPEG_CAPTURE_OPTIONS al abrir cada stream
+_cond_ffmpeg = threading.Condition()
+_aperturas_ffmpeg = {"cadena": None, "activas": 0}
+
+def abrir_captura(url, opciones=None, resolucion=None, origen="visor", fases=None):
+    """Abrir un cv2.VideoCapture con opciones de FFmpeg propias del stream.
+
+    Como la variable de entorno es global al proceso, varias aperturas
+    pueden ir en paralelo solo si comparten la misma cadena de opciones;
+    una cadena distinta espera a que terminen las que están en curso.
+
+    Devuelve una CapturaInstrumentada que registra en las métricas de
+    streams la apertura, el primer frame, cada lectura y la liberación.
+    Con ``fases`` (por defecto PERFILAR_FASES) se miden antes DNS, TCP y
+    RTSP OPTIONS con una conexión aparte.
+    """
+    import cv2
+
+    metricas = obtener_metricas()
+    tiempos = {}
+    inicio = time.perf_counter()
+    if metricas.perfilar_fases if fases is None else fases:
+        duraciones, error = medir_fases_conexion(url)
+        for fase, segundos in duraciones.items():
+            metricas.observar(fase, origen, segundos)
+            tiempos[f"{fase}_ms"] = segundos * 1000
+        if error:
+            tiempos["error_fases"] = error
+
+    opciones = {**OPCIONES_FFMPEG_DEFECTO, **(opciones or {})}
+    if not url.startswith('rtsp://'):
+        opciones.pop("rtsp_transport", None)
+    cadena = "|".join(f"{clave};{valor}" for clave, valor in opciones.items())
+
+    with _cond_ffmpeg:
+        while _aperturas_ffmpeg["activas"] and _aperturas_ffmpeg["cadena"] != cadena:
+            _cond_ffmpeg.wait()
+        _aperturas_ffmpeg["cadena"] = cadena
+        _aperturas_ffmpeg["activas"] += 1
+        os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = cadena
+    try:
+        inicio_apertura = time.perf_counter()
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
+    finally:
+        with _cond_ffmpeg:
+            _aperturas_ffmpeg["activas"] -= 1
+            _cond_ffmpeg.notify_all()
+
+    # Evitar que OpenCV acumule frames atrasados en su buffer interno
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if resolucion:
+        # Pista de resolución para los backends que escalan en origen
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, resolucion[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, resolucion[1])
+
+    segundos = time.perf_counter() - inicio_apertura
+    tiempos["apertura_ms"] = segundos * 1000
+    resultado = "ok" if cap.isOpened() else "error"
+    metricas.observar("apertura", origen, segundos)
+    metricas.contar("apertura", resultado, origen)
+    metricas.evento("apertura", url, origen, ok=resultado == "ok", **tiempos)
+    return CapturaInstrumentada(cap, url, origen, inicio, tiempos, metricas)
+
+# ---------------------- RECONEXIÓN ----------------------
+
+def _autorizacion(reto, metodo, uri, usuario, clave):
+    """Cabecera Authorization (Digest o Basic) para un reto WWW-Authenticate"""
+    if not reto.lower().startswith("digest"):
+        return "Basic " + base64.b64encode(f"{usuario}:{clave}".encode()).decode()
+    campos = dict((k.strip().lower(), v.strip().strip('"'))
+                  for k, _, v in (p.partition("=") for p in reto[6:].split(",")))
+    md5 = lambda texto: hashlib.md5(texto.encode()).hexdigest()
+    ha1 = md5(f"{usuario}:{campos.get('realm', '')}:{clave}")
+    ha2 = md5(f"{metodo}:{uri}")
+    nonce = campos.get("nonce", "")
+    cabecera = f'Digest username="{usuario}", realm="{campos.get("realm", "")}", nonce="{nonce}", uri="{uri}"'
+    if "auth" in campos.get("qop", "").split(","):
+        cnonce = os.urandom(8).hex()
+        respuesta = md5(f"{ha1}:{nonce}:00000001:{cnonce}:auth:{ha2}")
+        cabecera += f', qop=auth, nc=00000001, cnonce="{cnonce}"'
+    else:
+        respuesta = md5(f"{ha1}:{nonce}:{ha2}")
+    return cabecera + f', response="{respuesta}"'
+
+def estado_rtsp(url, timeout=3.0):
+    """Código de respuesta a DESCRIBE, autenticándose si la URL trae credenciales"""
+    partes = urlsplit(url)
+    host, puerto = destino_camara(url)
+    uri = url_sin_credenciales(url)
+    autorizacion = ""
+    with socket.create_connection((host, puerto), timeout=timeout) as s:
+        for cseq in (1, 2):
+            s.sendall(f"DESCRIBE {uri} RTSP/1.0\r\nCSeq: {cseq}\r\nAccept: application/sdp\r\n"
+                      f"User-Agent: ShadowCam\r\n{autorizacion}\r\n".encode())
+            cabeceras = s.recv(4096).decode(errors='replace').split("\r\n\r\n", 1)[0].split("\r\n")
+            codigo = int(cabeceras[0].split()[1])
+            if codigo != 401 or cseq == 2 or not partes.username:
+                return codigo
+            retos = [l.split(":", 1)[1].strip() for l in cabeceras[1:]
+                     if l.lower().startswith("www-authenticate:")]
+            # Preferir Digest si la cámara ofrece ambos
+            reto = next((r for r in retos if r.lower().startswith("digest")), retos[0] if retos else "Basic")
+            autorizacion = "Authorization: " + _autorizacion(
+                reto, "DESCRIBE", uri, unquote(partes.username), unquote(partes.password or "")) + "\r\n"
+    return codigo
+
+def diagnosticar_stream(url, timeout=3.0):
+    """Clasificar por qué no se puede abrir o leer un stream.
+
+    ``red`` si no hay conexión TCP con la cámara, ``autenticacion`` si
+    responde 401/403 a DESCRIBE (RTSP) o GET (HTTP), y ``decodificador``
+    en cualquier otro caso: la cámara responde pero OpenCV no obtiene frames.
+    """
+    fases, error = medir_fases_conexion(url, timeout)
+    if "tcp" not in fases:
+        return "red"
+    try:
+        if url.startswith('rtsp://'):
+            codigo = estado_rtsp(url, timeout)
+        elif url.startswith('http://') or url.startswith('https://'):
+            import requests
+            with requests.get(url, timeout=timeout, stream=True) as respuesta:
+                codigo = respuesta.status_code
+        else:
+            return "decodificador"
+    except (OSError, ValueError, IndexError):
+        return "red" if error else "decodificador"
+    except Exception:
+        return "decodificador"
+    return "autenticacion" if codigo in (401, 403) else "decodificador"
+
+
+class ReconnectScheduler:
+    """Reparte en el tiempo las reaperturas de todos los streams del proceso.
+
+    Los errores de red se llevan por host: las cámaras de un mismo equipo
+    comparten el contador de fallos y la hora del próximo intento, y solo
+    una de ellas comprueba si el host ha vuelto mientras las demás esperan.
+    Además, dos reaperturas nunca salen a menos de ``espaciado`` segundos,
+    así treinta visores que pierden la red a la vez no reconectan a la vez.
+    Cuando un stream de un host vuelve a conectar, los que esperaban por
+    ese host adelantan su intento.
+    """
+
+    def __init__(self, espaciado=ESPACIADO_RECONEXIONES, politicas=POLITICAS_RECONEXION):
+        self.espaciado = espaciado
+        self.politicas = politicas
+        self._cond = threading.Condition()
+        self._hosts = {}  # host -> {"fallos", "proximo", "sondeando"}
+        self._recuperados = {}  # host -> instante de la última recuperación
+        self._huecos = set()  # índices (en múltiplos de espaciado) ya reservados
+
+    def espera(self, clase, intento):
+        base, maximo = self.politicas[clase]
+        return random.uniform(base / 2, min(maximo, base * 2 ** max(intento - 1, 0)))
+
+    def _hueco(self, instante):
+        """Reservar el primer hueco libre a partir de ``instante``"""
+        limite = (time.monotonic() - 1) / self.espaciado
+        self._huecos = {h for h in self._huecos if h >= limite}
+        indice = math.ceil(instante / self.espaciado)
+        while indice in self._huecos:
+            indice += 1
+        self._huecos.add(indice)
+        return indice * self.espaciado
+
+    def en_caida(self, host):
+        """Host con errores de red que nadie está comprobando ahora mismo"""
+        with self._cond:
+            estado = self._hosts.get(host)
+            return estado is not None and not estado["sondeando"]
+
+    def clasificar(self, url):
+        """Clase del error; si el host ya está caído no se vuelve a diagnosticar"""
+        if self.en_caida(destino_camara(url)[0]):
+            return "red"
+        return diagnosticar_stream(url)
+
+    def turno(self, host):
+        """Instante (monotonic) en que este stream puede reabrirse.
+
+        Si el host está caído y le toca comprobarlo, el llamante pasa a ser
+        el que sondea y recibe el instante actual; los demás esperan.
+        """
+        ahora = time.monotonic()
+        with self._cond:
+            estado = self._hosts.get(host)
+            if estado is None:
+                return ahora
+            if ahora >= estado["proximo"]:
+                estado["sondeando"] = True
+                estado["proximo"] = ahora + VENTANA_SONDEO_HOST
+                return ahora
+            return self._hueco(estado["proximo"])
+
+    def fallo(self, host, clase, intento):
+        """Registrar un fallo y devolver el instante del próximo intento"""
+        ahora = time.monotonic()
+        with self._cond:
+            if clase != "red":
+                # El host responde: el problema es de este stream
+                if self._hosts.pop(host, None) is not None:
+                    self._cond.notify_all()
+                return self._hueco(ahora + self.espera(clase, intento))
+            estado = self._hosts.setdefault(host, {"fallos": 0, "proximo": 0.0, "sondeando": True})
+            # Los fallos dentro de la misma espera son la misma caída
+            if estado["sondeando"] or ahora >= estado["proximo"]:
+                estado["fallos"] += 1
+                estado["sondeando"] = False
+                estado["proximo"] = ahora + self.espera(clase, estado["fallos"])
+                self._cond.notify_all()
+            return self._hueco(estado["proximo"])
+
+    def exito(self, host):
+        """Un stream del host ha conectado: despertar a los que esperaban por él"""
+        with self._cond:
+            if self._hosts.pop(host, None) is not None:
+                self._recuperados[host] = time.monotonic()
+                self._cond.notify_all()
+
+    def recuperado(self, host):
+        with self._cond:
+            return self._recuperados.get(host)
+
+    def adelantar(self):
+        """Hueco más próximo, para quien deja de esperar porque su host ha vuelto"""
+        with self._cond:
+            return self._hueco(time.monotonic())
+
+    def esperar(self, host, instante, cancelado):
+        """Bloquear hasta ``instante``; vuelve antes si el host se recupera o ``cancelado()``.
+
+        También se adelanta si el stream que sondeaba el host falla antes de
+        agotar su ventana y la nueva espera del host es más corta.
+        """
+        with self._cond:
+            recuperado = self._recuperados.get(host)
+            proximo = self._hosts.get(host, {}).get("proximo")
+            while not cancelado():
+                restante = instante - time.monotonic()
+                if restante <= 0:
+                    return
+                estado = self._hosts.get(host)
+                if self._recuperados.get(host) != recuperado:
+                    recuperado = self._recuperados.get(host)
+                    instante = min(instante, self._hueco(time.monotonic()))
+                    continue
+                if estado and not estado["sondeando"] and estado["proximo"] != proximo:
+                    proximo = estado["proximo"]
+                    if proximo < instante:
+                        instante = self._hueco(proximo)
+                    continue
+                self._cond.wait(min(restante, 0.5))
+
+    def despertar(self):
+        with self._cond:
+            self._cond.notify_all()
+
+planificador_reconexion = None
+
+def obtener_planificador():
+    """Planificador de reconexiones compartido por todos los visores"""
+    global planificador_reconexion
+    if planificador_reconexion is None:
+        planificador_reconexion = ReconnectScheduler()
+    return planificador_reconexion
+
+# ---------------------- GRABACIÓN CONTINUA (NVR) ----------------------
+
+def directorio_camara(camara_id, base=DIRECTORIO_GRABACIONES):
+    return os.path.join(base, f"camara_{camara_id}")
+
+def comando_grabacion(url, directorio, segmento_s, opciones=None):
+    """Orden de ffmpeg que remuxa el stream en segmentos sin recodificar.
+
+    Con ``-c copy`` los cortes caen en el keyframe siguiente a cada
+    ``segmento_s``, así que la duración real depende del GOP de la cámara.
+    RTSP (H.264/H.265) va a MPEG-TS, que sigue siendo legible aunque el
+    proceso muera a mitad de segmento; MJPEG por HTTP va a Matroska.
+    """
+    rtsp = url.startswith('rtsp://')
+    comando = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin"]
+    if rtsp:
+        comando += ["-rtsp_transport", (opciones or {}).get("rtsp_transport", "tcp")]
+    extension = "ts" if rtsp else "mkv"
+    comando += ["-i", url, "-map", "0:v", "-map", "0:a?", "-c", "copy",
+                "-f", "segment", "-segment_time", str(segmento_s), "-segment_atclocktime", "1",
+                "-segment_format", "mpegts" if rtsp else "matroska", "-reset_timestamps", "1",
+                "-strftime", "1", os.path.join(directorio, f"%Y%m%d-%H%M%S.{extension}")]
+    return comando
+
+def segmentos_grabados(directorio):
+    """Segmentos de una carpeta como (ruta, bytes, mtime), del más antiguo al más nuevo.
+
+    Los nombres llevan la fecha y hora de inicio, así que el orden
+    alfabético es el cronológico.
+    """
+    try:
+        entradas = [e for e in os.scandir(directorio)
+                    if e.is_file() and e.name.endswith((".ts", ".mkv"))]
+    except FileNotFoundError:
+        return []
+    segmentos = []
+    for entrada in sorted(entradas, key=lambda e: e.name):
+        try:
+            info = entrada.stat()
+        except FileNotFoundError:
+            continue
+        segmentos.append((entrada.path, info.st_size, info.st_mtime))
+    return segmentos
+
+def aplicar_retencion(directorio, cuota_bytes=None, max_edad_s=None, ahora=None):
+    """Borrar los segmentos más antiguos hasta cumplir la cuota y la antigüedad.
+
+    El segmento más reciente (el que ffmpeg está escribiendo) nunca se
+    borra. Devuelve el número de segmentos borrados y los bytes liberados.
+    """
+    ahora = ahora or time.time()
+    segmentos = segmentos_grabados(directorio)[:-1]
+    total = sum(tamano for _, tamano, _ in segmentos)
+    borrados = liberados = 0
+    for ruta, tamano, mtime in segmentos:
+        sobra_espacio = cuota_bytes is not None and total > cuota_bytes
+        caducado = max_edad_s is not None and mtime < ahora - max_edad_s
+        if not sobra_espacio and not caducado:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"No se pudo borrar {ruta}: {e}")
+            continue
+        try:
+            os.remove(ruta + EXTENSION_INDICE)
+        except OSError:
+            pass
+        total -= tamano
+        borrados += 1
+        liberados += tamano
+    return borrados, liberados
+
+
+class CameraRecorder:
+    """Mantiene un proceso ffmpeg grabando una cámara.
+
+    Un hilo por cámara lanza ffmpeg, comprueba cada INTERVALO_VIGILANCIA
+    que el segmento en curso sigue creciendo y, si el proceso termina o se
+    atasca, lo relanza cuando lo indica el planificador de reconexión. La
+    CPU la pone ffmpeg remuxando; Python solo vigila.
+    """
+
+    def __init__(self, camara, configuracion, directorio_base=DIRECTORIO_GRABACIONES, emitir=None):
+        perfil = CameraManager().obtener_perfil(camara)
+        self.camara_id = camara['id']
+        self.nombre = camara['nombre']
+        self.url = perfil['url']
+        self.opciones = perfil['opciones']
+        self.host = destino_camara(self.url)[0]
+        self.configuracion = configuracion
+        self.directorio = directorio_camara(camara['id'], directorio_base)
+        self.emitir = emitir or (lambda evento: None)
+        self.estado = "detenida"
+        self.detalle = ""
+        self.intentos = 0
+        self.proceso = None
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def _cambiar_estado(self, estado, detalle=""):
+        if (estado, detalle) != (self.estado, self.detalle):
+            self.estado, self.detalle = estado, detalle
+            self.emitir({"tipo": "grabacion", "camara_id": self.camara_id, "nombre": self.nombre,
+                         "estado": estado, "detalle": detalle})
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True,
+                                      name=f"shadowcam-nvr-{self.camara_id}")
+        self._hilo.start()
+
+    def detener(self, esperar=True):
+        self._parar.set()
+        obtener_planificador().despertar()
+        if esperar and self._hilo:
+            self._hilo.join(timeout=15)
+
+    def _vigilar(self):
+        """Esperar a que ffmpeg termine; lo detiene si el segmento deja de crecer"""
+        limite_atasco = self.configuracion["segmento_s"] * 2 + 30
+        segmentos = segmentos_grabados(self.directorio)
+        ultimo_cambio = time.monotonic()
+        ultimo_tamano = (segmentos[-1][0], segmentos[-1][1]) if segmentos else None
+        while not self._parar.wait(INTERVALO_VIGILANCIA):
+            if self.proceso.poll() is not None:
+                return "terminado"
+            segmentos = segmentos_grabados(self.directorio)
+            tamano = (segmentos[-1][0], segmentos[-1][1]) if segmentos else None
+            if tamano != ultimo_tamano:
+                ultimo_cambio, ultimo_tamano = time.monotonic(), tamano
+                self._cambiar_estado("grabando")
+            elif time.monotonic() - ultimo_cambio > limite_atasco:
+                return "atascado"
+        return "detenido"
+
+    def _finalizar_proceso(self):
+        # SIGTERM deja a ffmpeg cerrar el segmento en curso
+        if self.proceso.poll() is None:
+            self.proceso.terminate()
+            try:
+                self.proceso.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proceso.kill()
+                self.proceso.wait()
+
+    def _bucle(self):
+        planificador = obtener_planificador()
+        registro = os.path.join(self.directorio, "ffmpeg.log")
+        while not self._parar.is_set():
+            if self.intentos:
+                instante = planificador.turno(self.host)
+                if instante > time.monotonic():
+                    planificador.esperar(self.host, instante, self._parar.is_set)
+                    continue
+
+            os.makedirs(self.directorio, exist_ok=True)
+            comando = comando_grabacion(self.url, self.directorio, self.configuracion["segmento_s"],
+                                        self.opciones)
+            inicio = time.monotonic()
+            try:
+                with open(registro, "wb") as salida_error:
+                    self.proceso = subprocess.Popen(comando, stdin=subprocess.DEVNULL,
+                                                    stdout=subprocess.DEVNULL, stderr=salida_error)
+            except FileNotFoundError:
+                self._cambiar_estado("error", "ffmpeg no está instalado")
+                return
+            self._cambiar_estado("conectando")
+            try:
+                motivo = self._vigilar()
+            finally:
+                self._finalizar_proceso()
+            if self._parar.is_set():
+                break
+
+            # Un proceso que ha grabado al menos un segmento completo cuenta como éxito
+            if time.monotonic() - inicio > self.configuracion["segmento_s"] and motivo != "atascado":
+                planificador.exito(self.host)
+                self.intentos = 0
+            self.intentos += 1
+            clase = planificador.clasificar(self.url)
+            try:
+                with open(registro, encoding="utf-8", errors="replace") as f:
+                    ultima_linea = (f.read().strip().splitlines() or [""])[-1]
+            except OSError:
+                ultima_linea = ""
+            self._cambiar_estado("reconectando", f"{motivo} ({clase}) {ultima_linea}".strip())
+            instante = planificador.fallo(self.host, clase, self.intentos)
+            planificador.esperar(self.host, instante, self._parar.is_set)
+        self._cambiar_estado("detenida")
+
+    def uso(self):
+        """Segmentos y bytes en disco de esta cámara"""
+        segmentos = segmentos_grabados(self.directorio)
+        return {"segmentos": len(segmentos), "bytes": sum(s[1] for s in segmentos),
+                "desde": segmentos[0][2] if segmentos else None}
+
+
+class NetworkVideoRecorder:
+    """Grabación continua de las cámaras guardadas que la tienen activada.
+
+    ``sincronizar()`` arranca o detiene grabadores según la configuración
+    guardada en el inventario; un hilo aplica la retención de todas las
+    cámaras cada INTERVALO_RETENCION segundos.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_GRABACIONES, emitir=None):
+        self.directorio = directorio
+        self.emitir = emitir or (lambda evento: None)
+        self.grabadores = {}  # camara_id -> CameraRecorder
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo = None
+
+    def sincronizar(self):
+        gestor = CameraManager()
+        deseados = {}
+        for camara in gestor.listar_camaras():
+            configuracion = gestor.obtener_grabacion(camara)
+            if configuracion["activa"]:
+                deseados[camara['id']] = (camara, configuracion)
+
+        with self._lock:
+            for camara_id in list(self.grabadores):
+                grabador = self.grabadores[camara_id]
+                deseado = deseados.get(camara_id)
+                # Cámara desactivada o con otra URL o segmentación: se relanza
+                if (deseado is None or grabador.url != gestor.obtener_perfil(deseado[0])['url']
+                        or grabador.configuracion["segmento_s"] != deseado[1]["segmento_s"]):
+                    grabador.detener(esperar=False)
+                    del self.grabadores[camara_id]
+                else:
+                    grabador.configuracion = deseado[1]
+            for camara_id, (camara, configuracion) in deseados.items():
+                if camara_id not in self.grabadores:
+                    grabador = CameraRecorder(camara, configuracion, self.directorio,
+                                              lambda evento: self.emitir(evento))
+                    self.grabadores[camara_id] = grabador
+                    grabador.iniciar()
+
+    def configurar(self, camara_id, **cambios):
+        """Guardar la configuración de grabación de una cámara y aplicarla"""
+        gestor = CameraManager()
+        camara = gestor.obtener_camara(camara_id)
+        if camara is None:
+            return False
+        configuracion = {**gestor.obtener_grabacion(camara), **cambios}
+        if not gestor.actualizar_camara(camara_id, grabacion=configuracion):
+            return False
+        if self._hilo is not None:
+            self.sincronizar()
+        return True
+
+    def retencion(self):
+        ahora = time.time()
+        with self._lock:
+            grabadores = list(self.grabadores.values())
+        for grabador in grabadores:
+            configuracion = grabador.configuracion
+            borrados, liberados = aplicar_retencion(
+                grabador.directorio,
+                configuracion["cuota_mb"] * 1024 * 1024 if configuracion.get("cuota_mb") else None,
+                configuracion["dias"] * 86400 if configuracion.get("dias") else None, ahora)
+            if borrados:
+                self.emitir({"tipo": "retencion", "camara_id": grabador.camara_id,
+                             "borrados": borrados, "liberados": liberados})
+
+    def indexar(self):
+        """Crear el índice de keyframes de los segmentos ya cerrados que no lo tienen"""
+        with self._lock:
+            grabadores = list(self.grabadores.values())
+        for grabador in grabadores:
+            for ruta, _, _ in segmentos_grabados(grabador.directorio)[:-1]:
+                if self._parar.is_set():
+                    return
+                if not os.path.exists(ruta + EXTENSION_INDICE):
+                    indexar_segmento(ruta)
+
+    def _bucle(self):
+        while not self._parar.wait(INTERVALO_RETENCION):
+            try:
+                self.retencion()
+                self.indexar()
+            except FileNotFoundError:
+                # Sin ffprobe no hay índices; la reproducción los crea al vuelo si puede
+                pass
+            except Exception as e:
+                print(f"Error en el mantenimiento de grabaciones: {e}")
+
+    def estado(self):
+        with self._lock:
+            grabadores = list(self.grabadores.values())
+        return [{"camara_id": g.camara_id, "nombre": g.nombre, "estado": g.estado,
+                 "detalle": g.detalle, **g.uso()} for g in grabadores]
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self.sincronizar()
+        self._hilo = threading.Thread(target=self._bucle, daemon=True, name="shadowcam-retencion")
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        with self._lock:
+            grabadores = list(self.grabadores.values())
+            self.grabadores.clear()
+        for grabador in grabadores:
+            grabador.detener(esperar=False)
+        for grabador in grabadores:
+            grabador.detener()
+        self._hilo = None
+
+grabador_red = None
+
+def obtener_nvr():
+    """Grabador de red compartido por toda la aplicación"""
+    global grabador_red
+    if grabador_red is None:
+        grabador_red = NetworkVideoRecorder()
+    return grabador_red
+
+# ---------------------- REPRODUCCIÓN DE GRABACIONES ----------------------
+
+def inicio_segmento(ruta):
+    """Hora de inicio (epoch) de un segmento, tomada de su nombre"""
+    return time.mktime(time.strptime(os.path.basename(ruta)[:15], "%Y%m%d-%H%M%S"))
+
+def indexar_segmento(ruta, guardar=True):
+    """Índice de keyframes de un segmento: segundos desde su inicio y byte de cada uno.
+
+    ffprobe solo demultiplexa (no decodifica) y su salida se lee línea a
+    línea. El índice se guarda junto al segmento con EXTENSION_INDICE,
+    escrito en un temporal y renombrado para que nunca quede a medias.
+    Si ffprobe falla (segmento truncado o corrupto) se guarda igualmente,
+    con los keyframes que llegara a leer y ``"error"``, para que el
+    segmento no se vuelva a sondear en cada pasada del NVR.
+    """
+    proceso = subprocess.Popen(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,dts_time,duration_time,pos,flags",
+         "-of", "compact=p=0", ruta],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    keyframes, origen, final = [], None, 0.0
+    for linea in proceso.stdout:
+        campos = dict(par.split("=", 1) for par in linea.strip().split("|") if "=" in par)
+        marca = campos.get("pts_time", "N/A")
+        if marca == "N/A":
+            marca = campos.get("dts_time", "N/A")
+        if marca == "N/A":
+            continue
+        instante = float(marca)
+        if origen is None:
+            origen = instante
+        duracion = campos.get("duration_time", "N/A")
+        final = max(final, instante - origen + (float(duracion) if duracion != "N/A" else 0.0))
+        if campos.get("flags", "").startswith("K") and campos.get("pos", "N/A") != "N/A":
+            keyframes.append([round(instante - origen, 3), int(campos["pos"])])
+    proceso.wait()
+
+    indice = {"version": 1, "inicio": inicio_segmento(ruta), "duracion": final, "keyframes": keyframes}
+    if proceso.returncode != 0:
+        indice["error"] = f"ffprobe terminó con código {proceso.returncode}"
+    if guardar:
+        temporal = ruta + EXTENSION_INDICE + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(indice, f)
+        os.replace(temporal, ruta + EXTENSION_INDICE)
+    return indice
+
+
+class RecordingIndex:
+    """Línea de tiempo de las grabaciones de una cámara.
+
+    Los inicios de segmento salen de los nombres de archivo y los índices
+    de keyframes se cargan solo al buscar dentro de un segmento, así que
+    un día de grabación cuesta una lista de rutas en memoria.
+
+    La usan a la vez el hilo del reproductor y el que amplía el rango:
+    ``actualizar()`` sustituye la lista de segmentos de una vez y cada
+    consulta trabaja sobre la lista que había al empezar. Indexar un
+    segmento lanza ffprobe, así que no debe llamarse desde el hilo de Tk.
+    """
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        self._lock = threading.Lock()
+        self._indices = {}  # ruta -> (mtime del segmento, índice)
+        self.actualizar()
+
+    def actualizar(self):
+        segmentos = [ruta for ruta, _, _ in segmentos_grabados(self.directorio)]
+        inicios = [inicio_segmento(ruta) for ruta in segmentos]
+        with self._lock:
+            self._linea = (segmentos, inicios)
+
+    def instantanea(self):
+        """``(segmentos, inicios)`` de una misma actualización"""
+        return self._linea
+
+    @property
+    def segmentos(self):
+        return self._linea[0]
+
+    @property
+    def inicios(self):
+        return self._linea[1]
+
+    def indice(self, ruta):
+        """Índice de un segmento; el último (aún abierto) se reindexa si ha crecido"""
+        try:
+            mtime = os.path.getmtime(ruta)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            guardado = self._indices.get(ruta)
+        if guardado and guardado[0] == mtime:
+            return guardado[1]
+        indice = None
+        try:
+            if os.path.getmtime(ruta + EXTENSION_INDICE) >= mtime:
+                with open(ruta + EXTENSION_INDICE, encoding="utf-8") as f:
+                    indice = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if indice is None:
+            indice = indexar_segmento(ruta, guardar=ruta not in self.segmentos[-1:])
+        with self._lock:
+            self._indices[ruta] = (mtime, indice)
+        return indice
+
+    def rango(self):
+        """Primer y último instante grabados (epoch)"""
+        segmentos, inicios = self.instantanea()
+        if not segmentos:
+            return None
+        ultimo = self.indice(segmentos[-1])
+        return inicios[0], inicios[-1] + (ultimo["duracion"] if ultimo else 0.0)
+
+    def localizar(self, instante):
+        """Segmento y keyframe desde el que decodificar para llegar a ``instante``.
+
+        Devuelve ``(ruta, inicio_segmento, segundos_keyframe, byte_keyframe)``;
+        si ``instante`` cae en un hueco sin grabación se salta al siguiente
+        segmento, y fuera del rango se ajusta al principio o al final.
+        """
+        segmentos, inicios = self.instantanea()
+        if not segmentos:
+            return None
+        posicion = max(bisect_left(inicios, instante + 1e-6) - 1, 0)
+        ruta, inicio = segmentos[posicion], inicios[posicion]
+        indice = self.indice(ruta) or {"duracion": 0.0, "keyframes": []}
+        relativo = instante - inicio
+        if relativo > indice["duracion"] and posicion + 1 < len(segmentos):
+            return self.localizar(inicios[posicion + 1])
+        keyframes = indice["keyframes"]
+        anterior = max(bisect_left(keyframes, [max(relativo, 0.0), float("inf")]) - 1, 0)
+        segundos, byte = keyframes[anterior] if keyframes else (0.0, 0)
+        return ruta, inicio, segundos, byte
+
+
+class SegmentPlayer:
+    """Reproduce y busca en las grabaciones de una cámara desde un hilo propio.
+
+    Cada búsqueda abre el segmento directamente en el byte del keyframe
+    anterior (protocolo ``subfile`` de FFmpeg, solo MPEG-TS) y publica ese
+    frame en cuanto se decodifica; después avanza hasta el instante exacto
+    salvo que llegue otra búsqueda. Al arrastrar la barra solo se atiende
+    la última posición pedida. Como en CaptureEngine, la interfaz recoge
+    el frame más reciente con ``obtener_frame()``.
+    """
+
+    def __init__(self, directorio):
+        self.indice = RecordingIndex(directorio)
+        self.posicion = None  # Instante (epoch) del último frame publicado
+        self.ultima_busqueda_ms = None
+        self._cond = threading.Condition()
+        self._objetivo = None
+        self._reproduciendo = False
+        self._activo = True
+        self._frame = None
+        self._pendiente = False
+        self._cap = None
+        self._segmento = None  # (ruta, instante del primer frame del trozo abierto)
+        self._hilo = threading.Thread(target=self._bucle, daemon=True, name="shadowcam-reproductor")
+        self._hilo.start()
+
+    def buscar(self, instante):
+        with self._cond:
+            self._objetivo = instante
+            self._cond.notify_all()
+
+    def reproducir(self, activo=True):
+        with self._cond:
+            self._reproduciendo = activo
+            self._cond.notify_all()
+
+    @property
+    def reproduciendo(self):
+        return self._reproduciendo
+
+    def obtener_frame(self):
+        """Devolver el frame más reciente si aún no se ha mostrado"""
+        with self._cond:
+            if not self._pendiente:
+                return None
+            self._pendiente = False
+            return self._frame
+
+    def detener(self):
+        with self._cond:
+            self._activo = False
+            self._cond.notify_all()
+
+    def _publicar(self, frame, posicion):
+        with self._cond:
+            self._frame = frame
+            self._pendiente = True
+            self.posicion = posicion
+
+    def _abrir(self, ruta, inicio, segundos, byte):
+        if self._cap is not None:
+            self._cap.release()
+        ruta = os.path.abspath(ruta)
+        if ruta.endswith(".ts"):
+            # El trozo empieza en el keyframe: no hace falta leer desde el principio
+            self._cap = abrir_captura(f"subfile,,start,{byte},end,0,,:{ruta}", OPCIONES_REPRODUCCION,
+                                      origen="reproductor", fases=False)
+        else:
+            # Matroska necesita su cabecera: se abre entero y se busca por tiempo
+            import cv2
+            self._cap = abrir_captura(ruta, OPCIONES_REPRODUCCION, origen="reproductor", fases=False)
+            self._cap.set(cv2.CAP_PROP_POS_MSEC, segundos * 1000)
+            segundos = 0.0
+        self._segmento = (ruta, inicio + segundos)
+
+    def _leer(self):
+        """Siguiente frame del trozo abierto y su instante (epoch), o (None, None)"""
+        import cv2
+
+        ret, frame = self._cap.read()
+        if not ret:
+            return None, None
+        return frame, self._segmento[1] + self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+    def _posicionar(self, objetivo):
+        inicio_busqueda = time.perf_counter()
+        destino = self.indice.localizar(objetivo)
+        if destino is None:
+            return
+        self._abrir(*destino)
+        frame, instante = self._leer()
+        if frame is None:
+            return
+        self._publicar(frame, instante)
+        self.ultima_busqueda_ms = (time.perf_counter() - inicio_busqueda) * 1000
+        # Afinar hasta el instante pedido mientras no llegue otra búsqueda
+        while instante < objetivo - 0.02 and self._objetivo is None and self._activo:
+            siguiente, marca = self._leer()
+            if siguiente is None:
+                break
+            frame, instante = siguiente, marca
+        self._publicar(frame, instante)
+
+    def _siguiente_segmento(self):
+        """Abrir el segmento posterior al actual; False si no hay más"""
+        self.indice.actualizar()
+        # Los nombres ordenan cronológicamente, aunque el actual ya se haya borrado
+        segmentos, inicios = self.indice.instantanea()
+        rutas = [os.path.abspath(r) for r in segmentos]
+        posicion = bisect_right(rutas, self._segmento[0]) if self._segmento else 0
+        if posicion >= len(rutas):
+            return False
+        self._abrir(segmentos[posicion], inicios[posicion], 0.0, 0)
+        return True
+
+    def _bucle(self):
+        reloj = None  # (monotonic, instante) de referencia para reproducir a tiempo real
+        try:
+            while True:
+                with self._cond:
+                    while self._activo and self._objetivo is None and not self._reproduciendo:
+                        reloj = None
+                        self._cond.wait()
+                    if not self._activo:
+                        return
+                    objetivo, self._objetivo = self._objetivo, None
+                if objetivo is not None:
+                    self._posicionar(objetivo)
+                    reloj = None
+                    continue
+
+                if self._cap is None and not self._siguiente_segmento():
+                    self.reproducir(False)
+                    continue
+                frame, instante = self._leer()
+                if frame is None:
+                    # Entre segmentos puede haber un hueco sin grabación: no esperarlo
+                    reloj = None
+                    if not self._siguiente_segmento():
+                        self.reproducir(False)
+                    continue
+                if reloj is None:
+                    reloj = (time.monotonic(), instante)
+                # Esperar al momento del frame; una búsqueda o una pausa lo descartan
+                with self._cond:
+                    while self._activo and self._reproduciendo and self._objetivo is None:
+                        retraso = (instante - reloj[1]) - (time.monotonic() - reloj[0])
+                        if retraso <= 0:
+                            break
+                        self._cond.wait(min(retraso, 0.5))
+                    else:
+                        continue
+                self._publicar(frame, instante)
+        finally:
+            if self._cap is not None:
+                self._cap.release()
+
+# ---------------------- ANÁLISIS DE VIDEO ----------------------
+
+class FrameSampler:
+    """Decimación temporal común a los analizadores de CaptureEngine"""
+
+    intervalo = 0.0
+    _proximo = 0.0
+
+    def debe_analizar(self, ahora=None):
+        """True si toca analizar (y reserva el siguiente turno)"""
+        ahora = time.monotonic() if ahora is None else ahora
+        if ahora < self._proximo:
+            return False
+        self._proximo = ahora + self.intervalo
+        return True
+
+
+class MotionDetector(FrameSampler):
+    """Detección de movimiento por diferencia con un fondo de media móvil.
+
+    Cada frame analizado se reduce a ANCHO_ANALISIS píxeles en gris, se
+    compara con el fondo (``cv2.accumulateWeighted``), se umbraliza y se
+    descartan las zonas ignoradas. Los buffers intermedios se reservan una
+    sola vez por tamaño de frame. ``analizar()`` devuelve las cajas en
+    coordenadas del frame original y emite un evento ``movimiento`` al
+    empezar y otro al terminar cada episodio.
+    """
+
+    def __init__(self, camara_id=None, configuracion=None, emitir=None):
+        configuracion = {**ANALISIS_DEFECTO, **(configuracion or {})}
+        self.camara_id = camara_id
+        self.configuracion = configuracion
+        self.intervalo = 1.0 / configuracion["fps"] if configuracion["fps"] else 0.0
+        self.umbral = configuracion["umbral"]
+        self.area_min = configuracion["area_min"]
+        self.zonas = configuracion["zonas"]
+        self.emitir = emitir or (lambda evento: None)
+        self.activo = False  # Hay un episodio de movimiento en curso
+        self.cajas = []
+        self._ultimo_movimiento = None
+        self._inicio = None
+        self._tamano = None
+
+    def _reservar(self, alto, ancho):
+        import numpy as np
+
+        self._tamano = (alto, ancho)
+        self._escala = ancho / ANCHO_ANALISIS
+        tamano = (ANCHO_ANALISIS, max(1, round(alto / self._escala)))
+        self._dims = tamano
+        self._reducido = np.empty((tamano[1], tamano[0], 3), np.uint8)
+        self._gris = np.empty((tamano[1], tamano[0]), np.uint8)
+        self._fondo_u8 = np.empty_like(self._gris)
+        self._diferencia = np.empty_like(self._gris)
+        self._fondo = None
+        # Máscara de lo que sí se analiza: todo menos las zonas ignoradas
+        self._mascara = np.full_like(self._gris, 255)
+        for x, y, w, h in self.zonas:
+            x0, y0 = int(x * tamano[0]), int(y * tamano[1])
+            self._mascara[y0:y0 + int(h * tamano[1]) + 1, x0:x0 + int(w * tamano[0]) + 1] = 0
+        self._area_total = max(1, int(np.count_nonzero(self._mascara)))
+
+    def analizar(self, frame, ts=None):
+        """Analizar un frame BGR; devuelve ``{"movimiento", "area", "cajas"}``"""
+        import cv2
+
+        ts = time.time() if ts is None else ts
+        if frame.shape[:2] != self._tamano:
+            self._reservar(*frame.shape[:2])
+        # INTER_LINEAR + desenfoque: ~10x más barato que INTER_AREA a 1080p
+        cv2.resize(frame, self._dims, dst=self._reducido, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(self._reducido, cv2.COLOR_BGR2GRAY, dst=self._gris)
+        cv2.GaussianBlur(self._gris, (5, 5), 0, dst=self._gris)
+        if self._fondo is None:
+            self._fondo = self._gris.astype("float32")
+            return {"movimiento": False, "area": 0.0, "cajas": []}
+
+        cv2.convertScaleAbs(self._fondo, dst=self._fondo_u8)
+        cv2.absdiff(self._gris, self._fondo_u8, dst=self._diferencia)
+        cv2.threshold(self._diferencia, self.umbral, 255, cv2.THRESH_BINARY, dst=self._diferencia)
+        cv2.bitwise_and(self._diferencia, self._mascara, dst=self._diferencia)
+        cv2.accumulateWeighted(self._gris, self._fondo, ALFA_FONDO)
+
+        area = cv2.countNonZero(self._diferencia) / self._area_total
+        cajas = []
+        if area >= self.area_min:
+            cv2.dilate(self._diferencia, None, dst=self._diferencia, iterations=2)
+            contornos, _ = cv2.findContours(self._diferencia, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            minimo = self.area_min * self._area_total
+            cajas = [[round(v * self._escala) for v in cv2.boundingRect(c)]
+                     for c in contornos if cv2.contourArea(c) >= minimo]
+        self._actualizar_episodio(bool(cajas), area, cajas, ts)
+        return {"movimiento": bool(cajas), "area": area, "cajas": cajas}
+
+    def _actualizar_episodio(self, hay_movimiento, area, cajas, ts):
+        self.cajas = cajas
+        if hay_movimiento:
+            self._ultimo_movimiento = ts
+            if not self.activo:
+                self.activo = True
+                self._inicio = ts
+                self.emitir({"tipo": "movimiento", "estado": "inicio", "camara_id": self.camara_id,
+                             "ts": ts, "area": round(area, 4), "cajas": cajas})
+        elif self.activo and ts - self._ultimo_movimiento >= SEGUNDOS_FIN_MOVIMIENTO:
+            self.activo = False
+            self.emitir({"tipo": "movimiento", "estado": "fin", "camara_id": self.camara_id,
+                         "ts": ts, "duracion": round(self._ultimo_movimiento - self._inicio, 2)})
+
+def miniatura_gris(frame):
+    """Miniatura en gris de TAMANO_HUELLA muestreada por vecino más próximo.
+
+    INTER_AREA sobre el frame completo cuesta milisegundos a 1080p; el
+    muestreo por vecino más próximo, decenas de microsegundos.
+    """
+    import cv2
+
+    miniatura = cv2.resize(frame, TAMANO_HUELLA, interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(miniatura, cv2.COLOR_BGR2GRAY) if miniatura.ndim == 3 else miniatura
+
+def dhash(frame):
+    """Hash perceptual de diferencias (64 bits) de un frame BGR o de su miniatura en gris"""
+    import cv2
+    import numpy as np
+
+    if frame.ndim == 3 or frame.shape != TAMANO_HUELLA[::-1]:
+        frame = miniatura_gris(frame)
+    # 126x72 -> 9x8 son bloques enteros de 14x9: INTER_AREA toma el camino rápido
+    pequeno = cv2.resize(frame[:, :126], (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(pequeno[:, 1:] > pequeno[:, :-1]).tobytes(), "big")
+
+def huella_frame(frame):
+    """dHash, histograma de luminancia normalizado, media y desviación de un frame"""
+    import cv2
+
+    miniatura = miniatura_gris(frame)
+    media, desviacion = cv2.meanStdDev(miniatura)
+    histograma = cv2.calcHist([miniatura], [0], None, [NIVELES_HISTOGRAMA], [0, 256]).ravel()
+    return {"hash": dhash(miniatura), "histograma": histograma / miniatura.size,
+            "media": float(media[0, 0]), "desviacion": float(desviacion[0, 0]), "miniatura": miniatura}
+
+def distancia_huellas(a, b):
+    """Bits distintos del dHash y variación total (0-1) entre los histogramas"""
+    import cv2
+
+    return bin(a["hash"] ^ b["hash"]).count("1"), cv2.norm(a["histograma"], b["histograma"], cv2.NORM_L1) / 2
+
+
+class TamperDetector(FrameSampler):
+    """Vigilancia de la imagen: congelada, negra, tapada o cambio de escena.
+
+    Un ``ret == True`` solo dice que llegan frames. Cada frame muestreado se
+    reduce a una huella (huella_frame) que se compara con la muestra
+    anterior y con una escena de referencia. Una condición tiene que
+    mantenerse un tiempo mínimo antes de cambiar ``estado`` y emitir un
+    evento de inicio (y otro de fin al desaparecer). El cambio de escena
+    solo se notifica cuando la escena nueva es estable, para no confundirlo
+    con algo que pasa por delante.
+    """
+
+    def __init__(self, camara_id=None, configuracion=None, emitir=None):
+        configuracion = {**ANALISIS_DEFECTO, **(configuracion or {})}
+        self.camara_id = camara_id
+        self.configuracion = configuracion
+        self.intervalo = 1.0 / configuracion["fps_huella"] if configuracion["fps_huella"] else 0.0
+        self.emitir = emitir or (lambda evento: None)
+        self.estado = "ok"
+        self.huella = None
+        self._ts_huella = None
+        self._condicion = "ok"
+        self._desde = None  # ts desde el que se cumple la condición actual
+        self._inicio_estado = None
+        self._referencia = None
+        self._candidata = None  # (huella, ts) de una posible escena nueva
+
+    def _clasificar(self, huella, anterior):
+        import cv2
+
+        if huella["desviacion"] < UMBRAL_UNIFORME:
+            return "negro" if huella["media"] < UMBRAL_NEGRO else "tapado"
+        if anterior is not None and (cv2.norm(huella["miniatura"], anterior["miniatura"], cv2.NORM_L1)
+                                     / huella["miniatura"].size) < UMBRAL_CONGELADO:
+            return "congelado"
+        return "ok"
+
+    def analizar(self, frame, ts=None):
+        """Analizar un frame BGR; devuelve el estado y la condición de esta muestra"""
+        ts = time.time() if ts is None else ts
+        huella = huella_frame(frame)
+        anterior, ts_anterior = self.huella, self._ts_huella
+        self.huella, self._ts_huella = huella, ts
+        condicion = self._clasificar(huella, anterior)
+
+        if condicion != self._condicion:
+            # Un frame congelado lo está desde la muestra anterior, que ya era igual
+            self._desde = ts_anterior if condicion == "congelado" else ts
+            self._condicion = condicion
+        minimo = SEGUNDOS_CONGELADO if condicion == "congelado" else SEGUNDOS_MANIPULACION
+        if condicion == "ok":
+            self._cambiar_estado("ok", ts)
+            self._vigilar_escena(huella, ts)
+        elif ts - self._desde >= minimo:
+            self._cambiar_estado(condicion, ts)
+        return {"estado": self.estado, "condicion": condicion, "hash": huella["hash"],
+                "media": round(huella["media"], 1), "desviacion": round(huella["desviacion"], 1)}
+
+    def _cambiar_estado(self, estado, ts):
+        if estado == self.estado:
+            return
+        if self.estado != "ok":
+            self.emitir({"tipo": self.estado, "estado": "fin", "camara_id": self.camara_id,
+                         "ts": ts, "duracion": round(ts - self._inicio_estado, 2)})
+        if estado != "ok":
+            self.emitir({"tipo": estado, "estado": "inicio", "camara_id": self.camara_id,
+                         "ts": ts, "desde": self._desde})
+        self.estado = estado
+        self._inicio_estado = self._desde if estado != "ok" else None
+
+    def _distinta(self, a, b):
+        bits, histograma = distancia_huellas(a, b)
+        return bits > DISTANCIA_HASH_ESCENA or histograma > DISTANCIA_HISTOGRAMA_ESCENA
+
+    def _vigilar_escena(self, huella, ts):
+        # La referencia sigue los cambios graduales (luz del día) muestra a muestra
+        if self._referencia is None or not self._distinta(huella, self._referencia):
+            self._referencia = huella
+            self._candidata = None
+            return
+        if self._candidata is None or self._distinta(huella, self._candidata[0]):
+            self._candidata = (huella, ts)
+            return
+        if ts - self._candidata[1] >= SEGUNDOS_CAMBIO_ESCENA:
+            bits, histograma = distancia_huellas(huella, self._referencia)
+            self.emitir({"tipo": "cambio_escena", "camara_id": self.camara_id, "ts": ts,
+                         "desde": self._candidata[1], "bits": bits, "histograma": round(histograma, 3)})
+            self._referencia = huella
+            self._candidata = None
+
+# ---------------------- ANÁLISIS EN PROCESOS ----------------------
+
+def _contexto_procesos():
+    import multiprocessing
+
+    # forkserver: los hijos no heredan los hilos (Tk, capturas) del proceso principal
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(metodo)
+
+
+class FrameRing:
+    """Ranuras de tamaño fijo en un bloque de memoria compartida.
+
+    El proceso principal copia cada frame en una ranura libre y al trabajador
+    solo le llega el nombre del bloque, la ranura y la forma del array, que
+    lee sin copiarlo. Sin ranuras libres, ``escribir()`` devuelve None. Un
+    anillo retirado deja de aceptar frames y se libera al vaciarse.
+    """
+
+    def __init__(self, ranuras, tamano):
+        from multiprocessing import shared_memory
+
+        self.ranuras = ranuras
+        self.tamano = tamano
+        self.memoria = shared_memory.SharedMemory(create=True, size=ranuras * tamano)
+        self.nombre = self.memoria.name
+        self._libres = list(range(ranuras))
+        self._lock = threading.Lock()
+        self._retirado = False
+        self._cerrado = False
+
+    def escribir(self, frame):
+        import numpy as np
+
+        with self._lock:
+            if self._retirado or not self._libres:
+                return None
+            ranura = self._libres.pop()
+        np.ndarray(frame.shape, frame.dtype, self.memoria.buf, ranura * self.tamano)[...] = frame
+        return ranura
+
+    def liberar(self, ranura):
+        with self._lock:
+            self._libres.append(ranura)
+        self._cerrar_si_vacio()
+
+    def retirar(self):
+        with self._lock:
+            self._retirado = True
+        self._cerrar_si_vacio()
+
+    def _cerrar_si_vacio(self):
+        with self._lock:
+            if self._cerrado or not self._retirado or len(self._libres) < self.ranuras:
+                return
+            self._cerrado = True
+        self.memoria.close()
+        self.memoria.unlink()
+
+
+# Estado de cada proceso trabajador: bloques compartidos abiertos y
+# detectores de movimiento por cámara (la afinidad garantiza que cada
+# cámara llega siempre al mismo proceso)
+_memorias_trabajador = {}
+_detectores_trabajador = {}
+MAX_MEMORIAS_TRABAJADOR = 8
+
+def _frame_compartido(nombre, ranura, tamano, forma, tipo):
+    from multiprocessing import shared_memory
+    import numpy as np
+
+    memoria = _memorias_trabajador.get(nombre)
+    if memoria is None:
+        memoria = _memorias_trabajador[nombre] = shared_memory.SharedMemory(name=nombre)
+        if len(_memorias_trabajador) > MAX_MEMORIAS_TRABAJADOR:
+            antigua = _memorias_trabajador.pop(next(iter(_memorias_trabajador)))
+            antigua.close()
+    return np.ndarray(forma, np.dtype(tipo), memoria.buf, ranura * tamano)
+
+def _analizador_trabajador(clase, clave, camara_id, configuracion):
+    analizador = _detectores_trabajador.get((clase, clave))
+    if analizador is None or analizador.configuracion != {**ANALISIS_DEFECTO, **(configuracion or {})}:
+        analizador = _detectores_trabajador[(clase, clave)] = clase(camara_id, configuracion)
+    return analizador
+
+def _tarea_movimiento(frame, clave, camara_id=None, configuracion=None, ts=None):
+    detector = _analizador_trabajador(MotionDetector, clave, camara_id, configuracion)
+    eventos = []
+    detector.emitir = eventos.append
+    resultado = detector.analizar(frame, ts)
+    return {**resultado, "activo": detector.activo, "eventos": eventos}
+
+def _tarea_manipulacion(frame, clave, camara_id=None, configuracion=None, ts=None):
+    vigilante = _analizador_trabajador(TamperDetector, clave, camara_id, configuracion)
+    eventos = []
+    vigilante.emitir = eventos.append
+    return {**vigilante.analizar(frame, ts), "eventos": eventos}
+
+def _tarea_huella(frame, clave=None, ts=None):
+    huella = huella_frame(frame)
+    del huella["miniatura"]
+    return {**huella, "histograma": huella["histograma"].tolist()}
+
+def _tarea_miniatura(frame, clave=None, ts=None, ancho=320, calidad=80):
+    import cv2
+
+    alto = max(1, round(frame.shape[0] * ancho / frame.shape[1]))
+    miniatura = cv2.resize(frame, (ancho, alto), interpolation=cv2.INTER_AREA)
+    ok, jpeg = cv2.imencode(".jpg", miniatura, [cv2.IMWRITE_JPEG_QUALITY, calidad])
+    return {"jpeg": jpeg.tobytes() if ok else None, "ancho": ancho, "alto": alto}
+
+TAREAS_POOL = {
+    "movimiento": _tarea_movimiento,
+    "manipulacion": _tarea_manipulacion,
+    "huella": _tarea_huella,
+    "miniatura": _tarea_miniatura,
+}
+
+def _ejecutar_tarea(tarea, nombre, ranura, tamano, forma, tipo, parametros):
+    """Punto de entrada en el proceso trabajador"""
+    return TAREAS_POOL[tarea](_frame_compartido(nombre, ranura, tamano, forma, tipo), **parametros)
+
+
+class AnalysisPool:
+    """Análisis de frames en procesos separados, fuera del GIL del principal.
+
+    Cada trabajador es un proceso con su propio FrameRing. Las tareas con
+    ``clave`` (las que guardan estado entre frames, como el fondo de la
+    detección de movimiento) van siempre al mismo trabajador; las demás, al
+    que tenga menos pendientes. Los procesos se arrancan con la primera
+    tarea que reciben y los anillos crecen si llega un frame mayor.
+    """
+
+    def __init__(self, procesos=PROCESOS_ANALISIS, ranuras=RANURAS_POOL):
+        self.procesos = max(1, procesos)
+        self.ranuras = ranuras
+        self.enviadas = 0
+        self.descartadas = 0
+        self._ejecutores = [None] * self.procesos
+        self._anillos = [None] * self.procesos
+        self._pendientes = [0] * self.procesos
+        self._lock = threading.Lock()
+        self._cerrado = False
+
+    def _trabajador(self, clave):
+        if clave is not None:
+            return hash(clave) % self.procesos
+        return min(range(self.procesos), key=self._pendientes.__getitem__)
+
+    def enviar(self, tarea, frame, clave=None, **parametros):
+        """Encargar ``tarea`` sobre una copia compartida del frame.
+
+        Devuelve un Future con el resultado, o None si el trabajador está
+        saturado (el frame se descarta).
+        """
+        with self._lock:
+            if self._cerrado:
+                return None
+            indice = self._trabajador(clave)
+            anillo = self._anillos[indice]
+            if anillo is None or anillo.tamano < frame.nbytes:
+                if anillo is not None:
+                    anillo.retirar()
+                anillo = self._anillos[indice] = FrameRing(self.ranuras, frame.nbytes)
+            if self._ejecutores[indice] is None:
+                self._ejecutores[indice] = ProcessPoolExecutor(1, mp_context=_contexto_procesos())
+            ejecutor = self._ejecutores[indice]
+            self._pendientes[indice] += 1
+
+        ranura = anillo.escribir(frame)
+        if ranura is not None:
+            try:
+                futuro = ejecutor.submit(_ejecutar_tarea, tarea, anillo.nombre, ranura, anillo.tamano,
+                                         frame.shape, frame.dtype.str, {"clave": clave, **parametros})
+            except (BrokenProcessPool, RuntimeError):
+                # El proceso murió: se sustituye en el próximo envío
+                anillo.liberar(ranura)
+                ranura = None
+                with self._lock:
+                    if self._ejecutores[indice] is ejecutor:
+                        self._ejecutores[indice] = None
+        if ranura is None:
+            with self._lock:
+                self._pendientes[indice] -= 1
+            self.descartadas += 1
+            return None
+
+        def terminado(_):
+            anillo.liberar(ranura)
+            with self._lock:
+                self._pendientes[indice] -= 1
+
+        futuro.add_done_callback(terminado)
+        self.enviadas += 1
+        return futuro
+
+    def estado(self):
+        with self._lock:
+            return {"procesos": self.procesos, "activos": sum(e is not None for e in self._ejecutores),
+                    "pendientes": sum(self._pendientes), "enviadas": self.enviadas,
+                    "descartadas": self.descartadas}
+
+    def cerrar(self):
+        with self._lock:
+            self._cerrado = True
+            ejecutores, self._ejecutores = self._ejecutores, [None] * self.procesos
+            anillos, self._anillos = self._anillos, [None] * self.procesos
+        for ejecutor in ejecutores:
+            if ejecutor is not None:
+                ejecutor.shutdown(wait=True, cancel_futures=True)
+        for anillo in anillos:
+            if anillo is not None:
+                anillo.retirar()
+
+
+class PooledAnalyzer(FrameSampler):
+    """Analizador de CaptureEngine que ejecuta una tarea del AnalysisPool.
+
+    Expone lo mismo que MotionDetector y TamperDetector (``debe_analizar``,
+    ``analizar``, ``activo``, ``cajas`` y ``estado``) con el último resultado
+    recibido. ``analizar()`` solo encola el frame: devuelve el último
+    resultado que llegó del pool, que es de un frame anterior, o None
+    hasta que llega el primero. Mientras la tarea anterior sigue en curso
+    no se envían frames nuevos, así el trabajador ve los frames de cada
+    cámara en orden.
+    """
+
+    def __init__(self, pool, tarea, clave=None, fps=ANALISIS_DEFECTO["fps"], emitir=None, **parametros):
+        self.pool = pool
+        self.tarea = tarea
+        self.clave = clave
+        self.intervalo = 1.0 / fps if fps else 0.0
+        self.emitir = emitir or (lambda evento: None)
+        self.parametros = parametros
+        self.resultado = None
+        self.activo = False
+        self.cajas = []
+        self.estado = "ok"
+        self._en_curso = None
+
+    def debe_analizar(self, ahora=None):
+        if self._en_curso is not None and not self._en_curso.done():
+            return False
+        return super().debe_analizar(ahora)
+
+    def analizar(self, frame, ts=None):
+        """Encolar un frame; devuelve el último resultado recibido (o None)"""
+        futuro = self.pool.enviar(self.tarea, frame, self.clave, ts=time.time() if ts is None else ts,
+                                  **self.parametros)
+        if futuro is not None:
+            self._en_curso = futuro
+            futuro.add_done_callback(self._recibir)
+        return self.resultado
+
+    def _recibir(self, futuro):
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            print(f"Error en el análisis en proceso ({self.tarea}): {e}")
+            return
+        self.resultado = resultado
+        self.activo = resultado.get("activo", False)
+        self.cajas = resultado.get("cajas", [])
+        self.estado = resultado.get("estado", "ok")
+        for evento in resultado.get("eventos", ()):
+            self.emitir(evento)
+
+
+_pool_analisis = None
+_lock_pool = threading.Lock()
+
+def obtener_pool_analisis():
+    """Pool de análisis compartido; None si PROCESOS_ANALISIS es 0"""
+    global _pool_analisis
+    if PROCESOS_ANALISIS <= 0:
+        return None
+    with _lock_pool:
+        if _pool_analisis is None:
+            _pool_analisis = AnalysisPool()
+            atexit.register(_pool_analisis.cerrar)
+        return _pool_analisis
+
+def detector_movimiento(camara_id, configuracion=None, emitir=None):
+    """MotionDetector en el pool de procesos si está disponible, si no en el propio hilo.
+
+    Quien lo use debe leer ``activo`` y ``cajas``, que valen igual en los
+    dos casos: el dict que devuelve ``analizar()`` es el de ese frame con
+    MotionDetector, pero con el pool es el de un frame anterior o None.
+    """
+    configuracion = {**ANALISIS_DEFECTO, **(configuracion or {})}
+    pool = obtener_pool_analisis()
+    if pool is None:
+        return MotionDetector(camara_id, configuracion, emitir)
+    return PooledAnalyzer(pool, "movimiento", camara_id, configuracion["fps"], emitir,
+                          camara_id=camara_id, configuracion=configuracion)
+
+# ---------------------- FUNCIONES RED ----------------------
+def obtener_interfaces():
+    interfaces = []
+    for nombre, info in psutil.net_if_addrs().items():
+        for i in info:
+            if i.family == socket.AF_INET and not i.address.startswith("127."):
+                interfaces.append({"nombre": nombre, "ip": i.address, "mascara": i.netmask})
+    return interfaces
+
+def calcular_red(ip, mascara="255.255.255.0"):
+    return str(ipaddress.ip_network(f"{ip}/{mascara or '255.255.255.0'}", strict=False))
+
+def limitar_red(ip, red, max_hosts=MAX_HOSTS_ESCANEO):
+    """Recortar la red al bloque de ``max_hosts`` direcciones que contiene a ``ip``"""
+    red = ipaddress.ip_network(red)
+    if red.num_addresses <= max_hosts:
+        return red
+    prefijo = red.max_prefixlen - (max_hosts.bit_length() - 1)
+    return ipaddress.ip_network(f"{ip}/{prefijo}", strict=False)
+
+def fragmentar_red(red, prefijo=PREFIJO_FRAGMENTO):
+    red = ipaddress.ip_network(red)
+    if red.prefixlen >= prefijo:
+        return [red]
+    return list(red.subnets(new_prefix=prefijo))
+
+def escanear_red(rango_red, timeout=2):
+    from scapy.all import ARP, Ether, srp
+    paquete = Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=rango_red)
+    resultado = srp(paquete, timeout=timeout, verbose=False)[0]
+    dispositivos = []
+    for enviado, recibido in resultado:
+        dispositivos.append({'ip': recibido.psrc, 'mac': recibido.hwsrc})
+    return dispositivos
+
+def escanear_red_fragmentada(red, progreso=None, timeout=TIMEOUT_FRAGMENTO,
+                             max_simultaneos=MAX_FRAGMENTOS_SIMULTANEOS):
+    """Barrido ARP de una red grande en fragmentos /24 paralelos.
+
+    ``progreso(completados, total, fragmento, encontrados)`` se llama al
+    terminar cada fragmento. Los fallos que afectan a todos los fragmentos
+    (permisos, interfaz o libpcap/Npcap, scapy sin instalar) cancelan el
+    resto y se propagan; cualquier otro error solo pierde ese fragmento.
+    """
+    fragmentos = fragmentar_red(red)
+    dispositivos = {}
+    with ThreadPoolExecutor(max_workers=min(max_simultaneos, len(fragmentos))) as executor:
+        futuros = {executor.submit(escanear_red, str(f), timeout): f for f in fragmentos}
+        for completados, futuro in enumerate(as_completed(futuros), 1):
+            fragmento = futuros[futuro]
+            try:
+                encontrados = futuro.result()
+            except (OSError, ImportError):
+                for pendiente in futuros:
+                    pendiente.cancel()
+                raise
+            except Exception as e:
+                print(f"Error escaneando {fragmento}: {e}")
+                encontrados = []
+            for d in encontrados:
+                dispositivos.setdefault(d['ip'], d)
+            if progreso:
+                progreso(completados, len(fragmentos), fragmento, len(encontrados))
+    return list(dispositivos.values())
+
+def escanear_puertos(ip, puertos=CAM_PORTS):
+    abiertos = []
+    for puerto in puertos:
+        try:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.settimeout(0.5)
+            resultado = s.connect_ex((ip, puerto))
+            if resultado == 0:
+                abiertos.append(puerto)
+            s.close()
+        except:
+            continue
+    return abiertos
+
+def _hosts_nmap_xml(lineas):
+    """Extraer cada ``<host>`` del XML de nmap en cuanto se cierra su elemento"""
+    parser = ET.XMLPullParser(events=("end",))
+    for linea in lineas:
+        parser.feed(linea)
+        for _, elemento in parser.read_events():
+            if elemento.tag != "host":
+                continue
+            ip = next((a.get("addr") for a in elemento.iter("address")
+                       if a.get("addrtype") in ("ipv4", "ipv6")), None)
+            abiertos = [p for p in elemento.iter("port")
+                        if p.find("state") is not None and p.find("state").get("state") == "open"]
+            info = {'puertos_abiertos': [int(p.get("portid")) for p in abiertos],
+                    'servicios': [p.find("service").get("name") if p.find("service") is not None else ""
+                                  for p in abiertos]}
+            elemento.clear()
+            if ip:
+                yield ip, info
+
+def _ejecutar_nmap(ips, puertos, plantilla):
+    """Una ejecución de nmap sobre varios hosts; produce ``(ip, info)`` según terminan"""
+    comando = ["nmap", "-sS", "-n", "--open", f"-T{plantilla}",
+               "-p", ",".join(str(p) for p in puertos), "-oX", "-", *ips]
+    # stderr a un archivo temporal: si fuera otra tubería, nmap podría
+    # bloquearse escribiendo en ella mientras aquí se espera el fin de stdout
+    with tempfile.TemporaryFile() as salida_error:
+        proceso = subprocess.Popen(comando, stdout=subprocess.PIPE, stderr=salida_error)
+        try:
+            yield from _hosts_nmap_xml(proceso.stdout)
+            proceso.wait()
+        finally:
+            proceso.stdout.close()
+            if proceso.poll() is None:
+                proceso.kill()
+                proceso.wait()
+        if proceso.returncode != 0:
+            salida_error.seek(0)
+            error = salida_error.read().decode(errors="replace").strip()
+            raise RuntimeError(error or f"nmap terminó con código {proceso.returncode}")
+
+def escaneo_avanzado_lote(ips, puertos=CAM_PORTS, plantilla=PLANTILLA_NMAP,
+                          max_procesos=MAX_PROCESOS_NMAP):
+    """Escanear muchos hosts con nmap en una sola ejecución (o unas pocas en paralelo).
+
+    Produce ``(ip, {'puertos_abiertos', 'servicios'})`` en cuanto nmap
+    cierra cada host en su salida XML; los hosts que nmap no informa (sin
+    puertos abiertos) se entregan al final con listas vacías. Si nmap no
+    está instalado o falla, se lanza la excepción tras entregar lo que
+    alcanzó a informar, para que quien llama sondee el resto por otra vía.
+    """
+    ips = list(ips)
+    if not ips:
+        return
+    procesos = max(1, min(max_procesos, -(-len(ips) // HOSTS_POR_PROCESO_NMAP)))
+    grupos = [ips[i::procesos] for i in range(procesos)]
+    resultados_cola = queue.Queue()
+    fin = object()
+
+    def ejecutar(grupo):
+        try:
+            for resultado in _ejecutar_nmap(grupo, puertos, plantilla):
+                resultados_cola.put(resultado)
+        except Exception as e:
+            resultados_cola.put(e)
+        finally:
+            resultados_cola.put(fin)
+
+    for grupo in grupos:
+        threading.Thread(target=ejecutar, args=(grupo,), daemon=True).start()
+
+    pendientes = set(ips)
+    errores = []
+    activos = len(grupos)
+    while activos:
+        resultado = resultados_cola.get()
+        if resultado is fin:
+            activos -= 1
+        elif isinstance(resultado, Exception):
+            errores.append(resultado)
+        elif resultado[0] in pendientes:
+            pendientes.discard(resultado[0])
+            yield resultado
+    if errores:
+        raise errores[0]
+    for ip in ips:
+        if ip in pendientes:
+            yield ip, {'puertos_abiertos': [], 'servicios': []}
+
+def escaneo_avanzado(ip, plantilla=PLANTILLA_NMAP):
+    try:
+        return dict(escaneo_avanzado_lote([ip], plantilla=plantilla))[ip]
+    except (OSError, RuntimeError):
+        return {'puertos_abiertos': [], 'servicios': []}
+
+# ---------------------- FABRICANTES (OUI) ----------------------
+
+class OuiResolver:
+    """Resuelve el fabricante de una MAC con una tabla OUI local.
+
+    La tabla se carga una sola vez, en la primera consulta, como un dict
+    ``{prefijo de 24 bits: fabricante}`` con los nombres internados (muchos
+    prefijos comparten fabricante). Las MAC ya resueltas se memorizan en
+    un LRU, así una consulta repetida no toca ni la tabla ni el disco.
+    """
+
+    def __init__(self, ruta=ARCHIVO_OUI, tam_cache=4096):
+        self.ruta = ruta
+        self._tabla = None
+        self._lock = threading.Lock()
+        self.resolver = lru_cache(maxsize=tam_cache)(self._resolver)
+
+    @staticmethod
+    def parsear(lineas):
+        """Leer el formato compacto (``001A2B:Fabricante``) o el oui.txt del IEEE"""
+        tabla = {}
+        for linea in lineas:
+            if isinstance(linea, bytes):
+                linea = linea.decode('utf-8', errors='replace')
+            linea = linea.strip()
+            if "(base 16)" in linea:
+                prefijo, _, fabricante = linea.partition("(base 16)")
+            elif ":" in linea and "(hex)" not in linea:
+                prefijo, _, fabricante = linea.partition(":")
+            else:
+                continue
+            prefijo = prefijo.strip().replace("-", "")
+            fabricante = fabricante.strip()
+            if len(prefijo) != 6 or not fabricante:
+                continue
+            try:
+                tabla[int(prefijo, 16)] = sys.intern(fabricante)
+            except ValueError:
+                continue
+        return tabla
+
+    def _cargar(self):
+        with self._lock:
+            if self._tabla is None:
+                try:
+                    with open(self.ruta, 'rb') as f:
+                        self._tabla = self.parsear(f)
+                except FileNotFoundError:
+                    print(f"Tabla OUI no encontrada en {self.ruta}; usa 'Actualizar OUI'")
+                    self._tabla = {}
+            return self._tabla
+
+    def _resolver(self, mac):
+        tabla = self._tabla if self._tabla is not None else self._cargar()
+        digitos = mac.replace(":", "").replace("-", "").replace(".", "")
+        try:
+            return tabla.get(int(digitos[:6], 16), "Desconocido")
+        except ValueError:
+            return "Desconocido"
+
+    def actualizar_desde_archivo(self, origen):
+        """Reemplazar la tabla con un archivo local; devuelve los prefijos cargados"""
+        with open(origen, 'rb') as f:
+            tabla = self.parsear(f)
+        if not tabla:
+            return 0
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        temporal = self.ruta + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            for prefijo, fabricante in sorted(tabla.items()):
+                f.write(f"{prefijo:06X}:{fabricante}\n")
+        os.replace(temporal, self.ruta)
+        with self._lock:
+            self._tabla = tabla
+        self.resolver.cache_clear()
+        return len(tabla)
+
+resolver_oui = OuiResolver()
+
+# ---------------------- DESCUBRIMIENTO ASÍNCRONO ----------------------
+
+async def _probar_puerto(ip, puerto, timeout, semaforo):
+    async with semaforo:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, puerto), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return puerto
+
+async def _sondear_host(ip, puertos, timeout, semaforo):
+    abiertos = await asyncio.gather(*(_probar_puerto(ip, p, timeout, semaforo) for p in puertos))
+    return ip, [p for p in abiertos if p is not None]
+
+async def descubrir_hosts_async(ips, puertos=CAM_PORTS, timeout=TIMEOUT_PUERTO,
+                                limite=MAX_CONEXIONES_SIMULTANEAS):
+    """Produce ``(ip, puertos_abiertos)`` por host en cuanto termina su sondeo.
+
+    Todos los hosts y puertos se prueban a la vez bajo un semáforo de
+    ``limite`` conexiones, así el tiempo total depende del timeout y de
+    ``hosts * puertos / limite``, no del número de hosts por puerto.
+    """
+    semaforo = asyncio.Semaphore(limite)
+    tareas = [asyncio.ensure_future(_sondear_host(ip, puertos, timeout, semaforo)) for ip in ips]
+    try:
+        for tarea in asyncio.as_completed(tareas):
+            yield await tarea
+    finally:
+        for tarea in tareas:
+            tarea.cancel()
+
+def descubrir_hosts(ips, puertos=CAM_PORTS, timeout=TIMEOUT_PUERTO,
+                    limite=MAX_CONEXIONES_SIMULTANEAS):
+    """Versión para hilos: generador que entrega los resultados según llegan.
+
+    El bucle de asyncio corre en su propio hilo, así el escaneo sigue
+    avanzando mientras quien consume procesa cada host.
+    """
+    resultados_cola = queue.Queue()
+    fin = object()
+
+    async def productor():
+        async for resultado in descubrir_hosts_async(ips, puertos, timeout, limite):
+            resultados_cola.put(resultado)
+
+    def ejecutar():
+        try:
+            asyncio.run(productor())
+        finally:
+            resultados_cola.put(fin)
+
+    threading.Thread(target=ejecutar, daemon=True).start()
+    while True:
+        resultado = resultados_cola.get()
+        if resultado is fin:
+            return
+        yield resultado
+
+# ---------------------- FUNCIONES CÁMARAS ----------------------
+def construir_urls(ip, puertos):
+    urls = []
+    for puerto in puertos:
+        for user, pwd in DEFAULT_CREDS:
+            if user and pwd:
+                urls.append(f"rtsp://{user}:{pwd}@{ip}:{puerto}/")
+                urls.append(f"http://{user}:{pwd}@{ip}:{puerto}/video")
+            else:
+                urls.append(f"rtsp://{ip}:{puerto}/")
+                urls.append(f"http://{ip}:{puerto}/video")
+    return urls
+
+def probar_stream(url, log=None):
+    if log:
+        log(f"Probando: {url}\n")
+    
+    cap = abrir_captura(url, origen="escaneo", fases=False)
+    try:
+        return cap.isOpened() and cap.read()[0]
+    finally:
+        cap.release()
+
+# ---------------------- ESCANEO ----------------------
+
+def ejecutar_escaneo(red, emitir, avanzado=False, completo=False, plantilla_nmap=PLANTILLA_NMAP):
+    """Escaneo completo de una red; devuelve la lista de dispositivos.
+
+    Cada paso se comunica con ``emitir(evento)``, un dict con la clave
+    ``tipo`` (fragmento, aviso, hosts, nmap, prueba, camara, dispositivo,
+    desaparecido o resumen), así la interfaz y la línea de comandos
+    presentan el mismo escaneo cada una a su manera.
+    """
+    resultados = []
+
+    def progreso(completados, total, fragmento, encontrados):
+        emitir({"tipo": "fragmento", "completados": completados, "total": total,
+                "fragmento": str(fragmento), "encontrados": encontrados})
+
+    try:
+        dispositivos = escanear_red_fragmentada(red, progreso)
+    except (OSError, ImportError) as e:
+        # Sin privilegios, sin libpcap/Npcap o sin scapy: barrido TCP de todo el rango
+        emitir({"tipo": "aviso", "mensaje": f"ARP no disponible ({e}); barrido TCP del rango"})
+        hosts = [str(h) for h in ipaddress.ip_network(red).hosts()]
+        dispositivos = [{'ip': ip, 'mac': "Desconocida", 'puertos_abiertos': puertos}
+                        for ip, puertos in descubrir_hosts(hosts) if puertos]
+    emitir({"tipo": "hosts", "red": red, "total": len(dispositivos)})
+
+    # Re-escaneo incremental: solo se sondea lo nuevo, lo que cambió
+    # de IP o lo que caducó en la caché (las MAC desconocidas siempre)
+    cache = DeviceCache(ttl=0 if completo else TTL_CACHE_DISPOSITIVOS)
+    anteriores = cache.cargar_red(red)
+    con_mac = [d for d in dispositivos if d['mac'] != "Desconocida"]
+    a_sondear, reutilizados, desaparecidos = cache.clasificar(con_mac, anteriores)
+    if not anteriores:
+        # Primer escaneo de la red: nada es "nuevo" respecto a otro anterior
+        for d in a_sondear:
+            d['cambio'] = None
+    a_sondear += [d for d in dispositivos if d['mac'] == "Desconocida"]
+
+    def registrar(d):
+        resultados.append(d)
+        emitir({"tipo": "dispositivo", **d})
+
+    for d in reutilizados:
+        d['posible_camara'] = any(p in d['puertos_abiertos'] for p in CAM_PORTS)
+        registrar(d)
+    cache.marcar_vistos([d['mac'] for d in reutilizados])
+
+    por_ip = {d['ip']: d for d in a_sondear}
+
+    def sondeo_tcp(ips):
+        # Todos los hosts a la vez; cada uno se procesa en cuanto responde
+        pendientes = []
+        for ip in ips:
+            if 'puertos_abiertos' in por_ip[ip]:
+                yield por_ip[ip], por_ip[ip]['puertos_abiertos']
+            else:
+                pendientes.append(ip)
+        for ip, puertos in descubrir_hosts(pendientes):
+            yield por_ip[ip], puertos
+
+    def sondeo_nmap(ips):
+        # Un único nmap (o unos pocos en paralelo) solo sobre hosts de la red
+        red_escaneada = ipaddress.ip_network(red)
+        en_red = [ip for ip in ips if ipaddress.ip_address(ip) in red_escaneada]
+        resto = [ip for ip in ips if ipaddress.ip_address(ip) not in red_escaneada]
+        pendientes = set(en_red)
+        try:
+            lote = escaneo_avanzado_lote(en_red, plantilla=plantilla_nmap)
+            for completados, (ip, info) in enumerate(lote, 1):
+                pendientes.discard(ip)
+                emitir({"tipo": "nmap", "completados": completados, "total": len(en_red), "ip": ip})
+                por_ip[ip]['servicios'] = info['servicios']
+                yield por_ip[ip], info['puertos_abiertos']
+        except (OSError, RuntimeError) as e:
+            emitir({"tipo": "aviso", "mensaje": f"nmap no disponible ({e}); "
+                                                f"sondeo TCP de {len(pendientes)} hosts"})
+            resto += [ip for ip in en_red if ip in pendientes]
+        yield from sondeo_tcp(resto)
+
+    sondeos = sondeo_nmap if avanzado else sondeo_tcp
+
+    for d, puertos in sondeos(list(por_ip)):
+        previo = anteriores.get(d['mac'])
+        d['puertos_abiertos'] = puertos
+        d['fabricante'] = resolver_oui.resolver(d['mac'])
+        d['posible_camara'] = any(p in puertos for p in CAM_PORTS)
+        if previo and not d.get('cambio') and sorted(previo['puertos']) != sorted(puertos):
+            d['cambio'] = "puertos"
+
+        if d['posible_camara']:
+            # Probar conexión a las cámaras
+            urls = construir_urls(d['ip'], [p for p in puertos if p in CAM_PORTS])
+            for url in urls:
+                emitir({"tipo": "prueba", "ip": d['ip'], "url": url})
+                if probar_stream(url):
+                    emitir({"tipo": "camara", "ip": d['ip'], "url": url})
+                    d['url_camara'] = url
+                    break
+
+        if d['mac'] != "Desconocida":
+            cache.guardar(d, red)
+        registrar(d)
+
+    for e in desaparecidos:
+        emitir({"tipo": "desaparecido", "ip": e['ip'], "mac": e['mac'], "fabricante": e['fabricante']})
+    emitir({"tipo": "resumen", "red": red, "dispositivos": len(resultados),
+            "nuevos": sum(1 for d in resultados if d.get('cambio') == "nuevo"),
+            "cambiados": sum(1 for d in resultados if d.get('cambio') in ("ip", "puertos")),
+            "desaparecidos": len(desaparecidos), "reutilizados": len(reutilizados),
+            "camaras": sum(1 for d in resultados if d.get('url_camara'))})
+    return resultados
+
+# ---------------------- EXPORTACIONES ----------------------
+
+CREDITOS = [
+    "Enhanced Ethical Camera Detection & Remote Access System v2.1",
+    "Hacking Ético Desarrollado por AndresDev.",
+    "© 2024 - Todos los derechos reservados",
+    "web: https://andresgonzalezdev444.github.io/",
+]
+
+# Esquema estable de exportación: mismas columnas, en el mismo orden, en
+# todos los formatos aunque un dispositivo no tenga alguno de los campos
+COLUMNAS_EXPORTACION = ["ip", "mac", "fabricante", "puertos_abiertos",
+                        "posible_camara", "url_camara", "cambio"]
+FILAS_POR_GRUPO_PARQUET = 1000
+
+# Reporte PDF: filas por tabla (las tablas pequeñas se paginan mucho más
+# rápido que una sola enorme) y fabricantes listados en el desglose
+FILAS_POR_TABLA_PDF = 250
+MAX_FABRICANTES_PDF = 40
+
+def normalizar_fila(dispositivo):
+    """Fila con las columnas del esquema; los puertos como lista de enteros ordenada"""
+    return {
+        "ip": dispositivo.get("ip", ""),
+        "mac": dispositivo.get("mac", ""),
+        "fabricante": dispositivo.get("fabricante") or "Desconocido",
+        "puertos_abiertos": sorted(int(p) for p in dispositivo.get("puertos_abiertos") or []),
+        "posible_camara": bool(dispositivo.get("posible_camara")),
+        "url_camara": dispositivo.get("url_camara") or "",
+        "cambio": dispositivo.get("cambio") or "",
+    }
+
+
+class StreamExporter:
+    """Base de los exportadores: ``escribir()`` por dispositivo y ``cerrar()`` al final"""
+
+    filas = 0
+
+    def escribir(self, dispositivo):
+        raise NotImplementedError
+
+    def cerrar(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class CsvExporter(StreamExporter):
+    """Escribe cada dispositivo como una fila CSV en cuanto se recibe.
+
+    Los puertos se aplanan a ``80;554`` y los créditos se añaden como
+    comentarios al cerrar, sin volver a abrir el archivo.
+    """
+
+    def __init__(self, archivo):
+        self._f = open(archivo, "w", newline="", encoding="utf-8")
+        self._escritor = csv.DictWriter(self._f, fieldnames=COLUMNAS_EXPORTACION)
+        self._escritor.writeheader()
+        self.filas = 0
+
+    def escribir(self, dispositivo):
+        fila = normalizar_fila(dispositivo)
+        fila["puertos_abiertos"] = ";".join(str(p) for p in fila["puertos_abiertos"])
+        self._escritor.writerow(fila)
+        self._f.flush()
+        self.filas += 1
+
+    def cerrar(self):
+        if self._f.closed:
+            return
+        self._f.write("\n# ---------------------- ShadowCam ----------------------\n")
+        for linea in CREDITOS:
+            self._f.write(f"# {linea}\n")
+        self._f.write("# ----------------------------------------------------------\n")
+        self._f.close()
+
+
+class JsonlExporter(StreamExporter):
+    """Un objeto JSON por línea; los puertos se conservan como lista"""
+
+    def __init__(self, archivo):
+        self._f = open(archivo, "w", encoding="utf-8")
+        self.filas = 0
+
+    def escribir(self, dispositivo):
+        self._f.write(json.dumps(normalizar_fila(dispositivo), ensure_ascii=False) + "\n")
+        self._f.flush()
+        self.filas += 1
+
+    def cerrar(self):
+        self._f.close()
+
+
+class ParquetExporter(StreamExporter):
+    """Parquet comprimido con zstd, escrito por grupos de filas.
+
+    Solo se retiene en memoria el grupo en curso (``filas_por_grupo``),
+    así el consumo no crece con el número de dispositivos. Requiere pyarrow.
+    """
+
+    def __init__(self, archivo, filas_por_grupo=FILAS_POR_GRUPO_PARQUET):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._esquema = pa.schema([
+            ("ip", pa.string()), ("mac", pa.string()), ("fabricante", pa.string()),
+            ("puertos_abiertos", pa.list_(pa.int32())), ("posible_camara", pa.bool_()),
+            ("url_camara", pa.string()), ("cambio", pa.string()),
+        ])
+        self._escritor = pq.ParquetWriter(archivo, self._esquema, compression="zstd")
+        self._pendientes = []
+        self.filas_por_grupo = filas_por_grupo
+        self.filas = 0
+
+    def escribir(self, dispositivo):
+        self._pendientes.append(normalizar_fila(dispositivo))
+        self.filas += 1
+        if len(self._pendientes) >= self.filas_por_grupo:
+            self._volcar()
+
+    def _volcar(self):
+        if self._pendientes:
+            self._escritor.write_table(self._pa.Table.from_pylist(self._pendientes, schema=self._esquema))
+            self._pendientes = []
+
+    def cerrar(self):
+        if self._escritor is None:
+            return
+        self._volcar()
+        self._escritor.close()
+        self._escritor = None
+
+EXPORTADORES = {".csv": CsvExporter, ".jsonl": JsonlExporter, ".parquet": ParquetExporter}
+
+def abrir_exportador(archivo):
+    """Exportador en streaming según la extensión del archivo"""
+    extension = os.path.splitext(archivo)[1].lower()
+    if extension not in EXPORTADORES:
+        raise ValueError(f"Formato de exportación no soportado: {extension or archivo}")
+    return EXPORTADORES[extension](archivo)
+
+def exportar(resultados, archivo):
+    """Exportar una lista (o cualquier iterable) de dispositivos; devuelve las filas escritas"""
+    with abrir_exportador(archivo) as exportador:
+        for dispositivo in resultados:
+            exportador.escribir(dispositivo)
+    return exportador.filas
+
+class InventoryStats:
+    """Agregados del inventario actualizados dispositivo a dispositivo.
+
+    ``agregar()`` cuesta O(1) y puede llamarse desde el hilo del escaneo;
+    quien presenta los datos compara ``version`` para saber si hubo cambios
+    y pide una ``instantanea()`` solo entonces.
+    """
+
+    def __init__(self, dispositivos=()):
+        self._lock = threading.Lock()
+        self.reiniciar()
+        for d in dispositivos:
+            self.agregar(d)
+
+    def reiniciar(self):
+        with self._lock:
+            self.total = self.camaras = self.accesibles = 0
+            self.fabricantes = {}  # fabricante -> [dispositivos, cámaras, accesibles]
+            self.cambios = Counter()
+            self.version = 0
+
+    def agregar(self, d):
+        with self._lock:
+            self.total += 1
+            fila = self.fabricantes.setdefault(d.get('fabricante') or "Desconocido", [0, 0, 0])
+            fila[0] += 1
+            if d.get('posible_camara'):
+                self.camaras += 1
+                fila[1] += 1
+            if d.get('url_camara'):
+                self.accesibles += 1
+                fila[2] += 1
+            if d.get('cambio'):
+                self.cambios[d['cambio']] += 1
+            self.version += 1
+
+    def instantanea(self, top=None):
+        """Copia coherente de los agregados; ``top`` limita los fabricantes devueltos"""
+        with self._lock:
+            fabricantes = sorted(((nombre, list(cuentas)) for nombre, cuentas in self.fabricantes.items()),
+                                 key=lambda f: (-f[1][0], f[0]))
+            return {"dispositivos": self.total, "camaras": self.camaras,
+                    "accesibles": self.accesibles, "cambios": dict(self.cambios),
+                    "total_fabricantes": len(fabricantes),
+                    "fabricantes": fabricantes[:top] if top else fabricantes,
+                    "version": self.version}
+
+def resumir_inventario(resultados):
+    """Totales y desglose por fabricante en una sola pasada"""
+    return InventoryStats(resultados).instantanea()
+
+def _recortar(texto, maximo):
+    texto = str(texto)
+    return texto if len(texto) <= maximo else texto[:maximo - 1] + "…"
+
+def escribir_pdf(resultados, archivo, progreso=None):
+    """Reporte PDF del inventario con resumen, desglose por fabricante y detalle.
+
+    El detalle se divide en tablas de ``FILAS_POR_TABLA_PDF`` filas con
+    anchos y altos fijos, así reportlab no mide cada celda ni reparte una
+    tabla gigante entre páginas. Cada tabla se construye al colocarla en
+    la página y se suelta al dibujarla: la historia solo guarda rangos de
+    ``resultados``, no todas las celdas del inventario. Cada página lleva
+    encabezado, pie con los créditos y número de página. ``progreso(completados, total, pagina)``
+    se llama desde el hilo que genera el reporte.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import (SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
+                                    PageBreak, Flowable)
+
+    ancho, alto = letter
+    estilos = getSampleStyleSheet()
+
+    def decorar_pagina(c, doc):
+        c.saveState()
+        c.setFont("Helvetica-Bold", 11)
+        c.drawString(30, alto - 30, "ShadowCam v2.1 - Reporte de Análisis")
+        c.setFont("Helvetica", 8)
+        c.drawRightString(ancho - 30, alto - 30, time.strftime("%Y-%m-%d %H:%M:%S"))
+        c.line(30, alto - 36, ancho - 30, alto - 36)
+        c.line(30, 62, ancho - 30, 62)
+        for i, linea in enumerate(CREDITOS):
+            c.drawString(30, 52 - i * 10, linea)
+        c.drawRightString(ancho - 30, 52, f"Página {doc.page}")
+        c.restoreState()
+
+    estilo_tabla = TableStyle([
+        ("FONT", (0, 0), (-1, -1), "Helvetica", 7.5),
+        ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 8),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0d0d0d")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#00ff00")),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#eef5ee")]),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ])
+
+    def tabla(filas, anchos):
+        return Table(filas, colWidths=anchos, rowHeights=12, repeatRows=1, style=estilo_tabla)
+
+    # Resumen y desglose por fabricante
+    resumen = resumir_inventario(resultados)
+    historia = [
+        Paragraph("Resumen del inventario", estilos["Heading2"]),
+        tabla([["Métrica", "Valor"],
+               ["Dispositivos escaneados", resumen["dispositivos"]],
+               ["Posibles cámaras", resumen["camaras"]],
+               ["Cámaras accesibles", resumen["accesibles"]],
+               ["Fabricantes distintos", resumen["total_fabricantes"]],
+               *[[f"Cambios ({tipo})", n] for tipo, n in sorted(resumen["cambios"].items())]],
+              [200, 100]),
+        Spacer(1, 12),
+        Paragraph("Desglose por fabricante", estilos["Heading2"]),
+    ]
+    fabricantes = resumen["fabricantes"]
+    filas = [["Fabricante", "Dispositivos", "Cámaras", "Accesibles"]]
+    filas += [[_recortar(nombre, 60), *cuentas] for nombre, cuentas in fabricantes[:MAX_FABRICANTES_PDF]]
+    if len(fabricantes) > MAX_FABRICANTES_PDF:
+        otros = [sum(c[i] for _, c in fabricantes[MAX_FABRICANTES_PDF:]) for i in range(3)]
+        filas.append([f"Otros ({len(fabricantes) - MAX_FABRICANTES_PDF} fabricantes)", *otros])
+    historia += [tabla(filas, [300, 80, 70, 70]), PageBreak(),
+                 Paragraph("Dispositivos escaneados", estilos["Heading2"])]
+
+    # Detalle, en tablas cortas con la cabecera repetida
+    cabecera = ["IP", "MAC", "Fabricante", "Puertos", "Cámara", "Cambio"]
+    anchos = [78, 92, 190, 90, 42, 60]
+    resultados = list(resultados)
+
+    class TablaDiferida(Flowable):
+        """Tramo del detalle cuya tabla existe solo mientras se coloca"""
+
+        def __init__(self, inicio, fin):
+            super().__init__()
+            self.inicio, self.fin = inicio, fin
+            self._tabla = None
+
+        def _construir(self):
+            if self._tabla is None:
+                filas = [cabecera]
+                for d in resultados[self.inicio:self.fin]:
+                    filas.append([d['ip'], d['mac'], _recortar(d.get('fabricante') or "Desconocido", 42),
+                                  _recortar(", ".join(str(p) for p in d.get('puertos_abiertos') or []), 20),
+                                  "Sí" if d.get('posible_camara') else "No", d.get('cambio') or ""])
+                self._tabla = tabla(filas, anchos)
+            return self._tabla
+
+        def wrap(self, ancho_disponible, alto_disponible):
+            return self._construir().wrap(ancho_disponible, alto_disponible)
+
+        def split(self, ancho_disponible, alto_disponible):
+            # Las partes son tablas normales que reportlab coloca enseguida
+            partes = self._construir().split(ancho_disponible, alto_disponible)
+            self._tabla = None
+            return partes
+
+        def drawOn(self, canvas, x, y, _sW=0):
+            self._construir().drawOn(canvas, x, y, _sW)
+            self._tabla = None
+
+    historia += [TablaDiferida(i, i + FILAS_POR_TABLA_PDF)
+                 for i in range(0, len(resultados), FILAS_POR_TABLA_PDF)]
+
+    doc = SimpleDocTemplate(archivo, pagesize=letter, leftMargin=30, rightMargin=30,
+                            topMargin=48, bottomMargin=72, title="ShadowCam - Reporte de Análisis",
+                            author="ShadowCam v2.1")
+    if progreso:
+        estado = {"total": len(historia), "pagina": 0}
+
+        def al_avanzar(tipo, valor):
+            if tipo == "PAGE":
+                estado["pagina"] = valor
+            elif tipo == "PROGRESS":
+                progreso(valor, estado["total"], estado["pagina"])
+        doc.setProgressCallBack(al_avanzar)
+    doc.build(historia, onFirstPage=decorar_pagina, onLaterPages=decorar_pagina)